@@ -11,6 +11,10 @@ from .models import (
     AttackEvent,
     OwnershipEvent,
     RoundTick,
+    CheckResult,
+    ServiceSLA,
+    KothHoldTotal,
+    WarmInstance,
 )
 
 
@@ -60,6 +64,13 @@ class TeamServiceInstanceAdmin(admin.ModelAdmin):
     search_fields = ("team__name", "challenge__title")
 
 
+@admin.register(WarmInstance)
+class WarmInstanceAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "challenge", "status", "endpoint_url", "created_at", "ready_at")
+    list_filter = ("status", "challenge")
+    search_fields = ("name", "challenge__title")
+
+
 @admin.register(DefenseToken)
 class DefenseTokenAdmin(admin.ModelAdmin):
     list_display = ("id", "challenge", "team", "tick", "minted_at", "expires_at")
@@ -85,4 +96,25 @@ class OwnershipEventAdmin(admin.ModelAdmin):
 class RoundTickAdmin(admin.ModelAdmin):
     list_display = ("id", "challenge", "tick_index", "started_at", "finished_at")
     list_filter = ("challenge",)
-    search_fields = ("challenge__title",)
\ No newline at end of file
+    search_fields = ("challenge__title",)
+
+
+@admin.register(CheckResult)
+class CheckResultAdmin(admin.ModelAdmin):
+    list_display = ("id", "challenge", "team", "tick", "status", "latency_ms")
+    list_filter = ("challenge", "status")
+    search_fields = ("team__name",)
+
+
+@admin.register(ServiceSLA)
+class ServiceSLAAdmin(admin.ModelAdmin):
+    list_display = ("id", "challenge", "team", "ticks_up", "ticks_total", "last_tick", "last_status", "updated_at")
+    list_filter = ("challenge",)
+    search_fields = ("team__name",)
+
+
+@admin.register(KothHoldTotal)
+class KothHoldTotalAdmin(admin.ModelAdmin):
+    list_display = ("id", "challenge", "team", "hold_seconds", "hold_ticks", "points", "last_tick", "updated_at")
+    list_filter = ("challenge",)
+    search_fields = ("team__name",)
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Tuple, Type
 from importlib import import_module
 import requests
@@ -13,21 +16,46 @@ class BaseChecker:
     Base interface for challenge checkers.
     Implementations should provide:
       - health_ok(instance, config): for AD defense uptime
-      - koth_owner(instances, config): for KotH ownership detection
+      - koth_owner(instances, config): for KotH ownership detection. Checkers that also accept
+        current_owner and seed keyword arguments get them (the current owner keeps the hill on a tie,
+        the seed varies other tie-breaks per tick); the two-argument form keeps working.
+    AD checkers may additionally implement the multi-phase flag protocol:
+      - put_flag(instance, tick, flag, config, timeout): store this tick's flag in the service
+      - get_flag(instance, tick, flag, config, timeout): verify a flag placed at an earlier tick
+      - havoc(instance, config, timeout): exercise regular service functionality
+    and return True from has_flag_phases(config) to have run_tick use it instead of health_ok.
+    Phase methods run in worker threads and must not touch the database.
     """
 
     def health_ok(self, instance: TeamServiceInstance, config: dict) -> bool:
         raise NotImplementedError
 
-    def koth_owner(self, instances: List[TeamServiceInstance], config: dict) -> Optional[int]:
+    def koth_owner(
+        self, instances: List[TeamServiceInstance], config: dict, current_owner: Optional[int] = None, seed: int = 0
+    ) -> Optional[int]:
         raise NotImplementedError
 
+    def has_flag_phases(self, config: dict) -> bool:
+        return False
+
+    def put_flag(self, instance: TeamServiceInstance, tick: int, flag: str, config: dict, timeout: float) -> bool:
+        raise NotImplementedError
+
+    def get_flag(self, instance: TeamServiceInstance, tick: int, flag: str, config: dict, timeout: float) -> bool:
+        raise NotImplementedError
+
+    def havoc(self, instance: TeamServiceInstance, config: dict, timeout: float) -> bool:
+        return self.health_ok(instance, config)
+
 
 class HttpChecker(BaseChecker):
     """
     Simple HTTP-based checker:
       - health_ok: GET endpoint_url + health_path; 200 OK means healthy
-      - koth_owner: GET endpoint_url + proof_path and parse proof_keyword, fallback to first healthy instance's team
+      - koth_owner: GET endpoint_url + proof_path on all instances concurrently; a proof_keyword naming the
+        instance's own team wins over a plain 200; ties keep the current owner, else go to a seeded pseudo-random pick
+      - flag phases (enabled by flag_path): POST {"tick", "flag"} to flag_path to put,
+        GET flag_path?tick=N and look for the flag in the body to get, GET havoc_path (or health_path) for havoc
     """
 
     def _http_get(self, url: str, timeout: float = 3.0) -> Tuple[int, str]:
@@ -37,6 +65,13 @@ class HttpChecker(BaseChecker):
         except Exception:
             return 0, ""
 
+    def _http_post(self, url: str, payload: dict, timeout: float = 3.0) -> int:
+        try:
+            r = requests.post(url, json=payload, timeout=timeout)
+            return r.status_code
+        except Exception:
+            return 0
+
     def _join(self, base: str, path: str) -> str:
         if not path:
             return base
@@ -50,27 +85,80 @@ class HttpChecker(BaseChecker):
         status, _body = self._http_get(url)
         return status == 200
 
-    def koth_owner(self, instances: List[TeamServiceInstance], config: dict) -> Optional[int]:
+    def has_flag_phases(self, config: dict) -> bool:
+        return bool((config or {}).get("flag_path"))
+
+    def put_flag(self, instance: TeamServiceInstance, tick: int, flag: str, config: dict, timeout: float) -> bool:
+        if not instance.endpoint_url:
+            return False
+        url = self._join(instance.endpoint_url, (config or {}).get("flag_path", ""))
+        return self._http_post(url, {"tick": tick, "flag": flag}, timeout=timeout) in (200, 201, 204)
+
+    def get_flag(self, instance: TeamServiceInstance, tick: int, flag: str, config: dict, timeout: float) -> bool:
+        if not instance.endpoint_url:
+            return False
+        url = self._join(instance.endpoint_url, (config or {}).get("flag_path", "")) + f"?tick={tick}"
+        status, body = self._http_get(url, timeout=timeout)
+        return status == 200 and flag in body
+
+    def havoc(self, instance: TeamServiceInstance, config: dict, timeout: float) -> bool:
+        if not instance.endpoint_url:
+            return False
+        path = (config or {}).get("havoc_path") or (config or {}).get("health_path", "")
+        status, _body = self._http_get(self._join(instance.endpoint_url, path), timeout=timeout)
+        return status == 200
+
+    def _koth_probe(self, inst: TeamServiceInstance, proof_path: str, keyword: str, timeout: float) -> Tuple[int, bool]:
+        """
+        Probe one hill instance. Returns (HTTP status, whether the proof body names the instance's own team).
+        """
+        from apps.core.metrics import koth_probe_latency_seconds
+
+        started = time.monotonic()
+        status, body = self._http_get(self._join(inst.endpoint_url, proof_path), timeout=timeout)
+        try:
+            koth_probe_latency_seconds.labels(challenge=str(inst.challenge_id)).observe(time.monotonic() - started)
+        except Exception:
+            pass
+        proven = False
+        if status == 200 and keyword in body:
+            try:
+                idx = body.find(keyword)
+                proven = int(body[idx + len(keyword) :].strip().split()[0]) == inst.team_id
+            except Exception:
+                pass
+        return status, proven
+
+    def koth_owner(
+        self, instances: List[TeamServiceInstance], config: dict, current_owner: Optional[int] = None, seed: int = 0
+    ) -> Optional[int]:
+        """
+        Probe all instances concurrently (proof_timeout, default 3 s) and pick the owner deterministically:
+        instances whose proof names their own team beat instances that merely answer 200. Among equals the
+        current owner keeps the hill; other ties are broken by hashing (seed, team id), so no team id is
+        favoured across ticks (run_tick passes the tick index). Sets last_check_at on the probed
+        instances in memory only; the caller persists it.
+        """
         proof_path = (config or {}).get("proof_path", "")
         keyword = (config or {}).get("proof_keyword", "owned_by:")
-        for inst in instances:
-            if not inst.endpoint_url:
+        timeout = float((config or {}).get("proof_timeout", 3.0))
+        targets = [inst for inst in instances if inst.endpoint_url]
+        if not targets:
+            return None
+        workers = max(1, min(len(targets), int((config or {}).get("checker_concurrency", 32))))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(lambda inst: self._koth_probe(inst, proof_path, keyword, timeout), targets))
+        now = timezone.now()
+        best: Optional[tuple] = None
+        for inst, (status, proven) in zip(targets, outcomes):
+            inst.last_check_at = now
+            if status != 200:
                 continue
-            url = self._join(inst.endpoint_url, proof_path)
-            status, body = self._http_get(url)
-            inst.last_check_at = timezone.now()
-            inst.save(update_fields=["last_check_at"])
-            if status == 200:
-                if body and keyword in body:
-                    try:
-                        idx = body.find(keyword)
-                        tid = int(body[idx + len(keyword) :].strip().split()[0])
-                        if tid == inst.team_id:
-                            return tid
-                    except Exception:
-                        pass
-                return inst.team_id
-        return None
+            tiebreak = hashlib.sha256(f"{seed}:{inst.team_id}".encode("utf-8")).digest()
+            rank = (0 if proven else 1, 0 if inst.team_id == current_owner else 1, tiebreak, inst.team_id)
+            if best is None or rank < best:
+                best = rank
+        return best[-1] if best else None
 
 
 def get_checker(config: dict) -> BaseChecker:
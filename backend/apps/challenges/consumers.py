@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.cache import cache
+
+from .koth import koth_status_key
+from .models import TeamServiceInstance
+from .provisioning import instance_payload, user_group
 
 
 class LeaderboardConsumer(AsyncJsonWebsocketConsumer):
@@ -71,6 +77,10 @@ class KothStatusConsumer(AsyncJsonWebsocketConsumer):
             return
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        # Send the cached current owner right away so clients don't need a REST round-trip
+        current = await cache.aget(koth_status_key(cid))
+        if current is not None:
+            await self.send_json({"type": "koth", "payload": current})
 
     async def disconnect(self, close_code):
         try:
@@ -80,4 +90,35 @@ class KothStatusConsumer(AsyncJsonWebsocketConsumer):
 
     async def koth_update(self, event):
         payload = event.get("payload", {})
-        await self.send_json({"type": "koth", "payload": payload})
\ No newline at end of file
+        await self.send_json({"type": "koth", "payload": payload})
+
+class UserEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Per-user event stream (session or JWT authenticated): instance provisioning updates for the user's team.
+    Group: f"user.{user_id}". On connect it sends the team's current instances, so clients never poll.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({"type": "instances", "payload": await self._team_instances(user.id)})
+
+    @database_sync_to_async
+    def _team_instances(self, user_id):
+        rows = TeamServiceInstance.objects.filter(team__memberships__user_id=user_id).order_by("-created_at")
+        return [instance_payload(r) for r in rows]
+
+    async def disconnect(self, close_code):
+        try:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        except Exception:
+            pass
+
+    async def instance_update(self, event):
+        payload = event.get("payload", {})
+        await self.send_json({"type": "instance", "payload": payload})
@@ -0,0 +1,493 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from kubernetes import client, watch
+from kubernetes.client import ApiException
+
+logger = logging.getLogger(__name__)
+
+GROUP = "infra.ctf.example.com"
+VERSION = "v1alpha1"
+TPL_PLURAL = "challengetemplates"
+INST_PLURAL = "challengeinstances"
+
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"
+MANAGED_BY = "ctf-operator"
+# Hash of the desired spec an object was created/patched from; a mismatch means drift
+SPEC_HASH_ANNOTATION = "infra.ctf.example.com/spec-hash"
+
+# Informer kinds
+TEMPLATES = "templates"
+INSTANCES = "instances"
+DEPLOYMENTS = "deployments"
+SERVICES = "services"
+
+WatchEvent = Tuple[str, Dict[str, Any]]
+
+
+def _desired_deployment(name: str, namespace: str, image: str, resources: Dict[str, str], env: Dict[str, str]) -> client.V1Deployment:
+    labels = {"app": name}
+    container = client.V1Container(
+        name=name,
+        image=image,
+        ports=[client.V1ContainerPort(container_port=8080)],
+        env=[client.V1EnvVar(name=k, value=v) for k, v in env.items()],
+        resources=client.V1ResourceRequirements(
+            limits={"cpu": resources.get("cpu"), "memory": resources.get("memory")},
+            requests={"cpu": resources.get("cpu"), "memory": resources.get("memory")},
+        ),
+    )
+    pod_spec = client.V1PodSpec(containers=[container])
+    template = client.V1PodTemplateSpec(
+        metadata=client.V1ObjectMeta(labels=labels),
+        spec=pod_spec,
+    )
+    spec = client.V1DeploymentSpec(
+        replicas=1,
+        selector=client.V1LabelSelector(match_labels=labels),
+        template=template,
+    )
+    return client.V1Deployment(
+        api_version="apps/v1",
+        kind="Deployment",
+        metadata=client.V1ObjectMeta(
+            name=name, labels={**labels, MANAGED_BY_LABEL: MANAGED_BY}, annotations={SPEC_HASH_ANNOTATION: spec_hash(spec)}
+        ),
+        spec=spec,
+    )
+
+
+def _desired_service(name: str, namespace: str) -> client.V1Service:
+    labels = {"app": name}
+    spec = client.V1ServiceSpec(
+        selector=labels,
+        ports=[client.V1ServicePort(port=8080, target_port=8080, protocol="TCP")],
+        type="ClusterIP",
+    )
+    return client.V1Service(
+        api_version="v1",
+        kind="Service",
+        metadata=client.V1ObjectMeta(
+            name=name, labels={**labels, MANAGED_BY_LABEL: MANAGED_BY}, annotations={SPEC_HASH_ANNOTATION: spec_hash(spec)}
+        ),
+        spec=spec,
+    )
+
+
+def spec_hash(spec: Any) -> str:
+    """
+    Stable hash of a desired spec (model or dict): sha256 over canonical JSON, shortened.
+    """
+    data = json.dumps(_sanitize(spec), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _drift_patch(desired: Any) -> Dict[str, Any]:
+    """
+    Minimal strategic-merge patch moving an object to the desired spec: the fields this operator
+    owns (containers for a Deployment, ports/selector/type for a Service) plus the new spec hash.
+    """
+    data = _sanitize(desired)
+    spec = data["spec"]
+    if data.get("kind") == "Deployment":
+        spec = {"template": {"spec": {"containers": spec["template"]["spec"]["containers"]}}}
+    else:
+        spec = {k: spec[k] for k in ("ports", "selector", "type") if k in spec}
+    return {"metadata": {"annotations": dict(data["metadata"]["annotations"])}, "spec": spec}
+
+
+def _cached_hash(obj: Optional[dict]) -> Optional[str]:
+    return (((obj or {}).get("metadata") or {}).get("annotations") or {}).get(SPEC_HASH_ANNOTATION)
+
+
+def _env_for_instance(inst: Dict[str, Any]) -> Dict[str, str]:
+    # Add per-instance environment vars (team/event ids); warm-pool instances have no team until claimed
+    owner = inst["spec"]["owner"]
+    env = {"EVENT_ID": str(owner["eventId"])}
+    if owner.get("teamId") is not None:
+        env = {"TEAM_ID": str(owner["teamId"]), **env}
+    return env
+
+
+def instance_url(name: str, namespace: str) -> str:
+    return f"http://{name}.{namespace}.svc.cluster.local:8080"
+
+
+class Informer:
+    """
+    Local cache of one resource kind kept current by list + watch (the client-go informer pattern).
+    Objects are stored as plain dicts (API field names) keyed by metadata.name; every change
+    calls on_change(kind, name, old, new). A 410 Gone or expired resourceVersion triggers a relist.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        list_fn: Callable[[], Dict[str, Any]],
+        watch_fn: Callable[[Optional[str], int], Iterable[WatchEvent]],
+        on_change: Callable[[str, str, Optional[dict], Optional[dict]], None],
+        watch_timeout: int = 300,
+    ):
+        self.kind = kind
+        self.list_fn = list_fn
+        self.watch_fn = watch_fn
+        self.on_change = on_change
+        self.watch_timeout = watch_timeout
+        self.resource_version: Optional[str] = None
+        self.synced = threading.Event()
+        self._store: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            return self._store.get(name)
+
+    def items(self) -> List[dict]:
+        with self._lock:
+            return list(self._store.values())
+
+    def relist(self) -> None:
+        data = self.list_fn() or {}
+        fresh = {item["metadata"]["name"]: item for item in data.get("items") or []}
+        with self._lock:
+            old, self._store = self._store, fresh
+        self.resource_version = (data.get("metadata") or {}).get("resourceVersion")
+        for name in set(old) | set(fresh):
+            if old.get(name) != fresh.get(name):
+                self.on_change(self.kind, name, old.get(name), fresh.get(name))
+        self.synced.set()
+
+    def apply(self, event_type: str, obj: dict) -> None:
+        meta = obj.get("metadata") or {}
+        if meta.get("resourceVersion"):
+            self.resource_version = meta["resourceVersion"]
+        if event_type == "BOOKMARK":
+            return
+        name = meta["name"]
+        with self._lock:
+            old = self._store.get(name)
+            if event_type == "DELETED":
+                self._store.pop(name, None)
+                new = None
+            else:
+                self._store[name] = obj
+                new = obj
+        if old != new:
+            self.on_change(self.kind, name, old, new)
+
+    def run(self, stop: threading.Event) -> None:
+        backoff = 1.0
+        while not stop.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                for event_type, obj in self.watch_fn(self.resource_version, self.watch_timeout):
+                    if stop.is_set():
+                        return
+                    if event_type == "ERROR":
+                        # Status object, typically 410 Gone: our resourceVersion is too old
+                        self.resource_version = None
+                        break
+                    self.apply(event_type, obj)
+                backoff = 1.0
+            except ApiException as e:
+                if e.status == 410:
+                    self.resource_version = None
+                    continue
+                logger.warning("watch %s failed: %s", self.kind, e)
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            except Exception as e:
+                logger.warning("watch %s failed: %s", self.kind, e)
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+class WorkQueue:
+    """
+    Deduplicating queue of instance names: a name queued several times before it is processed
+    is reconciled once.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+        self._queue.put(name)
+
+    def drain(self, timeout: float) -> List[str]:
+        """
+        Block up to timeout for the first name, then take everything else already queued.
+        """
+        try:
+            names = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                names.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            self._pending.difference_update(names)
+        return names
+
+
+def _sanitize(obj: Any) -> Dict[str, Any]:
+    return client.ApiClient().sanitize_for_serialization(obj) if not isinstance(obj, dict) else obj
+
+
+def _typed_watch(list_fn: Callable, **kwargs) -> Callable[[Optional[str], int], Iterator[WatchEvent]]:
+    def stream(resource_version: Optional[str], timeout: int) -> Iterator[WatchEvent]:
+        w = watch.Watch()
+        try:
+            for ev in w.stream(
+                list_fn, resource_version=resource_version, timeout_seconds=timeout, allow_watch_bookmarks=True, **kwargs
+            ):
+                yield ev["type"], ev.get("raw_object") or _sanitize(ev["object"])
+        finally:
+            w.stop()
+
+    return stream
+
+
+def kube_informers(
+    namespace: str, on_change: Callable[[str, str, Optional[dict], Optional[dict]], None]
+) -> Dict[str, Informer]:
+    """
+    Informers for the four kinds the operator reconciles, backed by the real API server.
+    Deployments and services are limited to the ones this operator manages.
+    """
+    coapi = client.CustomObjectsApi()
+    apps_api = client.AppsV1Api()
+    core_api = client.CoreV1Api()
+    selector = f"{MANAGED_BY_LABEL}={MANAGED_BY}"
+
+    def custom(plural: str) -> Tuple[Callable, Callable]:
+        def list_fn():
+            return coapi.list_namespaced_custom_object(GROUP, VERSION, namespace, plural)
+
+        return list_fn, _typed_watch(coapi.list_namespaced_custom_object, group=GROUP, version=VERSION, namespace=namespace, plural=plural)
+
+    def typed(fn: Callable) -> Tuple[Callable, Callable]:
+        def list_fn():
+            return _sanitize(fn(namespace, label_selector=selector))
+
+        return list_fn, _typed_watch(fn, namespace=namespace, label_selector=selector)
+
+    sources = {
+        TEMPLATES: custom(TPL_PLURAL),
+        INSTANCES: custom(INST_PLURAL),
+        DEPLOYMENTS: typed(apps_api.list_namespaced_deployment),
+        SERVICES: typed(core_api.list_namespaced_service),
+    }
+    return {kind: Informer(kind, list_fn, watch_fn, on_change) for kind, (list_fn, watch_fn) in sources.items()}
+
+
+class Reconciler:
+    """
+    Watch-driven reconciler for ChallengeInstance CRs. Informer events enqueue the affected
+    instance names; reconcile() then works from the local caches and only calls the API to
+    create missing objects, patch objects whose spec hash drifted, delete objects of removed
+    instances and patch CR status that differs.
+    """
+
+    def __init__(self, namespace: str, coapi, apps_api, core_api, sync: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        self.namespace = namespace
+        self.coapi = coapi
+        self.apps_api = apps_api
+        self.core_api = core_api
+        self.sync = sync
+        self.queue = WorkQueue()
+        self.informers: Dict[str, Informer] = {}
+        # Writes not yet reflected by the watch (client-go "expectations"): avoids repeating
+        # a create, drift patch or status patch when another event for the same name arrives first
+        self._pending_creates: Dict[Tuple[str, str], float] = {}
+        self._pending_patches: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._pending_status: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._pending_deletes: Dict[Tuple[str, str], float] = {}
+        self.expectation_ttl = 60.0
+
+    # -- event routing -------------------------------------------------------------------
+
+    def on_change(self, kind: str, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if kind == TEMPLATES:
+            # A template change affects every instance that references it
+            informer = self.informers.get(INSTANCES)
+            for inst in informer.items() if informer else []:
+                if (inst.get("spec") or {}).get("templateRef") == name:
+                    self.queue.add(inst["metadata"]["name"])
+        else:
+            # Instances, and the Deployment/Service named after them
+            self.queue.add(name)
+
+    def resync(self) -> None:
+        for kind in (INSTANCES, DEPLOYMENTS, SERVICES):
+            for obj in self.informers[kind].items():
+                self.queue.add(obj["metadata"]["name"])
+
+    # -- reconcile -----------------------------------------------------------------------
+
+    def _create(self, kind: str, name: str, create: Callable[[], Any], relabel: Callable[[], Any]) -> None:
+        if time.monotonic() - self._pending_creates.get((kind, name), float("-inf")) < self.expectation_ttl:
+            return
+        try:
+            create()
+            logger.info("Created %s %s", kind, name)
+        except ApiException as e:
+            if e.status != 409:
+                raise
+            # Pre-existing object not labelled as ours yet: adopt it so the informer sees it
+            relabel()
+        self._pending_creates[(kind, name)] = time.monotonic()
+
+    def _delete(self, kind: str, name: str, cached: Optional[dict], delete: Callable[[], Any]) -> None:
+        key = (kind, name)
+        if cached is None:
+            self._pending_deletes.pop(key, None)
+            return
+        if time.monotonic() - self._pending_deletes.get(key, float("-inf")) < self.expectation_ttl:
+            return
+        try:
+            delete()
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        self._pending_deletes[key] = time.monotonic()
+
+    def _ensure(self, kind: str, name: str, cached: Optional[dict], desired: Any, create: Callable, patch: Callable, relabel: Callable) -> None:
+        """
+        Create the object when missing; when its spec-hash annotation differs from the desired
+        spec's hash, send one minimal drift patch.
+        """
+        key = (kind, name)
+        if cached is None:
+            self._create(kind, name, lambda: create(desired), relabel)
+            return
+        self._pending_creates.pop(key, None)
+        want = desired.metadata.annotations[SPEC_HASH_ANNOTATION]
+        if _cached_hash(cached) == want:
+            self._pending_patches.pop(key, None)
+            return
+        sent_hash, sent_at = self._pending_patches.get(key, (None, float("-inf")))
+        if sent_hash == want and time.monotonic() - sent_at < self.expectation_ttl:
+            return
+        patch(_drift_patch(desired))
+        self._pending_patches[key] = (want, time.monotonic())
+        logger.info("Patched drifted %s %s (spec hash %s -> %s)", kind, name, _cached_hash(cached), want)
+
+    def reconcile(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Bring one instance in line with its CR. Returns the sync record for Django, or None when
+        the instance is gone or cannot be provisioned yet.
+        """
+        ns = self.namespace
+        inst = self.informers[INSTANCES].get(name)
+        deployment = self.informers[DEPLOYMENTS].get(name)
+        service = self.informers[SERVICES].get(name)
+        if inst is None or (inst.get("metadata") or {}).get("deletionTimestamp"):
+            # Instance removed: clean up what we manage for it
+            self._pending_status.pop(name, None)
+            for kind in ("Deployment", "Service"):
+                self._pending_creates.pop((kind, name), None)
+                self._pending_patches.pop((kind, name), None)
+            self._delete("Deployment", name, deployment, lambda: self.apps_api.delete_namespaced_deployment(name, ns))
+            self._delete("Service", name, service, lambda: self.core_api.delete_namespaced_service(name, ns))
+            return None
+
+        spec = inst.get("spec") or {}
+        tpl_ref = spec.get("templateRef")
+        tpl = self.informers[TEMPLATES].get(tpl_ref) if tpl_ref else None
+        if tpl is None:
+            logger.warning("ChallengeInstance %s references unknown template %r", name, tpl_ref)
+            return None
+        labels_patch = {"metadata": {"labels": {MANAGED_BY_LABEL: MANAGED_BY}}}
+        self._ensure(
+            "Deployment",
+            name,
+            deployment,
+            _desired_deployment(name, ns, tpl["spec"]["image"], tpl["spec"].get("resources", {}) or {}, _env_for_instance(inst)),
+            lambda body: self.apps_api.create_namespaced_deployment(ns, body),
+            lambda body: self.apps_api.patch_namespaced_deployment(name, ns, body),
+            lambda: self.apps_api.patch_namespaced_deployment(name, ns, labels_patch),
+        )
+        self._ensure(
+            "Service",
+            name,
+            service,
+            _desired_service(name, ns),
+            lambda body: self.core_api.create_namespaced_service(ns, body),
+            lambda body: self.core_api.patch_namespaced_service(name, ns, body),
+            lambda: self.core_api.patch_namespaced_service(name, ns, labels_patch),
+        )
+
+        url = instance_url(name, ns)
+        desired_status = {"phase": "Ready", "namespace": ns, "url": url, "message": "Provisioned"}
+        current = inst.get("status") or {}
+        seen_version = (inst.get("metadata") or {}).get("resourceVersion")
+        if all(current.get(k) == v for k, v in desired_status.items()):
+            self._pending_status.pop(name, None)
+        elif self._pending_status.get(name) != (seen_version, desired_status):
+            # Patch unless the same patch was already sent against this very version of the CR
+            try:
+                self.coapi.patch_namespaced_custom_object_status(GROUP, VERSION, ns, INST_PLURAL, name, {"status": desired_status})
+                self._pending_status[name] = (seen_version, desired_status)
+            except ApiException:
+                pass
+        return {
+            "name": name,
+            "template": tpl_ref,
+            "team_id": (spec.get("owner") or {}).get("teamId"),
+            "labels": dict((inst.get("metadata") or {}).get("labels") or {}),
+            "url": url,
+        }
+
+    def process(self, names: List[str]) -> int:
+        """
+        Reconcile a batch of queued names and hand the provisioned ones to sync in one call.
+        """
+        records = []
+        for name in names:
+            try:
+                record = self.reconcile(name)
+            except Exception as e:
+                logger.error("reconcile %s failed: %s", name, e)
+                continue
+            if record is not None:
+                records.append(record)
+        if records and self.sync is not None:
+            self.sync(records)
+        return len(records)
+
+    def run(self, stop: threading.Event, resync_seconds: float = 600.0, batch_wait: float = 1.0) -> None:
+        threads = [
+            threading.Thread(target=informer.run, args=(stop,), name=f"informer-{kind}", daemon=True)
+            for kind, informer in self.informers.items()
+        ]
+        for t in threads:
+            t.start()
+        for informer in self.informers.values():
+            while not informer.synced.wait(timeout=1.0):
+                if stop.is_set():
+                    return
+        next_resync = time.monotonic() + resync_seconds
+        while not stop.is_set():
+            if time.monotonic() >= next_resync:
+                self.resync()
+                next_resync = time.monotonic() + resync_seconds
+            names = self.queue.drain(timeout=batch_wait)
+            if names:
+                self.process(names)
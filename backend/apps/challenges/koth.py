@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Optional
+
+from django.core.cache import cache
+
+STATUS_FIELDS = ("owner_team_id", "owner_team_name", "from_ts")
+
+
+def koth_status_key(challenge_id: int) -> str:
+    return f"koth:status:{challenge_id}"
+
+
+def cache_koth_status(challenge_id: int, owner_team_id: Optional[int], owner_team_name: Optional[str], from_ts) -> dict:
+    """
+    Store the current hill owner for a challenge, with an ETag over the public fields; this is
+    what KothStatusView and KothStatusConsumer serve, so neither has to query the database.
+    """
+    status = {
+        "challenge_id": challenge_id,
+        "owner_team_id": owner_team_id,
+        "owner_team_name": owner_team_name,
+        "from_ts": from_ts.isoformat() if from_ts else None,
+    }
+    body = json.dumps([status[k] for k in STATUS_FIELDS], separators=(",", ":"))
+    status["etag"] = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"'
+    cache.set(koth_status_key(challenge_id), status, timeout=None)
+    return status
+
+
+def get_koth_status(challenge_id: int) -> Optional[dict]:
+    return cache.get(koth_status_key(challenge_id))
+
+
+def refresh_koth_status(challenge_id: int) -> Optional[dict]:
+    """
+    Rebuild the cached status from OwnershipEvent: the open interval if any, else the latest event.
+    Drops the entry when the challenge is gone or no longer KotH.
+    """
+    from .models import Challenge, OwnershipEvent
+
+    if not Challenge.objects.filter(id=challenge_id, mode=Challenge.MODE_KOTH).exists():
+        cache.delete(koth_status_key(challenge_id))
+        return None
+    events = OwnershipEvent.objects.filter(challenge_id=challenge_id).select_related("owner_team")
+    ev = events.filter(to_ts__isnull=True).order_by("-from_ts").first() or events.order_by("-from_ts").first()
+    if not ev:
+        return cache_koth_status(challenge_id, None, None, None)
+    return cache_koth_status(challenge_id, ev.owner_team_id, ev.owner_team.name, ev.from_ts)
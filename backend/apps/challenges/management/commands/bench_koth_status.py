@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Team
+from apps.challenges.koth import koth_status_key
+from apps.challenges.models import Challenge, OwnershipEvent
+from .bench_tick import BENCH_PREFIX, _pct
+
+
+class Command(BaseCommand):
+    help = (
+        "Load benchmark for GET /api/koth/<id>/status. Seeds a bench-* KotH challenge with an owner and fires "
+        "requests from concurrent clients, once against the materialized cache (warm) and once with the cache "
+        "entry dropped before every request (cold), reporting latency percentiles and DB queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per phase (default: 2000)")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients (default: 16)")
+        parser.add_argument("--keep", action="store_true", help="Keep seeded rows after the run")
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        if total <= 0 or options["concurrency"] <= 0:
+            raise CommandError("--requests and --concurrency must be positive")
+        stamp = timezone.now().strftime("%Y%m%d%H%M%S%f")
+        team = Team.objects.create(name=f"{BENCH_PREFIX}{stamp}", slug=f"{BENCH_PREFIX}{stamp}")
+        challenge = Challenge.objects.create(
+            title=f"Bench koth status {stamp}",
+            slug=f"{BENCH_PREFIX}koth-status-{stamp}",
+            description="Benchmark challenge (bench_koth_status)",
+            flag_hmac="0" * 64,
+            mode=Challenge.MODE_KOTH,
+            released_at=timezone.now(),
+        )
+        OwnershipEvent.objects.create(challenge=challenge, owner_team=team, from_ts=timezone.now())
+        url = f"/api/koth/{challenge.id}/status"
+        hosts = [h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")]
+        self.host = hosts[0] if hosts else "localhost"
+        try:
+            for phase in ("cold", "warm"):
+                self._run_phase(phase, challenge.id, url, total, options["concurrency"])
+        finally:
+            if not options["keep"]:
+                challenge.delete()
+                team.delete()
+
+    def _run_phase(self, phase: str, challenge_id: int, url: str, total: int, concurrency: int) -> None:
+        cold = phase == "cold"
+        client = Client(HTTP_HOST=self.host)
+        client.get(url)  # materializes the status
+        if cold:
+            cache.delete(koth_status_key(challenge_id))
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        queries_per_request = len(queries.captured_queries)
+
+        def worker(n: int) -> List[float]:
+            c = Client(HTTP_HOST=self.host)
+            samples = []
+            try:
+                for _ in range(n):
+                    if cold:
+                        cache.delete(koth_status_key(challenge_id))
+                    started = time.perf_counter()
+                    r = c.get(url)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    if r.status_code != 200:
+                        raise CommandError(f"{url} answered {r.status_code}")
+            finally:
+                connections.close_all()
+            return samples
+
+        per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [ms for samples in pool.map(worker, per_worker) for ms in samples]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"phase={phase} requests={len(latencies)} rps={len(latencies) / elapsed:.0f} "
+            f"mean_ms={statistics.mean(latencies):.2f} p50_ms={_pct(latencies, 0.5):.2f} "
+            f"p95_ms={_pct(latencies, 0.95):.2f} max_ms={max(latencies):.2f} queries_per_request={queries_per_request}"
+        )
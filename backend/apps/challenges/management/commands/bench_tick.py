@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Team
+from apps.challenges.models import Challenge, TeamServiceInstance
+from apps.challenges.tasks import run_tick
+
+
+BENCH_PREFIX = "bench-"
+
+
+class StubService:
+    """
+    Per-team stub behaviour: fixed latency, random failures, KotH proof body and an in-memory flag store.
+    """
+
+    def __init__(self, team_id: int, latency_ms: float, failure_rate: float, proof_keyword: str, koth_proof: bool, rng: random.Random):
+        self.team_id = team_id
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.proof_keyword = proof_keyword
+        self.koth_proof = koth_proof
+        self.rng = rng
+        self.flags: Dict[str, str] = {}
+        self.requests = 0
+
+    def respond(self, method: str, target: str, body: bytes) -> tuple[int, str]:
+        self.requests += 1
+        if self.rng.random() < self.failure_rate:
+            return 500, "fail"
+        parts = urlsplit(target)
+        if parts.path.startswith("/flag"):
+            if method == "POST":
+                try:
+                    data = json.loads(body or b"{}")
+                    self.flags[str(data.get("tick"))] = str(data.get("flag", ""))
+                except ValueError:
+                    return 400, "bad json"
+                return 200, "stored"
+            tick = (parse_qs(parts.query).get("tick") or [""])[0]
+            return 200, self.flags.get(tick, "")
+        if parts.path.startswith("/proof") and self.koth_proof:
+            return 200, f"{self.proof_keyword}{self.team_id}"
+        return 200, "ok"
+
+
+class StubFleet:
+    """
+    Runs one asyncio HTTP server per stub service on 127.0.0.1 (ephemeral ports) in a background thread.
+    The HTTP handling is deliberately minimal: one request per connection, Connection: close.
+    """
+
+    def __init__(self, services: List[StubService]):
+        self.services = services
+        self.ports: List[int] = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._servers: List[asyncio.base_events.Server] = []
+
+    def _handler(self, svc: StubService):
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ver = lines[0].split(" ", 2)
+                length = 0
+                for line in lines[1:]:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1].strip() or 0)
+                body = await reader.readexactly(length) if length else b""
+                if svc.latency_ms:
+                    await asyncio.sleep(svc.latency_ms / 1000.0)
+                status, text = svc.respond(method, target, body)
+                payload = text.encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: text/plain\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+            except Exception:
+                pass
+            finally:
+                writer.close()
+
+        return handle
+
+    async def _start(self):
+        for svc in self.services:
+            server = await asyncio.start_server(self._handler(svc), "127.0.0.1", 0, backlog=512)
+            self._servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    def stop(self) -> None:
+        async def _close():
+            for server in self._servers:
+                server.close()
+                await server.wait_closed()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=10)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+
+
+class BroadcastCounter:
+    """
+    Counts group_send calls on the configured channel layer (run_tick and signal broadcasts share the instance).
+    """
+
+    def __init__(self):
+        from channels.layers import get_channel_layer
+
+        self.layer = get_channel_layer()
+        self.count = 0
+        self._orig = None
+
+    def __enter__(self):
+        if self.layer is None:
+            return self
+        self._orig = self.layer.group_send
+
+        async def counting(group, message):
+            self.count += 1
+            return await self._orig(group, message)
+
+        self.layer.group_send = counting
+        return self
+
+    def __exit__(self, *exc):
+        if self.layer is not None and self._orig is not None:
+            del self.layer.group_send
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark run_tick against local asyncio HTTP stub services (no network or Kubernetes needed). "
+        "Seeds bench-* Team/TeamServiceInstance rows, runs ticks and reports wall time, DB queries and broadcasts per tick."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=100, help="Number of teams/stub services (default: 100)")
+        parser.add_argument("--ticks", type=int, default=5, help="Ticks to run (default: 5)")
+        parser.add_argument("--mode", choices=["ad", "koth"], default="ad", help="Challenge mode (default: ad)")
+        parser.add_argument("--latency-ms", type=float, default=20.0, help="Stub response latency (default: 20)")
+        parser.add_argument("--failure-rate", type=float, default=0.05, help="Probability a stub answers 500 (default: 0.05)")
+        parser.add_argument("--koth-proof-teams", type=int, default=None, help="Only the first N stubs serve a KotH proof body (default: all)")
+        parser.add_argument("--phases", action="store_true", help="AD: enable put/get/havoc flag phases (flag_path)")
+        parser.add_argument("--tick-seconds", type=int, default=60, help="Challenge tick_seconds (default: 60)")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed for failure injection")
+        parser.add_argument("--keep", action="store_true", help="Keep seeded rows after the run")
+
+    def handle(self, *args, **options):
+        n = options["teams"]
+        if n <= 0 or options["ticks"] <= 0:
+            raise CommandError("--teams and --ticks must be positive")
+        mode = Challenge.MODE_ATTACK_DEFENSE if options["mode"] == "ad" else Challenge.MODE_KOTH
+        keyword = "owned_by:"
+        proof_teams = n if options["koth_proof_teams"] is None else options["koth_proof_teams"]
+
+        challenge, teams = self._seed(n, mode, options)
+        rng = random.Random(options["seed"])
+        services = [
+            StubService(t.id, options["latency_ms"], options["failure_rate"], keyword, i < proof_teams, rng)
+            for i, t in enumerate(teams)
+        ]
+        fleet = StubFleet(services)
+        fleet.start()
+        try:
+            TeamServiceInstance.objects.bulk_create(
+                [
+                    TeamServiceInstance(
+                        team=t,
+                        challenge=challenge,
+                        status=TeamServiceInstance.STATUS_RUNNING,
+                        endpoint_url=f"http://127.0.0.1:{port}",
+                    )
+                    for t, port in zip(teams, fleet.ports)
+                ]
+            )
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Benchmarking {options['mode']} challenge={challenge.id} teams={n} ticks={options['ticks']} "
+                    f"latency={options['latency_ms']}ms failure_rate={options['failure_rate']}"
+                )
+            )
+            walls: List[float] = []
+            for tick in range(options["ticks"]):
+                with CaptureQueriesContext(connection) as queries, BroadcastCounter() as broadcasts:
+                    started = time.perf_counter()
+                    run_tick(challenge.id, tick)
+                    wall = (time.perf_counter() - started) * 1000
+                walls.append(wall)
+                self.stdout.write(
+                    f"tick={tick} wall_ms={wall:.1f} queries={len(queries.captured_queries)} broadcasts={broadcasts.count}"
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"wall_ms mean={statistics.mean(walls):.1f} p50={_pct(walls, 0.5):.1f} "
+                    f"p95={_pct(walls, 0.95):.1f} max={max(walls):.1f} stub_requests={sum(s.requests for s in services)}"
+                )
+            )
+        finally:
+            fleet.stop()
+            if not options["keep"]:
+                challenge.delete()
+                Team.objects.filter(id__in=[t.id for t in teams]).delete()
+
+    def _seed(self, n: int, mode: str, options) -> tuple[Challenge, List[Team]]:
+        stamp = timezone.now().strftime("%Y%m%d%H%M%S%f")
+        config: Dict[str, object] = {"health_path": "/health", "proof_path": "/proof"}
+        if options["phases"]:
+            config.update({"flag_path": "/flag", "havoc_path": "/health"})
+        challenge = Challenge.objects.create(
+            title=f"Bench {mode} {stamp}",
+            slug=f"{BENCH_PREFIX}{options['mode']}-{stamp}",
+            description="Benchmark challenge (bench_tick)",
+            flag_hmac="0" * 64,
+            mode=mode,
+            tick_seconds=options["tick_seconds"],
+            released_at=timezone.now(),
+            checker_config=config,
+        )
+        teams = Team.objects.bulk_create(
+            [Team(name=f"{BENCH_PREFIX}{stamp}-{i}", slug=f"{BENCH_PREFIX}{stamp}-{i}") for i in range(n)]
+        )
+        if any(t.id is None for t in teams):
+            # Backends without RETURNING on bulk insert
+            teams = list(Team.objects.filter(slug__startswith=f"{BENCH_PREFIX}{stamp}-").order_by("id"))
+        return challenge, teams
@@ -1,23 +1,23 @@
 from __future__ import annotations
 
+import argparse
 import os
-import time
-from typing import Dict, Any
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from django.conf import settings
 
 from kubernetes import client, config
-from kubernetes.client import ApiException
 
-from apps.challenges.models import TeamServiceInstance
-
-
-GROUP = "infra.ctf.example.com"
-VERSION = "v1alpha1"
-TPL_PLURAL = "challengetemplates"
-INST_PLURAL = "challengeinstances"
+from apps.challenges.k8s import Reconciler, kube_informers
+from apps.challenges.models import Challenge, TeamServiceInstance, WarmInstance
+from apps.challenges.provisioning import INSTANCE_ID_LABEL
+from apps.challenges.quota import invalidate as invalidate_quota
+from apps.challenges.signals import _broadcast_ad_status
+from apps.challenges.warmpool import mark_warm_ready
 
 
 def _load_kube_config():
@@ -28,153 +28,137 @@ def _load_kube_config():
         config.load_kube_config()
 
 
-def _get_coapi():
-    return client.CustomObjectsApi()
-
-
-def _get_apps_api():
-    return client.AppsV1Api()
-
-
-def _get_core_api():
-    return client.CoreV1Api()
-
-
-def _desired_deployment(name: str, namespace: str, image: str, resources: Dict[str, str], env: Dict[str, str]) -> client.V1Deployment:
-    labels = {"app": name}
-    container = client.V1Container(
-        name=name,
-        image=image,
-        ports=[client.V1ContainerPort(container_port=8080)],
-        env=[client.V1EnvVar(name=k, value=v) for k, v in env.items()],
-        resources=client.V1ResourceRequirements(
-            limits={"cpu": resources.get("cpu"), "memory": resources.get("memory")},
-            requests={"cpu": resources.get("cpu"), "memory": resources.get("memory")},
-        ),
-    )
-    pod_spec = client.V1PodSpec(containers=[container])
-    template = client.V1PodTemplateSpec(
-        metadata=client.V1ObjectMeta(labels=labels),
-        spec=pod_spec,
-    )
-    spec = client.V1DeploymentSpec(
-        replicas=1,
-        selector=client.V1LabelSelector(match_labels=labels),
-        template=template,
-    )
-    return client.V1Deployment(
-        api_version="apps/v1",
-        kind="Deployment",
-        metadata=client.V1ObjectMeta(name=name, labels=labels),
-        spec=spec,
-    )
-
-
-def _desired_service(name: str, namespace: str) -> client.V1Service:
-    labels = {"app": name}
-    spec = client.V1ServiceSpec(
-        selector=labels,
-        ports=[client.V1ServicePort(port=8080, target_port=8080, protocol="TCP")],
-        type="ClusterIP",
-    )
-    return client.V1Service(
-        api_version="v1",
-        kind="Service",
-        metadata=client.V1ObjectMeta(name=name, labels=labels),
-        spec=spec,
-    )
-
-
-def _env_for_instance(inst: Dict[str, Any]) -> Dict[str, str]:
-    # Add per-instance environment vars (team/event ids)
-    owner = inst["spec"]["owner"]
-    env = {
-        "TEAM_ID": str(owner["teamId"]),
-        "EVENT_ID": str(owner["eventId"]),
-    }
-    # Merge global env from settings if desired
-    return env
+def _labelled_instance_id(rec: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int((rec.get("labels") or {})[INSTANCE_ID_LABEL])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def sync_team_instances(records: List[Dict[str, Any]]) -> Set[int]:
+    """
+    Mirror provisioned ChallengeInstance CRs into TeamServiceInstance rows (templateRef = Challenge slug).
+
+    A CR belongs to the row named by its instance-id label (provisioner-created CRs) or else to the row
+    whose cr_name is the CR's name (claimed warm instances, rows created by an earlier sync); a CR that
+    matches neither gets a new row. Stopped rows are never revived: their CR is on its way out.
+
+    One query resolves every templateRef, one loads the matched rows, and only rows whose status or
+    endpoint actually changed are written (bulk_create + bulk_update, which skip the per-save signal).
+    Each affected challenge then gets a single status broadcast. Returns the affected challenge ids.
+    """
+    sync_warm_instances(records)
+    slugs = {rec["template"] for rec in records if rec.get("team_id") is not None}
+    if not slugs:
+        return set()
+    challenge_ids = dict(Challenge.objects.filter(slug__in=slugs).values_list("slug", "id"))
+    wanted: List[Tuple[Dict[str, Any], int]] = []
+    for rec in records:
+        cid = challenge_ids.get(rec["template"])
+        if cid is not None and rec["team_id"] is not None:
+            wanted.append((rec, cid))
+    if not wanted:
+        return set()
+
+    names = {rec["name"] for rec, _ in wanted}
+    ids = {i for i in (_labelled_instance_id(rec) for rec, _ in wanted) if i is not None}
+    by_id: Dict[int, TeamServiceInstance] = {}
+    by_name: Dict[str, TeamServiceInstance] = {}
+    for row in TeamServiceInstance.objects.filter(Q(cr_name__in=names) | Q(id__in=ids)):
+        by_id[row.id] = row
+        if row.cr_name:
+            by_name[row.cr_name] = row
+
+    now = timezone.now()
+    to_create: List[TeamServiceInstance] = []
+    to_update: List[TeamServiceInstance] = []
+    for rec, cid in wanted:
+        name, url = rec["name"], rec["url"]
+        row = by_id.get(_labelled_instance_id(rec)) or by_name.get(name)
+        if row is None:
+            to_create.append(
+                TeamServiceInstance(
+                    team_id=rec["team_id"],
+                    challenge_id=cid,
+                    status=TeamServiceInstance.STATUS_RUNNING,
+                    endpoint_url=url,
+                    last_check_at=now,
+                    cr_name=name,
+                )
+            )
+        elif row.status == TeamServiceInstance.STATUS_STOPPED:
+            continue
+        elif row.status != TeamServiceInstance.STATUS_RUNNING or row.endpoint_url != url or row.cr_name != name:
+            row.status = TeamServiceInstance.STATUS_RUNNING
+            row.endpoint_url = url
+            row.cr_name = name
+            row.last_check_at = now
+            to_update.append(row)
+    if not to_create and not to_update:
+        return set()
+
+    with transaction.atomic():
+        if to_create:
+            TeamServiceInstance.objects.bulk_create(to_create)
+        if to_update:
+            TeamServiceInstance.objects.bulk_update(to_update, ["status", "endpoint_url", "cr_name", "last_check_at"])
+    # Rows created or marked running from CRs bypass admission: let the quota counters recount
+    invalidate_quota({(row.team_id, row.challenge_id) for row in to_create + to_update})
+    affected = {row.challenge_id for row in to_create + to_update}
+    for cid in sorted(affected):
+        try:
+            _broadcast_ad_status(cid)
+        except Exception:
+            pass
+    return affected
+
+
+def sync_warm_instances(records: List[Dict[str, Any]]) -> int:
+    """
+    Mark pending WarmInstances ready once their team-less ChallengeInstance CR (same name) is provisioned.
+    """
+    urls = {rec["name"]: rec["url"] for rec in records if rec.get("team_id") is None}
+    if not urls:
+        return 0
+    warm = list(WarmInstance.objects.filter(name__in=urls, status=WarmInstance.STATUS_PENDING))
+    return mark_warm_ready(warm, {w.id: urls[w.name] for w in warm})
 
 
 class Command(BaseCommand):
-    help = "Run a Kubernetes operator reconciling ChallengeInstance CRs into Deployments/Services and syncing with Django TeamServiceInstance rows."
+    help = (
+        "Run a Kubernetes operator reconciling ChallengeInstance CRs into Deployments/Services and syncing with Django "
+        "TeamServiceInstance rows. Watches templates, instances, deployments and services into local caches and "
+        "reconciles only what changed."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--namespace", default=os.getenv("OPERATOR_NAMESPACE", "default"))
-        parser.add_argument("--interval", type=int, default=int(os.getenv("OPERATOR_INTERVAL", "15")))
+        parser.add_argument(
+            "--resync",
+            type=int,
+            default=int(os.getenv("OPERATOR_RESYNC_SECONDS", "600")),
+            help="Seconds between full re-reconciles from the local cache (no API listing)",
+        )
+        # Kept for compatibility with existing deployments; the loop is watch-driven now
+        parser.add_argument("--interval", type=int, default=int(os.getenv("OPERATOR_INTERVAL", "15")), help=argparse.SUPPRESS)
 
     def handle(self, *args, **options):
         namespace = options["namespace"]
-        interval = options["interval"]
-        self.stdout.write(self.style.WARNING(f"Starting k8s operator in namespace={namespace} interval={interval}s"))
+        self.stdout.write(self.style.WARNING(f"Starting k8s operator in namespace={namespace} resync={options['resync']}s"))
         _load_kube_config()
-        coapi = _get_coapi()
-        apps_api = _get_apps_api()
-        core_api = _get_core_api()
 
-        while True:
+        def sync(records):
             try:
-                instances = coapi.list_namespaced_custom_object(
-                    GROUP, VERSION, namespace, INST_PLURAL
-                ).get("items", [])
-                for inst in instances:
-                    name = inst["metadata"]["name"]
-                    spec = inst["spec"]
-                    tpl_ref = spec["templateRef"]
-                    owner = spec["owner"]
-                    # Read template to get image/resources
-                    tpl = coapi.get_namespaced_custom_object(GROUP, VERSION, namespace, TPL_PLURAL, tpl_ref)
-                    image = tpl["spec"]["image"]
-                    resources = tpl["spec"].get("resources", {})
-                    env = _env_for_instance(inst)
-                    # Ensure Deployment
-                    try:
-                        apps_api.read_namespaced_deployment(name, namespace)
-                        # TODO: update if drift detected
-                    except ApiException as e:
-                        if e.status == 404:
-                            dep = _desired_deployment(name, namespace, image, resources, env)
-                            apps_api.create_namespaced_deployment(namespace, dep)
-                            self.stdout.write(self.style.SUCCESS(f"Created Deployment {name}"))
-                    # Ensure Service
-                    try:
-                        core_api.read_namespaced_service(name, namespace)
-                    except ApiException as e:
-                        if e.status == 404:
-                            svc = _desired_service(name, namespace)
-                            core_api.create_namespaced_service(namespace, svc)
-                            self.stdout.write(self.style.SUCCESS(f"Created Service {name}"))
-                    # Update CR status (ready)
-                    status = {
-                        "phase": "Ready",
-                        "namespace": namespace,
-                        "url": f"http://{name}.{namespace}.svc.cluster.local:8080",
-                        "message": "Provisioned",
-                    }
-                    try:
-                        coapi.patch_namespaced_custom_object_status(
-                            GROUP, VERSION, namespace, INST_PLURAL, name, {"status": status}
-                        )
-                    except ApiException:
-                        pass
-                    # Sync into Django TeamServiceInstance
-                    try:
-                        team_id = owner["teamId"]
-                        from apps.challenges.models import Challenge, TeamServiceInstance
-                        chal = Challenge.objects.filter(slug=tpl_ref).first()
-                        if chal:
-                            obj, _ = TeamServiceInstance.objects.update_or_create(
-                                team_id=team_id,
-                                challenge=chal,
-                                defaults={
-                                    "status": TeamServiceInstance.STATUS_RUNNING,
-                                    "endpoint_url": status["url"],
-                                    "last_check_at": timezone.now(),
-                                },
-                            )
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Sync error: {e}"))
+                sync_team_instances(records)
             except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Operator loop error: {e}"))
-
-            time.sleep(interval)
\ No newline at end of file
+                self.stdout.write(self.style.ERROR(f"Sync error: {e}"))
+
+        reconciler = Reconciler(namespace, client.CustomObjectsApi(), client.AppsV1Api(), client.CoreV1Api(), sync=sync)
+        reconciler.informers = kube_informers(namespace, reconciler.on_change)
+        stop = threading.Event()
+        try:
+            reconciler.run(stop, resync_seconds=options["resync"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
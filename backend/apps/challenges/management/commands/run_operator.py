@@ -4,7 +4,8 @@ import time
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from apps.challenges.models import TeamServiceInstance
+from apps.challenges.models import TeamServiceInstance, WarmInstance
+from apps.challenges.warmpool import mark_warm_ready
 
 
 class Command(BaseCommand):
@@ -27,6 +28,12 @@ class Command(BaseCommand):
                     inst.save(update_fields=["status", "endpoint_url", "last_check_at"])
                     self.stdout.write(self.style.SUCCESS(f"Started instance id={inst.id} team={inst.team_id} url={inst.endpoint_url}"))
 
+                # Warm pool: bring pending warm instances up (no team yet)
+                warm = list(WarmInstance.objects.filter(status=WarmInstance.STATUS_PENDING).select_related("challenge")[:50])
+                urls = {w.id: f"http://{w.name}.example.local/{w.challenge.slug}" for w in warm}
+                if mark_warm_ready(warm, urls):
+                    self.stdout.write(self.style.SUCCESS(f"Warmed {len(warm)} pool instance(s)"))
+
                 # Reconcile stopped instances: clear endpoint
                 stoppeds = TeamServiceInstance.objects.filter(status=TeamServiceInstance.STATUS_STOPPED)[:50]
                 for inst in stoppeds:
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_uiconfig_event_overrides'),
+        ('challenges', '0005_event_and_challenge_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tick', models.BigIntegerField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Down'), (1, 'Up'), (2, 'Checker error')], default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_results', to='challenges.challenge')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_results', to='core.team')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='checkresult',
+            constraint=models.UniqueConstraint(fields=('challenge', 'team', 'tick'), name='uniq_check_result_per_tick'),
+        ),
+        migrations.AddIndex(
+            model_name='checkresult',
+            index=models.Index(fields=['challenge', '-tick'], name='challenges__challen_74b4e0_idx'),
+        ),
+        migrations.CreateModel(
+            name='ServiceSLA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticks_total', models.PositiveIntegerField(default=0)),
+                ('ticks_up', models.PositiveIntegerField(default=0)),
+                ('last_tick', models.BigIntegerField(default=-1)),
+                ('last_status', models.PositiveSmallIntegerField(choices=[(0, 'Down'), (1, 'Up'), (2, 'Checker error')], default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sla_rollups', to='challenges.challenge')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sla_rollups', to='core.team')),
+            ],
+            options={
+                'unique_together': {('challenge', 'team')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0006_checkresult_servicesla'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='checkresult',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Down'), (1, 'Up'), (2, 'Checker error'), (3, 'Flag lost'), (4, 'Faulty')], default=0),
+        ),
+        migrations.AlterField(
+            model_name='servicesla',
+            name='last_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Down'), (1, 'Up'), (2, 'Checker error'), (3, 'Flag lost'), (4, 'Faulty')], default=0),
+        ),
+    ]
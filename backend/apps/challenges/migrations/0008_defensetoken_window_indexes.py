@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0007_checkresult_phase_statuses'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='defensetoken',
+            name='challenges_d_token_5a34f7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='defensetoken',
+            index=models.Index(fields=['challenge', 'token'], name='challenges__challen_b9c8b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='defensetoken',
+            index=models.Index(fields=['challenge', 'tick'], name='challenges__challen_d15132_idx'),
+        ),
+    ]
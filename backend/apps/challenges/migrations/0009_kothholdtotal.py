@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_hold_totals(apps, schema_editor):
+    Challenge = apps.get_model('challenges', 'Challenge')
+    OwnershipEvent = apps.get_model('challenges', 'OwnershipEvent')
+    KothHoldTotal = apps.get_model('challenges', 'KothHoldTotal')
+    ScoreEvent = apps.get_model('core', 'ScoreEvent')
+
+    totals = {}
+    for ev in OwnershipEvent.objects.filter(to_ts__isnull=False).only('challenge_id', 'owner_team_id', 'from_ts', 'to_ts'):
+        row = totals.setdefault((ev.challenge_id, ev.owner_team_id), {'hold_seconds': 0.0, 'hold_ticks': 0, 'points': 0})
+        row['hold_seconds'] += max(0.0, (ev.to_ts - ev.from_ts).total_seconds())
+    koth_ids = list(Challenge.objects.filter(mode='KOTH').values_list('id', flat=True))
+    holds = (
+        ScoreEvent.objects.filter(type='koth_hold', challenge_id__in=koth_ids)
+        .values('challenge_id', 'team_id')
+        .annotate(ticks=Count('id'), points=Sum('delta'))
+    )
+    for h in holds:
+        row = totals.setdefault((h['challenge_id'], h['team_id']), {'hold_seconds': 0.0, 'hold_ticks': 0, 'points': 0})
+        row['hold_ticks'] = h['ticks']
+        row['points'] = h['points'] or 0
+    KothHoldTotal.objects.bulk_create(
+        [KothHoldTotal(challenge_id=c, team_id=t, **row) for (c, t), row in totals.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_uiconfig_event_overrides'),
+        ('challenges', '0008_defensetoken_window_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KothHoldTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hold_seconds', models.FloatField(default=0)),
+                ('hold_ticks', models.PositiveIntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('last_tick', models.BigIntegerField(default=-1)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='koth_hold_totals', to='challenges.challenge')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='koth_hold_totals', to='core.team')),
+            ],
+            options={
+                'unique_together': {('challenge', 'team')},
+            },
+        ),
+        migrations.RunPython(backfill_hold_totals, migrations.RunPython.noop),
+    ]
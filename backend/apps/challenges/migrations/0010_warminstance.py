@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0009_kothholdtotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarmInstance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready')], default='pending', max_length=16)),
+                ('endpoint_url', models.URLField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ready_at', models.DateTimeField(blank=True, null=True)),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='warm_instances', to='challenges.challenge')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['challenge', 'status', 'ready_at'], name='challenges__challen_050f2f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_last_activity(apps, schema_editor):
+    TeamServiceInstance = apps.get_model('challenges', 'TeamServiceInstance')
+    TeamServiceInstance.objects.update(last_activity_at=Coalesce(F('last_check_at'), F('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0010_warminstance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamserviceinstance',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='teamserviceinstance',
+            index=models.Index(fields=['status', 'last_activity_at'], name='challenges__status_af1146_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0011_teamserviceinstance_last_activity_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamserviceinstance',
+            name='cr_name',
+            field=models.CharField(blank=True, db_index=True, max_length=128),
+        ),
+    ]
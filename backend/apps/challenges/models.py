@@ -177,14 +177,44 @@ class TeamServiceInstance(models.Model):
     endpoint_url = models.URLField(blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     last_check_at = models.DateTimeField(null=True, blank=True)
+    # Ingress hits, checker probes and (re)starts; the idle reaper stops instances past their threshold
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    # Name of the backing ChallengeInstance CR (k8s); the operator sync matches CRs to rows by it
+    cr_name = models.CharField(max_length=128, blank=True, db_index=True)
 
     class Meta:
-        indexes = [models.Index(fields=["challenge", "team"])]
+        indexes = [models.Index(fields=["challenge", "team"]), models.Index(fields=["status", "last_activity_at"])]
 
     def __str__(self) -> str:
         return f"Inst {self.id} team={self.team_id} chal={self.challenge_id} status={self.status}"
 
 
+class WarmInstance(models.Model):
+    """
+    Pre-provisioned, team-less instance of an instance_required challenge. The operator brings it to
+    ready; a spawn claims a ready one and turns it into the team's TeamServiceInstance.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_READY = "ready"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_READY, "Ready"),
+    ]
+
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name="warm_instances")
+    name = models.CharField(max_length=128, unique=True)  # ChallengeInstance CR name
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    endpoint_url = models.URLField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    ready_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["challenge", "status", "ready_at"])]
+
+    def __str__(self) -> str:
+        return f"Warm {self.name} chal={self.challenge_id} status={self.status}"
+
+
 class DefenseToken(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="defense_tokens")
     challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name="defense_tokens")
@@ -197,7 +227,9 @@ class DefenseToken(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["challenge", "team", "tick"]),
-            models.Index(fields=["token"]),
+            # Submission lookups and retention work per challenge (see tokens.py)
+            models.Index(fields=["challenge", "token"]),
+            models.Index(fields=["challenge", "tick"]),
         ]
 
     def __str__(self) -> str:
@@ -251,5 +283,85 @@ class RoundTick(models.Model):
         return f"Tick {self.tick_index} challenge={self.challenge_id}"
 
 
+class CheckResult(models.Model):
+    """
+    One row per (challenge, team, tick) with the checker outcome and latency.
+    Kept narrow on purpose: this table grows with teams x ticks.
+    """
+    STATUS_DOWN = 0
+    STATUS_UP = 1
+    STATUS_ERROR = 2
+    STATUS_CORRUPT = 3
+    STATUS_MUMBLE = 4
+    STATUS_CHOICES = [
+        (STATUS_DOWN, "Down"),
+        (STATUS_UP, "Up"),
+        (STATUS_ERROR, "Checker error"),
+        (STATUS_CORRUPT, "Flag lost"),
+        (STATUS_MUMBLE, "Faulty"),
+    ]
+
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name="check_results")
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="check_results")
+    tick = models.BigIntegerField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=STATUS_DOWN)
+    latency_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["challenge", "team", "tick"], name="uniq_check_result_per_tick"),
+        ]
+        indexes = [models.Index(fields=["challenge", "-tick"])]
+
+    def __str__(self) -> str:
+        return f"Check chal={self.challenge_id} team={self.team_id} tick={self.tick} status={self.status}"
+
+
+class ServiceSLA(models.Model):
+    """
+    Incremental SLA rollup per (challenge, team), updated once per tick by run_tick.
+    last_tick guards against double counting when a tick is re-dispatched.
+    """
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name="sla_rollups")
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="sla_rollups")
+    ticks_total = models.PositiveIntegerField(default=0)
+    ticks_up = models.PositiveIntegerField(default=0)
+    last_tick = models.BigIntegerField(default=-1)
+    last_status = models.PositiveSmallIntegerField(choices=CheckResult.STATUS_CHOICES, default=CheckResult.STATUS_DOWN)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("challenge", "team"),)
+
+    def __str__(self) -> str:
+        return f"SLA chal={self.challenge_id} team={self.team_id} {self.ticks_up}/{self.ticks_total}"
+
+    @property
+    def sla_percent(self) -> float:
+        if not self.ticks_total:
+            return 0.0
+        return round(100.0 * self.ticks_up / self.ticks_total, 2)
+
+
+class KothHoldTotal(models.Model):
+    """
+    Incremental KotH hold aggregate per (challenge, team). hold_ticks/points grow once per tick the
+    team owns the hill (guarded by last_tick); hold_seconds grows when the team's ownership span closes.
+    """
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name="koth_hold_totals")
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="koth_hold_totals")
+    hold_seconds = models.FloatField(default=0)
+    hold_ticks = models.PositiveIntegerField(default=0)
+    points = models.IntegerField(default=0)
+    last_tick = models.BigIntegerField(default=-1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("challenge", "team"),)
+
+    def __str__(self) -> str:
+        return f"KotH hold chal={self.challenge_id} team={self.team_id} {self.hold_ticks} ticks"
+
+
 def verify_flag(challenge: Challenge, submitted_flag: str) -> bool:
     return hmac.compare_digest(hmac_flag(submitted_flag), challenge.flag_hmac)
\ No newline at end of file
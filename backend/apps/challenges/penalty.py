@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import time
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+# Progressive penalty box for wrong flags. Consecutive incorrect submissions are counted per
+# (team, challenge) and per client IP; past the free attempts every further miss blocks the subject
+# for FLAG_PENALTY_BASE_SECONDS * 2^n (capped at FLAG_PENALTY_MAX_SECONDS). A correct flag clears
+# the team's and the IP's strikes; strikes also lapse FLAG_PENALTY_RESET_SECONDS after the last miss.
+# All state lives in the cache (Redis in production), so blocked requests never reach the database.
+
+KIND_TEAM = "team"
+KIND_IP = "ip"
+
+
+def enabled() -> bool:
+    return base_seconds() > 0
+
+
+def base_seconds() -> int:
+    return max(0, int(getattr(settings, "FLAG_PENALTY_BASE_SECONDS", 10)))
+
+
+def free_attempts(kind: str) -> int:
+    if kind == KIND_IP:
+        return max(0, int(getattr(settings, "FLAG_PENALTY_IP_FREE_ATTEMPTS", 30)))
+    return max(0, int(getattr(settings, "FLAG_PENALTY_FREE_ATTEMPTS", 10)))
+
+
+def penalty_seconds(kind: str, strikes: int) -> int:
+    """Block length after `strikes` consecutive misses: 0 within the free attempts, then doubling."""
+    over = strikes - free_attempts(kind)
+    if over <= 0 or not enabled():
+        return 0
+    cap = int(getattr(settings, "FLAG_PENALTY_MAX_SECONDS", 900))
+    return min(cap, base_seconds() * 2 ** min(over - 1, 32))
+
+
+def _reset_seconds() -> int:
+    return int(getattr(settings, "FLAG_PENALTY_RESET_SECONDS", 3600))
+
+
+def team_subject(team_id: int, challenge_id: int) -> str:
+    return f"{KIND_TEAM}:{team_id}:{challenge_id}"
+
+
+def ip_subject(ip: str) -> str:
+    return f"{KIND_IP}:{ip}"
+
+
+def _strikes_key(subject: str) -> str:
+    return f"flagpen:strikes:{subject}"
+
+
+def _until_key(subject: str) -> str:
+    return f"flagpen:until:{subject}"
+
+
+def _team_of_key(user_id: int) -> str:
+    return f"flagpen:team-of:{user_id}"
+
+
+def remember_team(user_id: int, team_id: int) -> None:
+    """Cache the user's team so the next submission can be checked without a membership query."""
+    cache.set(_team_of_key(user_id), team_id, timeout=300)
+
+
+def cached_team(user_id: int) -> Optional[int]:
+    return cache.get(_team_of_key(user_id))
+
+
+def blocked_for(subjects: Iterable[str], now: Optional[float] = None) -> float:
+    """Seconds until every given subject is out of the box (0 when none is blocked); one cache read."""
+    now = time.time() if now is None else now
+    keys = [_until_key(s) for s in subjects]
+    untils = cache.get_many(keys).values() if keys else ()
+    return max([u - now for u in untils] + [0.0])
+
+
+def _strike(subject: str) -> int:
+    key = _strikes_key(subject)
+    cache.add(key, 0, timeout=_reset_seconds())
+    try:
+        strikes = cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.add(key, 0, timeout=_reset_seconds())
+        strikes = cache.incr(key)
+    cache.touch(key, _reset_seconds())
+    return strikes
+
+
+def record_miss(team_id: int, challenge_id: int, ip: Optional[str], now: Optional[float] = None) -> int:
+    """
+    Count an incorrect submission against the team/challenge and the IP; returns the longest block
+    it imposed (0 while still within the free attempts).
+    """
+    if not enabled():
+        return 0
+    from apps.core.metrics import flag_penalties_total
+
+    now = time.time() if now is None else now
+    subjects = [(KIND_TEAM, team_subject(team_id, challenge_id))]
+    if ip:
+        subjects.append((KIND_IP, ip_subject(ip)))
+    longest = 0
+    for kind, subject in subjects:
+        seconds = penalty_seconds(kind, _strike(subject))
+        if seconds:
+            cache.set(_until_key(subject), now + seconds, timeout=seconds)
+            longest = max(longest, seconds)
+            try:
+                flag_penalties_total.labels(kind=kind).inc()
+            except Exception:
+                pass
+    return longest
+
+
+def clear(subjects: Iterable[str]) -> None:
+    keys: List[str] = []
+    for subject in subjects:
+        keys.extend((_strikes_key(subject), _until_key(subject)))
+    if keys:
+        cache.delete_many(keys)
+
+
+def record_solve(team_id: int, challenge_id: int, ip: Optional[str]) -> None:
+    """A correct flag ends the streak for the team/challenge and the IP."""
+    if enabled():
+        clear([team_subject(team_id, challenge_id)] + ([ip_subject(ip)] if ip else []))
+
+
+def inspect(subjects: Iterable[str], now: Optional[float] = None) -> List[dict]:
+    """Current strikes and remaining block of the subjects that have any state (ops view)."""
+    now = time.time() if now is None else now
+    subjects = list(subjects)
+    keys = [_strikes_key(s) for s in subjects] + [_until_key(s) for s in subjects]
+    values = cache.get_many(keys) if keys else {}
+    results = []
+    for subject in subjects:
+        strikes = values.get(_strikes_key(subject))
+        until = values.get(_until_key(subject))
+        if strikes is None and until is None:
+            continue
+        results.append(
+            {
+                "subject": subject,
+                "strikes": strikes or 0,
+                "blocked_for": round(max(0.0, until - now), 1) if until else 0.0,
+            }
+        )
+    return results
+
+
+def client_ip(request) -> Optional[str]:
+    # Same client identification (NUM_PROXIES, X-Forwarded-For) as the rate throttles
+    return BaseThrottle().get_ident(request) or None
+
+
+class FlagPenaltyThrottle(BaseThrottle):
+    """
+    Rejects submissions from a boxed IP, or from a team boxed on this challenge, with 429 and
+    Retry-After before the view runs. The team comes from the cache (remember_team); when it is not
+    cached the view checks the team subject itself once it has loaded the team.
+    """
+
+    def allow_request(self, request, view) -> bool:
+        self._wait = 0.0
+        if not enabled():
+            return True
+        subjects = []
+        ip = client_ip(request)
+        if ip:
+            subjects.append(ip_subject(ip))
+        challenge_id = (getattr(view, "kwargs", None) or {}).get("id")
+        user = getattr(request, "user", None)
+        team_id = cached_team(user.id) if challenge_id and user is not None and user.is_authenticated else None
+        if team_id is not None:
+            subjects.append(team_subject(team_id, challenge_id))
+        request.flag_penalty_team_checked = team_id is not None
+        self._wait = blocked_for(subjects)
+        if self._wait <= 0:
+            return True
+        from apps.core.metrics import flag_penalty_rejections_total
+
+        try:
+            flag_penalty_rejections_total.inc()
+        except Exception:
+            pass
+        return False
+
+    def wait(self) -> Optional[float]:
+        return self._wait or None
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import logging
+import time
+from importlib import import_module
+from typing import Callable, Dict, Iterable, List, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.models import Membership
+from .models import TeamServiceInstance, WarmInstance
+
+logger = logging.getLogger(__name__)
+
+# Label on provisioner-created ChallengeInstance CRs pointing back at the TeamServiceInstance
+INSTANCE_ID_LABEL = "infra.ctf.example.com/instance-id"
+
+
+class ProvisioningError(Exception):
+    pass
+
+
+def user_group(user_id: int) -> str:
+    """Per-user channel-layer group behind /ws/me (instance ready notifications)."""
+    return f"user.{user_id}"
+
+
+def instance_payload(inst: TeamServiceInstance) -> dict:
+    return {
+        "id": inst.id,
+        "team_id": inst.team_id,
+        "challenge_id": inst.challenge_id,
+        "status": inst.status,
+        "endpoint_url": inst.endpoint_url,
+    }
+
+
+def notify_team_instance(inst: TeamServiceInstance) -> None:
+    """
+    Push the instance's current state to every member of its team over their per-user group.
+    """
+    notify_instances([inst])
+
+
+def notify_instances(instances: Iterable[TeamServiceInstance]) -> None:
+    """
+    Batch form of notify_team_instance: one membership query for all affected teams.
+    """
+    channel_layer = get_channel_layer()
+    instances = list(instances)
+    if channel_layer is None or not instances:
+        return
+    members: Dict[int, List[int]] = {}
+    memberships = Membership.objects.filter(team_id__in={i.team_id for i in instances}).values_list("team_id", "user_id")
+    for team_id, user_id in memberships:
+        members.setdefault(team_id, []).append(user_id)
+    for inst in instances:
+        payload = instance_payload(inst)
+        for user_id in members.get(inst.team_id, ()):
+            async_to_sync(channel_layer.group_send)(user_group(user_id), {"type": "instance.update", "payload": payload})
+
+
+class BaseProvisioner:
+    def provision(self, inst: TeamServiceInstance, timeout: float) -> str:
+        """
+        Create the instance's workload and block until it is ready; return its endpoint URL.
+        Raise ProvisioningError when it fails or does not become ready within `timeout` seconds.
+        """
+        raise NotImplementedError
+
+    def deprovision(self, instances: List[TeamServiceInstance]) -> int:
+        """
+        Tear down the workloads of stopped instances in as few API calls as possible; returns how many
+        were requested. Errors are the caller's to log; the rows are already stopped.
+        """
+        return 0
+
+    def provision_warm(self, warm: List[WarmInstance]) -> List[WarmInstance]:
+        """
+        Request team-less workloads for new pending warm instances without waiting for them (the
+        operator marks them ready). Returns the ones that could not be requested.
+        """
+        return []
+
+    def adopt_warm(self, inst: TeamServiceInstance) -> None:
+        """
+        Hand the workload of a just-claimed warm instance (inst.cr_name) over to inst's team.
+        """
+
+
+class DevProvisioner(BaseProvisioner):
+    """
+    No infrastructure: the instance is "ready" right away with the same dummy URL run_operator uses.
+    """
+
+    def provision(self, inst: TeamServiceInstance, timeout: float) -> str:
+        return f"http://team-{inst.team_id}.example.local/{inst.challenge.slug}"
+
+
+class K8sProvisioner(BaseProvisioner):
+    """
+    Creates a ChallengeInstance CR (the operator builds its Deployment/Service) and watches that single
+    object until the operator reports phase Ready, instead of polling. CRs carry INSTANCE_ID_LABEL so
+    deprovision() can delete many with one label-selector deletecollection call. Warm-pool CRs are
+    created team-less under their WarmInstance name and labelled when a team claims them.
+    """
+
+    # Label values per deletecollection call; keeps the selector well below URL length limits
+    DELETE_CHUNK = 100
+
+    def __init__(self, namespace: Optional[str] = None, coapi=None, watch_factory: Optional[Callable] = None):
+        self.namespace = namespace or getattr(settings, "INSTANCE_NAMESPACE", "default")
+        self._coapi = coapi
+        self._watch_factory = watch_factory
+
+    @property
+    def coapi(self):
+        if self._coapi is None:
+            from kubernetes import client, config
+
+            try:
+                config.load_incluster_config()
+            except Exception:
+                config.load_kube_config()
+            self._coapi = client.CustomObjectsApi()
+        return self._coapi
+
+    def _watch(self):
+        if self._watch_factory is not None:
+            return self._watch_factory()
+        from kubernetes import watch
+
+        return watch.Watch()
+
+    @staticmethod
+    def cr_name(inst: TeamServiceInstance) -> str:
+        return f"{inst.challenge.slug}-t{inst.team_id}-{inst.id}"[-63:].lstrip("-.")
+
+    def _body(self, inst: TeamServiceInstance, name: str) -> dict:
+        from .k8s import GROUP, VERSION
+
+        return {
+            "apiVersion": f"{GROUP}/{VERSION}",
+            "kind": "ChallengeInstance",
+            "metadata": {"name": name, "namespace": self.namespace, "labels": {INSTANCE_ID_LABEL: str(inst.id)}},
+            "spec": {
+                "templateRef": inst.challenge.slug,
+                "owner": {"teamId": inst.team_id, "eventId": inst.challenge.event_id or 0},
+            },
+        }
+
+    @staticmethod
+    def _ready_url(obj: dict) -> Optional[str]:
+        status = (obj or {}).get("status") or {}
+        if status.get("phase") == "Failed":
+            raise ProvisioningError(status.get("message") or "instance failed")
+        if status.get("phase") == "Ready" and status.get("url"):
+            return status["url"]
+        return None
+
+    def provision(self, inst: TeamServiceInstance, timeout: float) -> str:
+        from kubernetes.client import ApiException
+        from .k8s import GROUP, INST_PLURAL, VERSION
+
+        name = self.cr_name(inst)
+        if inst.cr_name != name:
+            # Recorded before the CR exists, so the operator sync can always match it to this row
+            TeamServiceInstance.objects.filter(id=inst.id).update(cr_name=name)
+            inst.cr_name = name
+        try:
+            obj = self.coapi.create_namespaced_custom_object(GROUP, VERSION, self.namespace, INST_PLURAL, self._body(inst, name))
+        except ApiException as e:
+            if e.status != 409:
+                raise ProvisioningError(f"create {name}: {e.reason}") from e
+            # Retried task: the CR exists already, pick up from its current state
+            obj = self.coapi.get_namespaced_custom_object(GROUP, VERSION, self.namespace, INST_PLURAL, name)
+        url = self._ready_url(obj)
+        if url:
+            return url
+
+        deadline = time.monotonic() + timeout
+        resource_version = ((obj or {}).get("metadata") or {}).get("resourceVersion")
+        while True:
+            remaining = int(deadline - time.monotonic())
+            if remaining <= 0:
+                raise ProvisioningError(f"{name} not ready after {timeout:.0f}s")
+            w = self._watch()
+            try:
+                for ev in w.stream(
+                    self.coapi.list_namespaced_custom_object,
+                    GROUP,
+                    VERSION,
+                    self.namespace,
+                    INST_PLURAL,
+                    field_selector=f"metadata.name={name}",
+                    resource_version=resource_version,
+                    timeout_seconds=remaining,
+                ):
+                    obj = ev.get("raw_object") or ev.get("object") or {}
+                    if ev.get("type") == "DELETED":
+                        raise ProvisioningError(f"{name} was deleted")
+                    resource_version = (obj.get("metadata") or {}).get("resourceVersion", resource_version)
+                    url = self._ready_url(obj)
+                    if url:
+                        return url
+            except ApiException as e:
+                if e.status != 410:
+                    raise ProvisioningError(f"watch {name}: {e.reason}") from e
+                resource_version = None  # expired: restart the watch from the current state
+            finally:
+                w.stop()
+
+
+    def deprovision(self, instances: List[TeamServiceInstance]) -> int:
+        from kubernetes.client import ApiException
+        from .k8s import GROUP, INST_PLURAL, VERSION
+
+        ids = sorted({str(inst.id) for inst in instances})
+        for i in range(0, len(ids), self.DELETE_CHUNK):
+            selector = f"{INSTANCE_ID_LABEL} in ({','.join(ids[i:i + self.DELETE_CHUNK])})"
+            self.coapi.delete_collection_namespaced_custom_object(
+                GROUP, VERSION, self.namespace, INST_PLURAL, label_selector=selector
+            )
+        # Claimed warm instances keep their warm CR name and only carry the label once adopt_warm
+        # succeeded: delete those by name as well
+        for name in sorted({inst.cr_name for inst in instances if inst.cr_name and not self._own_name(inst)}):
+            try:
+                self.coapi.delete_namespaced_custom_object(GROUP, VERSION, self.namespace, INST_PLURAL, name)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+        return len(ids)
+
+    @staticmethod
+    def _own_name(inst: TeamServiceInstance) -> bool:
+        # cr_name() always ends with the team and instance id, whatever the slug length
+        return inst.cr_name.endswith(f"-t{inst.team_id}-{inst.id}")
+
+    def provision_warm(self, warm: List[WarmInstance]) -> List[WarmInstance]:
+        from .k8s import GROUP, INST_PLURAL, VERSION
+
+        failed = []
+        for w in warm:
+            body = {
+                "apiVersion": f"{GROUP}/{VERSION}",
+                "kind": "ChallengeInstance",
+                "metadata": {"name": w.name, "namespace": self.namespace},
+                # No owner.teamId: the operator reports it as a warm instance until adopt_warm sets one
+                "spec": {"templateRef": w.challenge.slug, "owner": {"eventId": w.challenge.event_id or 0}},
+            }
+            try:
+                self.coapi.create_namespaced_custom_object(GROUP, VERSION, self.namespace, INST_PLURAL, body)
+            except Exception as e:
+                if getattr(e, "status", None) == 409:
+                    continue
+                logger.warning("Could not create warm instance %s: %s", w.name, e)
+                failed.append(w)
+        return failed
+
+    def adopt_warm(self, inst: TeamServiceInstance) -> None:
+        from .k8s import GROUP, INST_PLURAL, VERSION
+
+        # Merge patch: the instance-id label makes it deletable like any other instance, and the owner
+        # team rolls the workload once to receive TEAM_ID (the Service, hence the URL, is unchanged)
+        self.coapi.patch_namespaced_custom_object(
+            GROUP,
+            VERSION,
+            self.namespace,
+            INST_PLURAL,
+            inst.cr_name,
+            {"metadata": {"labels": {INSTANCE_ID_LABEL: str(inst.id)}}, "spec": {"owner": {"teamId": inst.team_id}}},
+        )
+
+
+def get_provisioner() -> BaseProvisioner:
+    """
+    INSTANCE_PROVISIONER: "dev" (default), "k8s" or "module:ClassOrFactory".
+    """
+    path = getattr(settings, "INSTANCE_PROVISIONER", "dev") or "dev"
+    if path == "dev":
+        return DevProvisioner()
+    if path == "k8s":
+        return K8sProvisioner()
+    mod_name, attr_name = path.split(":", 1)
+    obj = getattr(import_module(mod_name), attr_name)
+    return obj()
+
+
+def mark_instance_ready(inst: TeamServiceInstance, url: str) -> bool:
+    """
+    Single write moving a pending instance to running (inst is updated in place). False when it was
+    stopped, or already handled by another delivery, while provisioning.
+    """
+    now = timezone.now()
+    updated = TeamServiceInstance.objects.filter(id=inst.id, status=TeamServiceInstance.STATUS_PENDING).update(
+        status=TeamServiceInstance.STATUS_RUNNING, endpoint_url=url, last_check_at=now, last_activity_at=now
+    )
+    if updated:
+        inst.status, inst.endpoint_url, inst.last_check_at = TeamServiceInstance.STATUS_RUNNING, url, now
+    return bool(updated)
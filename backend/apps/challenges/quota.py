@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Challenge, TeamServiceInstance
+from .reaper import idle_timeout_minutes
+
+# Counters (and the spawn lock in views.py) live in the default cache. That is shared only with REDIS_URL set;
+# on the per-process LocMem fallback (dev/tests) every process enforces the quotas on its own.
+
+# Statuses that count against the quotas
+ACTIVE_STATUSES = (TeamServiceInstance.STATUS_PENDING, TeamServiceInstance.STATUS_RUNNING)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def team_limit() -> int:
+    """Concurrent active instances per team across challenges (INSTANCE_QUOTA_PER_TEAM, 0 = unlimited)."""
+    return max(0, int(getattr(settings, "INSTANCE_QUOTA_PER_TEAM", 3)))
+
+
+def challenge_limit(challenge: Challenge) -> int:
+    """Concurrent active instances of a challenge across teams (checker_config["max_instances"], 0 = unlimited)."""
+    try:
+        return max(0, int((challenge.checker_config or {}).get("max_instances", 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ttl() -> int:
+    # Counters are recounted from the table after this long, healing drift from writes that bypass release()
+    return int(getattr(settings, "INSTANCE_QUOTA_COUNTER_TTL", 300))
+
+
+def team_key(team_id: int) -> str:
+    return f"instq:team:{team_id}"
+
+
+def challenge_key(challenge_id: int) -> str:
+    return f"instq:chal:{challenge_id}"
+
+
+def _ensure(key: str, **filters) -> None:
+    if cache.get(key) is None:
+        count = TeamServiceInstance.objects.filter(status__in=ACTIVE_STATUSES, **filters).count()
+        cache.add(key, count, timeout=_ttl())
+
+
+def _incr(key: str, **filters) -> int:
+    _ensure(key, **filters)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between ensure and incr
+        _ensure(key, **filters)
+        return cache.incr(key)
+
+
+def _decr(key: str) -> None:
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass  # not cached: the next admission recounts
+
+
+def _retry_after(**filters) -> int:
+    """
+    Seconds until the idle reaper frees the soonest instance in scope (bounded), as a Retry-After hint.
+    """
+    default = int(getattr(settings, "INSTANCE_QUOTA_RETRY_AFTER_SECONDS", 60))
+    inst = (
+        TeamServiceInstance.objects.filter(status__in=ACTIVE_STATUSES, **filters)
+        .select_related("challenge")
+        .only("last_activity_at", "challenge__checker_config")
+        .order_by("last_activity_at")
+        .first()
+    )
+    if inst is None:
+        return default
+    minutes = idle_timeout_minutes(inst.challenge)
+    if not minutes:
+        return default
+    wait = (inst.last_activity_at + timedelta(minutes=minutes) - timezone.now()).total_seconds()
+    return int(min(max(wait, 5), 3600))
+
+
+def admit(team_id: int, challenge: Challenge) -> None:
+    """
+    Reserve one slot in the team and challenge quotas (atomic cache INCR, rolled back when over the
+    limit). Raises QuotaExceeded with a retry hint; no COUNT runs while the counters are cached.
+    """
+    reserved: List[str] = []
+    try:
+        limit = team_limit()
+        if limit:
+            key = team_key(team_id)
+            reserved.append(key)
+            if _incr(key, team_id=team_id) > limit:
+                raise QuotaExceeded(
+                    f"Your team already runs {limit} instance(s); stop one first.", _retry_after(team_id=team_id)
+                )
+        limit = challenge_limit(challenge)
+        if limit:
+            key = challenge_key(challenge.id)
+            reserved.append(key)
+            if _incr(key, challenge_id=challenge.id) > limit:
+                raise QuotaExceeded(
+                    "This challenge is at capacity.", _retry_after(challenge_id=challenge.id)
+                )
+    except QuotaExceeded:
+        for key in reserved:
+            _decr(key)
+        raise
+
+
+def release(instances: Iterable[Tuple[int, int]]) -> None:
+    """
+    Give back slots of instances that left an active status: (team_id, challenge_id) pairs.
+    """
+    for team_id, challenge_id in instances:
+        if team_limit():
+            _decr(team_key(team_id))
+        _decr(challenge_key(challenge_id))
+
+
+def invalidate(instances: Iterable[Tuple[int, int]]) -> None:
+    """
+    Drop the counters of the given (team_id, challenge_id) pairs so the next admission recounts;
+    for bulk transitions where the previous status is not known.
+    """
+    keys = set()
+    for team_id, challenge_id in instances:
+        keys.update((team_key(team_id), challenge_key(challenge_id)))
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def active_instance(team_id: int, challenge_id: int) -> Optional[TeamServiceInstance]:
+    """The team's pending or running instance of the challenge, if any (for idempotent spawns)."""
+    return (
+        TeamServiceInstance.objects.filter(team_id=team_id, challenge_id=challenge_id, status__in=ACTIVE_STATUSES)
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def await_active_instance(team_id: int, challenge_id: int, timeout: float, interval: float = 0.1) -> Optional[TeamServiceInstance]:
+    """
+    active_instance(), re-checked every `interval` seconds for up to `timeout` seconds: a concurrent
+    spawn holding the per-(team, challenge) lock commits its row well within that.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        inst = active_instance(team_id, challenge_id)
+        if inst is not None or time.monotonic() >= deadline:
+            return inst
+        time.sleep(interval)
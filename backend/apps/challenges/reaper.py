@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Challenge, TeamServiceInstance
+
+# Instances in these states hold cluster capacity and can go idle
+REAPABLE_STATUSES = (TeamServiceInstance.STATUS_RUNNING, TeamServiceInstance.STATUS_ERROR)
+
+
+def idle_timeout_minutes(challenge: Challenge) -> int:
+    """
+    Idle threshold for a challenge's instances: checker_config["idle_timeout_minutes"], falling back to
+    INSTANCE_IDLE_TIMEOUT_MINUTES. 0 disables reaping for the challenge.
+    """
+    default = int(getattr(settings, "INSTANCE_IDLE_TIMEOUT_MINUTES", 60))
+    try:
+        return max(0, int((challenge.checker_config or {}).get("idle_timeout_minutes", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def record_activity(instance_ids: List[int], at: Optional[datetime] = None) -> int:
+    """
+    Mark instances as active (ingress hits reported in bulk); one UPDATE per call.
+    """
+    if not instance_ids:
+        return 0
+    return TeamServiceInstance.objects.filter(id__in=instance_ids, status__in=REAPABLE_STATUSES).update(
+        last_activity_at=at or timezone.now()
+    )
+
+
+def reap_idle_instances(now: Optional[datetime] = None, batch_size: int = 500, max_instances: int = 5000) -> List[TeamServiceInstance]:
+    """
+    Stop instances of instance_required challenges whose last_activity_at is older than the
+    challenge's idle threshold. Challenges sharing a threshold are reaped together, so a pass costs a
+    few queries per distinct threshold and batch, independent of how many instances are idle.
+    Returns the stopped instances (with challenge loaded) for deprovisioning and notification.
+    """
+    now = now or timezone.now()
+    by_threshold: Dict[int, List[int]] = {}
+    for c in Challenge.objects.filter(instance_required=True).only("id", "checker_config"):
+        minutes = idle_timeout_minutes(c)
+        if minutes:
+            by_threshold.setdefault(minutes, []).append(c.id)
+
+    reaped: List[TeamServiceInstance] = []
+    for minutes, challenge_ids in sorted(by_threshold.items()):
+        cutoff = now - timedelta(minutes=minutes)
+        idle = TeamServiceInstance.objects.filter(
+            challenge_id__in=challenge_ids, status__in=REAPABLE_STATUSES, last_activity_at__lt=cutoff
+        )
+        while len(reaped) < max_instances:
+            ids = list(idle.order_by("last_activity_at").values_list("id", flat=True)[: min(batch_size, max_instances - len(reaped))])
+            if not ids:
+                break
+            # Same predicate again: activity recorded since the select keeps the instance alive
+            TeamServiceInstance.objects.filter(
+                id__in=ids, status__in=REAPABLE_STATUSES, last_activity_at__lt=cutoff
+            ).update(status=TeamServiceInstance.STATUS_STOPPED, endpoint_url="", last_check_at=now)
+            stopped = list(
+                TeamServiceInstance.objects.filter(
+                    id__in=ids, status=TeamServiceInstance.STATUS_STOPPED, last_check_at=now
+                ).select_related("challenge")
+            )
+            reaped.extend(stopped)
+            if len(ids) < batch_size:
+                break
+    return reaped
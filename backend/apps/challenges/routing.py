@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from django.conf import settings
+
+RUN_TICK_TASK = "apps.challenges.tasks.run_tick"
+PROVISION_TASK = "apps.challenges.tasks.provision_instance"
+
+
+def tick_queue_for(challenge_id: int) -> str:
+    """
+    Dedicated tick queue for a challenge, sharded by id: "<TICK_QUEUE_PREFIX>.<challenge_id % TICK_QUEUE_SHARDS>".
+    """
+    shards = max(1, int(getattr(settings, "TICK_QUEUE_SHARDS", 4)))
+    prefix = getattr(settings, "TICK_QUEUE_PREFIX", "ticks")
+    return f"{prefix}.{int(challenge_id) % shards}"
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (CELERY_TASK_ROUTES): send run_tick to its challenge's tick queue so slow
+    AD checks never share a queue with KotH ticks of other shards or with regular background work.
+    provision_instance waits for readiness, so it gets a queue of its own (PROVISIONING_QUEUE) and a
+    spawn burst cannot starve the default queue.
+    """
+    if name == PROVISION_TASK:
+        return {"queue": getattr(settings, "PROVISIONING_QUEUE", "provisioning")}
+    if name != RUN_TICK_TASK:
+        return None
+    challenge_id = args[0] if args else (kwargs or {}).get("challenge_id")
+    if challenge_id is None:
+        return None
+    return {"queue": tick_queue_for(challenge_id)}
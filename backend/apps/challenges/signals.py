@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .koth import refresh_koth_status
 from .models import AttackEvent, OwnershipEvent, TeamServiceInstance
 
 
@@ -51,6 +53,14 @@ def broadcast_attack_event(sender, instance: AttackEvent, created: bool, **kwarg
         pass
 
 
+@receiver(post_save, sender=OwnershipEvent)
+@receiver(post_delete, sender=OwnershipEvent)
+def refresh_koth_status_on_change(sender, instance: OwnershipEvent, **kwargs):
+    # Re-materialize the cached hill owner once the change is committed (admin edits included)
+    challenge_id = instance.challenge_id
+    transaction.on_commit(lambda: refresh_koth_status(challenge_id))
+
+
 @receiver(post_save, sender=OwnershipEvent)
 def broadcast_koth_update(sender, instance: OwnershipEvent, created: bool, **kwargs):
     payload = {
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import inspect
+import logging
 import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import timedelta
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List
 
 import requests
 from celery import shared_task
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from .checkers import get_checker
 
+from apps.core import locks
 from apps.core.models import ScoreEvent
 from .models import (
     Challenge,
@@ -17,7 +23,18 @@ from .models import (
     DefenseToken,
     Challenge as ChallengeModel,
     OwnershipEvent,
+    CheckResult,
+    ServiceSLA,
+    KothHoldTotal,
 )
+from .koth import cache_koth_status
+from .tokens import index_defense_tokens, prune_defense_tokens_for
+from .warmpool import refill_pool
+from .provisioning import get_provisioner, mark_instance_ready, notify_instances, notify_team_instance
+from .reaper import reap_idle_instances
+from .quota import invalidate as invalidate_quota, release as release_quota
+
+logger = logging.getLogger(__name__)
 
 
 def _http_probe(url: str, timeout: float = 3.0) -> Tuple[bool, Optional[str]]:
@@ -30,149 +47,501 @@ def _http_probe(url: str, timeout: float = 3.0) -> Tuple[bool, Optional[str]]:
         return False, None
 
 
-def _run_checker(instance: TeamServiceInstance, config: dict) -> bool:
+def _compute_koth_owner(
+    instances: List[TeamServiceInstance], config: dict, current_owner: Optional[int] = None, seed: int = 0
+) -> Optional[int]:
     """
-    Delegate to pluggable checker (default HttpChecker).
+    Delegate KotH ownership detection to pluggable checker (default HttpChecker). The tie-break inputs
+    are only passed to checkers whose koth_owner accepts them; older plugins keep the
+    koth_owner(instances, config) contract.
     """
     checker = get_checker(config or {})
-    return checker.health_ok(instance, config or {})
+    if _takes_tie_break(checker.koth_owner):
+        return checker.koth_owner(instances, config or {}, current_owner=current_owner, seed=seed)
+    return checker.koth_owner(instances, config or {})
 
 
-def _compute_koth_owner(instances: List[TeamServiceInstance], config: dict) -> Optional[int]:
+def _takes_tie_break(fn) -> bool:
+    try:
+        params = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return True
+    return "current_owner" in params and "seed" in params
+
+
+def _record_check_results(challenge_id: int, tick_index: int, results: Dict[int, Tuple[int, int]]) -> None:
     """
-    Delegate KotH ownership detection to pluggable checker (default HttpChecker).
+    Persist per-team check outcomes for a tick and roll them into ServiceSLA.
+    results: team_id -> (CheckResult status, latency_ms). Uses a fixed number of queries
+    regardless of team count; re-running the same tick does not double count.
     """
-    checker = get_checker(config or {})
-    return checker.koth_owner(instances, config or {})
+    if not results:
+        return
+    CheckResult.objects.bulk_create(
+        [
+            CheckResult(challenge_id=challenge_id, team_id=team_id, tick=tick_index, status=st, latency_ms=lat)
+            for team_id, (st, lat) in results.items()
+        ],
+        ignore_conflicts=True,
+    )
+    ServiceSLA.objects.bulk_create(
+        [ServiceSLA(challenge_id=challenge_id, team_id=team_id) for team_id in results],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    by_status: Dict[int, List[int]] = {}
+    for team_id, (st, _lat) in results.items():
+        by_status.setdefault(st, []).append(team_id)
+    for st, team_ids in by_status.items():
+        ServiceSLA.objects.filter(
+            challenge_id=challenge_id, team_id__in=team_ids, last_tick__lt=tick_index
+        ).update(
+            ticks_total=F("ticks_total") + 1,
+            ticks_up=F("ticks_up") + (1 if st == CheckResult.STATUS_UP else 0),
+            last_tick=tick_index,
+            last_status=st,
+            updated_at=now,
+        )
 
 
-def mint_defense_token(team_id: int, challenge: ChallengeModel, instance: Optional[TeamServiceInstance], tick_index: int) -> DefenseToken:
+def mint_defense_tokens(challenge: ChallengeModel, tick_index: int, placed: List[Tuple[int, Optional[TeamServiceInstance], str]]) -> List[DefenseToken]:
     """
-    Create a defense token for a team/challenge at a specific tick. The token expires after tick_seconds.
+    Store the flags placed at a tick as defense tokens ((team_id, instance, token) triples), valid for
+    tick_seconds, and add them to the hot lookup index.
     """
-    token = secrets.token_urlsafe(32)
     now = timezone.now()
     expires = now + timedelta(seconds=challenge.tick_seconds)
-    dt = DefenseToken.objects.create(
-        team_id=team_id,
-        challenge=challenge,
-        instance=instance,
-        tick=tick_index,
-        token=token,
-        minted_at=now,
-        expires_at=expires,
+    minted = DefenseToken.objects.bulk_create(
+        [
+            DefenseToken(
+                team_id=team_id,
+                challenge=challenge,
+                instance=instance,
+                tick=tick_index,
+                token=token,
+                minted_at=now,
+                expires_at=expires,
+            )
+            for team_id, instance, token in placed
+        ]
     )
-    return dt
+    index_defense_tokens(minted)
+    return minted
 
 
-@shared_task
-def run_tick(challenge_id: int, tick_index: int):
+def _phase_timeout(config: dict, phase: str) -> float:
+    return float(((config or {}).get("phase_timeouts") or {}).get(phase, 3.0))
+
+
+def _check_instance(checker, inst: TeamServiceInstance, config: dict, tick_index: int, flag: str, old_flag: Optional[Tuple[int, str]]) -> Tuple[int, bool]:
+    """
+    Run one team's checks for a tick and map the outcome onto a CheckResult status, plus whether this
+    tick's flag now lives on the service.
+    Without flag phases this is a plain health check (the flag counts as placed when up). With them:
+    put this tick's flag (failure => DOWN), read back the flag placed at an earlier tick (failure =>
+    CORRUPT), then havoc (failure => MUMBLE). Executed in a worker thread; no ORM access here.
+    """
+    placed = False
+    try:
+        if not checker.has_flag_phases(config):
+            up = checker.health_ok(inst, config)
+            return (CheckResult.STATUS_UP if up else CheckResult.STATUS_DOWN), up
+        if not checker.put_flag(inst, tick_index, flag, config, _phase_timeout(config, "put")):
+            return CheckResult.STATUS_DOWN, False
+        placed = True
+        if old_flag and not checker.get_flag(inst, old_flag[0], old_flag[1], config, _phase_timeout(config, "get")):
+            return CheckResult.STATUS_CORRUPT, placed
+        if config.get("havoc", True) and not checker.havoc(inst, config, _phase_timeout(config, "havoc")):
+            return CheckResult.STATUS_MUMBLE, placed
+        return CheckResult.STATUS_UP, placed
+    except Exception:
+        return CheckResult.STATUS_ERROR, placed
+
+
+def _run_ad_tick(challenge: Challenge, tick_index: int) -> None:
+    """
+    Attack-Defense tick: check every running instance concurrently within the tick budget,
+    store every flag that was placed as a defense token (even when a later phase failed, so it
+    stays stealable and is read back next tick), award defense points to teams that are up and
+    record per-team results.
+    Config (checker_config): ad_defense_points, checker_concurrency, tick_budget_seconds
+    (default 80% of tick_seconds), phase_timeouts {put,get,havoc}, flag_lookback_ticks, havoc.
+    """
+    config = challenge.checker_config or {}
+    challenge_id = challenge.id
+    points_def = int(config.get("ad_defense_points", 5))
+    instances = list(
+        TeamServiceInstance.objects.filter(challenge_id=challenge_id, status=TeamServiceInstance.STATUS_RUNNING)
+    )
+    if not instances:
+        return
+    checker = get_checker(config)
+
+    # Flags placed k ticks ago, one indexed query for all teams
+    lookback = int(config.get("flag_lookback_ticks", 1))
+    old_flags: Dict[int, Tuple[int, str]] = {}
+    if lookback > 0 and tick_index - lookback >= 0:
+        for team_id, tick, token in DefenseToken.objects.filter(
+            challenge_id=challenge_id, tick=tick_index - lookback
+        ).values_list("team_id", "tick", "token"):
+            old_flags[team_id] = (tick, token)
+
+    new_flags = {inst.id: secrets.token_urlsafe(32) for inst in instances}
+    budget = float(config.get("tick_budget_seconds", max(1.0, challenge.tick_seconds * 0.8)))
+
+    from apps.core.metrics import tick_check_latency_seconds, tick_checks_in_flight
+    label = str(challenge_id)
+
+    def _timed(inst: TeamServiceInstance) -> Tuple[int, bool, int]:
+        started = time.monotonic()
+        try:
+            tick_checks_in_flight.labels(challenge=label).inc()
+        except Exception:
+            pass
+        try:
+            st, placed = _check_instance(checker, inst, config, tick_index, new_flags[inst.id], old_flags.get(inst.team_id))
+        finally:
+            elapsed = time.monotonic() - started
+            try:
+                tick_checks_in_flight.labels(challenge=label).dec()
+                tick_check_latency_seconds.labels(challenge=label).observe(elapsed)
+            except Exception:
+                pass
+        return st, placed, int(elapsed * 1000)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(instances), int(config.get("checker_concurrency", 32)))))
+    futures = {executor.submit(_timed, inst): inst for inst in instances}
+    wait(futures, timeout=budget)
+    # Do not block the tick on stragglers; their own phase timeouts bound them
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    # team_id -> (status, latency_ms, instance). A team with several instances counts as up if any is up.
+    results: Dict[int, Tuple[int, int, TeamServiceInstance]] = {}
+    placed_flags: List[Tuple[int, TeamServiceInstance, str]] = []
+    for fut, inst in futures.items():
+        if fut.done() and not fut.cancelled():
+            st, placed, latency_ms = fut.result()
+        else:
+            st, placed, latency_ms = CheckResult.STATUS_ERROR, False, int(budget * 1000)
+        if placed:
+            placed_flags.append((inst.team_id, inst, new_flags[inst.id]))
+        prev = results.get(inst.team_id)
+        if prev is None or prev[0] != CheckResult.STATUS_UP:
+            results[inst.team_id] = (st, latency_ms, inst)
+
+    now = timezone.now()
+    TeamServiceInstance.objects.filter(id__in=[inst.id for inst in instances]).update(last_check_at=now, last_activity_at=now)
+    for inst in instances:
+        inst.last_check_at = now
+
+    mint_defense_tokens(challenge, tick_index, placed_flags)
+    up = [team_id for team_id, (st, _lat, _inst) in results.items() if st == CheckResult.STATUS_UP]
+    from apps.core.metrics import ad_defense_uptime_ticks_total
+    for team_id in up:
+        try:
+            ad_defense_uptime_ticks_total.inc()
+        except Exception:
+            pass
+        ScoreEvent.objects.create(
+            team_id=team_id,
+            user=None,
+            challenge_id=challenge_id,
+            type=ScoreEvent.TYPE_AD_DEFENSE_UPTIME,
+            delta=points_def,
+            metadata={"tick": tick_index},
+        )
+    _record_check_results(challenge_id, tick_index, {team_id: (st, lat) for team_id, (st, lat, _i) in results.items()})
+
+    # Broadcast status update to AD group
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    payload = [
+        {
+            "team_id": inst.team_id,
+            "status": inst.status,
+            "endpoint_url": inst.endpoint_url,
+            "last_check_at": inst.last_check_at.isoformat() if inst.last_check_at else None,
+        }
+        for inst in instances
+    ]
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f"ad.status.{challenge_id}",
+            {"type": "status.update", "payload": payload},
+        )
+    except Exception:
+        pass
+
+
+@shared_task(bind=True)
+def run_tick(self, challenge_id: int, tick_index: int):
     """
     Periodic tick for multi-mode challenges.
     - ATTACK_DEFENSE: award defense uptime and mint tokens per team instance.
     - KOTH: detect current owner; award hold points and handle ownership transitions.
+    At most one tick per challenge runs at a time; a tick arriving while another is in
+    flight is retried shortly after (or skipped when called directly).
     """
     try:
         challenge = Challenge.objects.get(id=challenge_id)
     except Challenge.DoesNotExist:
         return
+    if challenge.mode not in (Challenge.MODE_ATTACK_DEFENSE, Challenge.MODE_KOTH):
+        return
+
+    # Needs LOCK_REDIS_URL (REDIS_URL) to exclude ticks across worker processes; see apps/core/locks.py
+    lock_key = f"koth_ad:tick_lock:{challenge_id}"
+    lock_token = locks.acquire(lock_key, max(60, challenge.tick_seconds * 2))
+    if lock_token is None:
+        if self.request.called_directly:
+            return
+        raise self.retry(countdown=1, max_retries=max(1, challenge.tick_seconds))
+    try:
+        _run_tick_locked(challenge, tick_index)
+    finally:
+        locks.release(lock_key, lock_token)
+
+
+def _run_tick_locked(challenge: Challenge, tick_index: int) -> None:
+    from apps.core.metrics import tick_duration_seconds, tick_schedule_lag_seconds, tick_last_completed
 
+    label = str(challenge.id)
+    if challenge.released_at and challenge.tick_seconds > 0:
+        nominal = challenge.released_at + timedelta(seconds=tick_index * challenge.tick_seconds)
+        try:
+            tick_schedule_lag_seconds.labels(challenge=label).observe(max(0.0, (timezone.now() - nominal).total_seconds()))
+        except Exception:
+            pass
+
+    started = time.monotonic()
     if challenge.mode == Challenge.MODE_ATTACK_DEFENSE:
-        points_def = int((challenge.checker_config or {}).get("ad_defense_points", 5))
-        instances = TeamServiceInstance.objects.filter(challenge_id=challenge_id, status=TeamServiceInstance.STATUS_RUNNING)
-        any_update = False
-        for inst in instances:
-            ok = _run_checker(inst, challenge.checker_config or {})
-            inst.last_check_at = timezone.now()
-            inst.save(update_fields=["last_check_at"])
-            any_update = True
-            if ok:
-                from apps.core.metrics import ad_defense_uptime_ticks_total
-                try:
-                    ad_defense_uptime_ticks_total.inc()
-                except Exception:
-                    pass
-                ScoreEvent.objects.create(
-                    team_id=inst.team_id,
-                    user=None,
-                    challenge_id=challenge_id,
-                    type=ScoreEvent.TYPE_AD_DEFENSE_UPTIME,
-                    delta=points_def,
-                    metadata={"tick": tick_index},
-                )
-                mint_defense_token(inst.team_id, challenge, inst, tick_index)
-        # Broadcast status update to AD group
-        if any_update:
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            payload = [
-                {
-                    "team_id": inst.team_id,
-                    "status": inst.status,
-                    "endpoint_url": inst.endpoint_url,
-                    "last_check_at": inst.last_check_at.isoformat() if inst.last_check_at else None,
-                }
-                for inst in instances
-            ]
-            try:
-                async_to_sync(get_channel_layer().group_send)(
-                    f"ad.status.{challenge_id}",
-                    {"type": "status.update", "payload": payload},
-                )
-            except Exception:
-                pass
+        _run_ad_tick(challenge, tick_index)
+    else:
+        _run_koth_tick(challenge, tick_index)
+    try:
+        tick_duration_seconds.labels(challenge=label).observe(time.monotonic() - started)
+        tick_last_completed.labels(challenge=label).set(tick_index)
+    except Exception:
+        pass
 
-    elif challenge.mode == Challenge.MODE_KOTH:
-        instances = TeamServiceInstance.objects.filter(challenge_id=challenge_id, status=TeamServiceInstance.STATUS_RUNNING)
-        owner_team_id = _compute_koth_owner(list(instances), challenge.checker_config or {})
-        points_hold = int((challenge.checker_config or {}).get("koth_points_per_tick", 5))
-        if owner_team_id:
-            # Award hold points
-            from apps.core.metrics import koth_hold_ticks_total
-            try:
-                koth_hold_ticks_total.inc()
-            except Exception:
-                pass
-            ScoreEvent.objects.create(
-                team_id=owner_team_id,
-                user=None,
-                challenge_id=challenge_id,
-                type=ScoreEvent.TYPE_KOTH_HOLD,
-                delta=points_hold,
-                metadata={"tick": tick_index},
+
+def _run_koth_tick(challenge: Challenge, tick_index: int) -> None:
+    """
+    KotH tick: detect the current owner, award hold points and record ownership transitions.
+    The owner and its from_ts are cached for the status endpoint and WebSocket consumer.
+    """
+    challenge_id = challenge.id
+    instances = list(
+        TeamServiceInstance.objects.filter(challenge_id=challenge_id, status=TeamServiceInstance.STATUS_RUNNING).select_related("team")
+    )
+    current_owner = (
+        OwnershipEvent.objects.filter(challenge_id=challenge_id, to_ts__isnull=True)
+        .order_by("-from_ts")
+        .values_list("owner_team_id", flat=True)
+        .first()
+    )
+    probe_started = timezone.now()
+    owner_team_id = _compute_koth_owner(instances, challenge.checker_config or {}, current_owner, tick_index)
+    probed = [inst.id for inst in instances if inst.last_check_at and inst.last_check_at >= probe_started]
+    if probed:
+        probed_at = timezone.now()
+        TeamServiceInstance.objects.filter(id__in=probed).update(last_check_at=probed_at, last_activity_at=probed_at)
+    points_hold = int((challenge.checker_config or {}).get("koth_points_per_tick", 5))
+    if owner_team_id:
+        # Award hold points
+        from apps.core.metrics import koth_hold_ticks_total
+        try:
+            koth_hold_ticks_total.inc()
+        except Exception:
+            pass
+        ScoreEvent.objects.create(
+            team_id=owner_team_id,
+            user=None,
+            challenge_id=challenge_id,
+            type=ScoreEvent.TYPE_KOTH_HOLD,
+            delta=points_hold,
+            metadata={"tick": tick_index},
+        )
+        # Handle ownership transitions (close previous, add new if changed) and roll them into KothHoldTotal
+        with transaction.atomic():
+            prev = OwnershipEvent.objects.filter(challenge_id=challenge_id, to_ts__isnull=True).order_by("-from_ts").first()
+            now = timezone.now()
+            from_ts = prev.from_ts if prev else now
+            team_ids = {owner_team_id} | ({prev.owner_team_id} if prev else set())
+            KothHoldTotal.objects.bulk_create(
+                [KothHoldTotal(challenge_id=challenge_id, team_id=t) for t in team_ids], ignore_conflicts=True
             )
-            # Handle ownership transitions (close previous, add new if changed)
-            with transaction.atomic():
-                prev = OwnershipEvent.objects.filter(challenge_id=challenge_id, to_ts__isnull=True).order_by("-from_ts").first()
-                now = timezone.now()
-                if prev and prev.owner_team_id != owner_team_id:
-                    prev.to_ts = now
-                    prev.save(update_fields=["to_ts"])
-                    OwnershipEvent.objects.create(challenge_id=challenge_id, owner_team_id=owner_team_id, from_ts=now, points_awarded=0)
-                elif not prev:
-                    OwnershipEvent.objects.create(challenge_id=challenge_id, owner_team_id=owner_team_id, from_ts=now, points_awarded=0)
+            if prev and prev.owner_team_id != owner_team_id:
+                prev.to_ts = now
+                prev.save(update_fields=["to_ts"])
+                KothHoldTotal.objects.filter(challenge_id=challenge_id, team_id=prev.owner_team_id).update(
+                    hold_seconds=F("hold_seconds") + (now - prev.from_ts).total_seconds(), updated_at=now
+                )
+                OwnershipEvent.objects.create(challenge_id=challenge_id, owner_team_id=owner_team_id, from_ts=now, points_awarded=0)
+                from_ts = now
+            elif not prev:
+                OwnershipEvent.objects.create(challenge_id=challenge_id, owner_team_id=owner_team_id, from_ts=now, points_awarded=0)
+            counted = KothHoldTotal.objects.filter(
+                challenge_id=challenge_id, team_id=owner_team_id, last_tick__lt=tick_index
+            ).update(hold_ticks=F("hold_ticks") + 1, points=F("points") + points_hold, last_tick=tick_index, updated_at=now)
+            if counted:
+                OwnershipEvent.objects.filter(challenge_id=challenge_id, owner_team_id=owner_team_id, to_ts__isnull=True).update(
+                    points_awarded=F("points_awarded") + points_hold
+                )
+        names = {inst.team_id: inst.team.name for inst in instances}
+        cache_koth_status(challenge_id, owner_team_id, names.get(owner_team_id), from_ts)
 
 
 @shared_task
 def schedule_ticks():
     """
-    Periodic scheduler that computes the current tick for each AD/KotH challenge
-    and dispatches run_tick for new ticks since the last processed tick.
+    Beat-driven dispatcher for AD/KotH ticks. Each run enqueues every tick whose boundary
+    (released_at + n * tick_seconds) falls before the next scheduler run, with an ETA at that
+    exact boundary, on the challenge's dedicated tick queue. Overdue ticks (e.g. after
+    downtime) are sent immediately and in order. Without scheduler state for a challenge
+    (first run, lost cache) dispatching resumes at the current tick instead of replaying history.
     """
+    from django.conf import settings
+    from django.core.cache import cache
+    from .routing import tick_queue_for
+
     now = timezone.now()
-    challenges = Challenge.objects.exclude(mode=Challenge.MODE_JEOPARDY)
+    horizon = now + timedelta(seconds=getattr(settings, "TICK_SCHEDULER_INTERVAL_SECONDS", 30))
+    challenges = Challenge.objects.exclude(mode=Challenge.MODE_JEOPARDY).only("id", "released_at", "tick_seconds")
     for c in challenges:
-        if not c.released_at or c.tick_seconds <= 0:
+        if not c.released_at or c.tick_seconds <= 0 or c.released_at > horizon:
             continue
-        # Compute current tick based on release time
-        elapsed = (now - c.released_at).total_seconds()
-        current_tick = int(elapsed // c.tick_seconds)
-        # Store last processed tick in cache keyed by challenge id
-        from django.core.cache import cache
+        current_tick = int((now - c.released_at).total_seconds() // c.tick_seconds)
+        last_due = int((horizon - c.released_at).total_seconds() // c.tick_seconds)
         key = f"koth_ad:last_tick:{c.id}"
-        last_tick = cache.get(key, -1)
-        if current_tick > last_tick:
-            # Dispatch ticks sequentially to avoid skipping (in case of downtime)
-            for t in range(last_tick + 1, current_tick + 1):
-                run_tick.delay(c.id, t)
-            cache.set(key, current_tick, timeout=c.tick_seconds * 5)
\ No newline at end of file
+        last_dispatched = cache.get(key)
+        if last_dispatched is None:
+            last_dispatched = current_tick - 1
+        if last_due <= last_dispatched:
+            continue
+        queue = tick_queue_for(c.id)
+        for t in range(max(0, last_dispatched + 1), last_due + 1):
+            eta = c.released_at + timedelta(seconds=t * c.tick_seconds)
+            run_tick.apply_async((c.id, t), eta=eta if eta > now else None, queue=queue)
+        cache.set(key, last_due, timeout=None)
+
+
+@shared_task
+def prune_defense_tokens():
+    """
+    Retention for DefenseToken: drop tokens past expires_at + DEFENSE_TOKEN_GRACE_SECONDS that the
+    checker no longer reads back (flag_lookback_ticks). Runs from beat; safe to run concurrently.
+    """
+    from apps.core.metrics import defense_tokens_pruned_total
+
+    total = 0
+    for c in Challenge.objects.filter(mode=Challenge.MODE_ATTACK_DEFENSE).only("id", "released_at", "tick_seconds", "checker_config"):
+        total += prune_defense_tokens_for(c)
+    try:
+        defense_tokens_pruned_total.inc(total)
+    except Exception:
+        pass
+    return total
+
+
+@shared_task
+def refill_warm_pools(challenge_id: Optional[int] = None):
+    """
+    Keep checker_config["warm_pool_size"] pending/ready WarmInstances per instance_required challenge
+    (or just `challenge_id`), requesting their workloads from the provisioner. Runs from beat and after
+    each warm claim; the operator marks them ready.
+    """
+    qs = Challenge.objects.filter(instance_required=True).only(
+        "id", "slug", "event_id", "instance_required", "checker_config"
+    )
+    if challenge_id is not None:
+        qs = qs.filter(id=challenge_id)
+    return sum(refill_pool(c) for c in qs)
+
+
+@shared_task
+def provision_instance(instance_id: int):
+    """
+    Provision a pending TeamServiceInstance: create its workload, wait for readiness (watch, not sleep),
+    write the row once and push the result to the team's members over their /ws/me channel.
+    """
+    from django.conf import settings
+    from apps.core.metrics import instance_provision_seconds
+
+    inst = (
+        TeamServiceInstance.objects.filter(id=instance_id, status=TeamServiceInstance.STATUS_PENDING)
+        .select_related("challenge")
+        .first()
+    )
+    if inst is None:
+        return None
+    timeout = float(getattr(settings, "INSTANCE_READY_TIMEOUT_SECONDS", 300))
+    try:
+        url = get_provisioner().provision(inst, timeout)
+    except Exception:
+        # ProvisioningError (failed/timed out) or an unreachable API: never leave the row pending
+        url = None
+    if url is not None:
+        result = "ready"
+        if not mark_instance_ready(inst, url):
+            # The k8s operator's sync may have marked it running first; a stop wins though
+            inst.refresh_from_db(fields=["status", "endpoint_url", "last_check_at"])
+            if inst.status != TeamServiceInstance.STATUS_RUNNING:
+                result = "cancelled"
+    else:
+        result = "error"
+        if TeamServiceInstance.objects.filter(id=inst.id, status=TeamServiceInstance.STATUS_PENDING).update(
+            status=TeamServiceInstance.STATUS_ERROR, last_check_at=timezone.now()
+        ):
+            inst.status = TeamServiceInstance.STATUS_ERROR
+            release_quota([(inst.team_id, inst.challenge_id)])
+    try:
+        instance_provision_seconds.labels(challenge=str(inst.challenge_id), result=result).observe(
+            max(0.0, (timezone.now() - inst.created_at).total_seconds())
+        )
+    except Exception:
+        pass
+    if result != "cancelled":
+        try:
+            notify_team_instance(inst)
+        except Exception:
+            pass
+    return result
+
+
+@shared_task
+def reap_idle_instances_task():
+    """
+    Idle reaper (beat): stop instances idle past their challenge's threshold, delete their workloads in
+    batches and tell the affected teams over /ws/me.
+    """
+    from django.conf import settings
+    from apps.core.metrics import instances_reaped_total
+
+    reaped = reap_idle_instances(
+        batch_size=int(getattr(settings, "INSTANCE_REAPER_BATCH_SIZE", 500)),
+        max_instances=int(getattr(settings, "INSTANCE_REAPER_MAX_PER_PASS", 5000)),
+    )
+    if not reaped:
+        return 0
+    invalidate_quota({(inst.team_id, inst.challenge_id) for inst in reaped})
+    try:
+        get_provisioner().deprovision(reaped)
+    except Exception:
+        # The rows are stopped already and are not selected again; leftover workloads need manual cleanup
+        logger.exception("Deprovisioning %d reaped instances failed", len(reaped))
+    per_challenge: Dict[int, int] = {}
+    for inst in reaped:
+        per_challenge[inst.challenge_id] = per_challenge.get(inst.challenge_id, 0) + 1
+    try:
+        for cid, n in per_challenge.items():
+            instances_reaped_total.labels(challenge=str(cid)).inc(n)
+    except Exception:
+        pass
+    try:
+        notify_instances(reaped)
+    except Exception:
+        pass
+    return len(reaped)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import time
+from unittest import mock
+
+from django.test import TestCase
+from prometheus_client import REGISTRY
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import ScoreEvent, Team
+from apps.challenges.checkers import BaseChecker
+from apps.challenges.models import Challenge, TeamServiceInstance, CheckResult, ServiceSLA, DefenseToken
+from apps.challenges.tasks import run_tick
+
+
+class _StubChecker(BaseChecker):
+    def __init__(self, up_team_ids):
+        self.up_team_ids = set(up_team_ids)
+
+    def health_ok(self, instance, config):
+        return instance.team_id in self.up_team_ids
+
+
+class _FlagStoreChecker(BaseChecker):
+    """Keeps placed flags per team in memory; teams in `forgetful` lose them."""
+
+    def __init__(self, forgetful=(), slow=(), broken_havoc=()):
+        self.store = {}
+        self.forgetful = set(forgetful)
+        self.slow = set(slow)
+        self.broken_havoc = set(broken_havoc)
+
+    def has_flag_phases(self, config):
+        return True
+
+    def put_flag(self, instance, tick, flag, config, timeout):
+        if instance.team_id in self.slow:
+            time.sleep(1.0)
+        if instance.team_id not in self.forgetful:
+            self.store[(instance.team_id, tick)] = flag
+        return True
+
+    def get_flag(self, instance, tick, flag, config, timeout):
+        return self.store.get((instance.team_id, tick)) == flag
+
+    def havoc(self, instance, config, timeout):
+        return instance.team_id not in self.broken_havoc
+
+
+class ADTickHistoryTests(TestCase):
+    def setUp(self):
+        self.t1 = Team.objects.create(name="alpha", slug="alpha")
+        self.t2 = Team.objects.create(name="bravo", slug="bravo")
+        self.challenge = Challenge.objects.create(
+            title="AD",
+            slug="ad",
+            description="ad",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_ATTACK_DEFENSE,
+            tick_seconds=60,
+            released_at=timezone.now(),
+        )
+        for t in (self.t1, self.t2):
+            TeamServiceInstance.objects.create(
+                team=t, challenge=self.challenge, status=TeamServiceInstance.STATUS_RUNNING, endpoint_url="http://x"
+            )
+
+    def _tick(self, tick, up_team_ids):
+        with mock.patch("apps.challenges.tasks.get_checker", return_value=_StubChecker(up_team_ids)):
+            run_tick(self.challenge.id, tick)
+
+    def test_check_results_and_sla_rollup(self):
+        self._tick(0, [self.t1.id, self.t2.id])
+        self._tick(1, [self.t1.id])
+        self.assertEqual(CheckResult.objects.filter(challenge=self.challenge).count(), 4)
+        self.assertEqual(
+            CheckResult.objects.get(challenge=self.challenge, team=self.t2, tick=1).status, CheckResult.STATUS_DOWN
+        )
+        s1 = ServiceSLA.objects.get(challenge=self.challenge, team=self.t1)
+        s2 = ServiceSLA.objects.get(challenge=self.challenge, team=self.t2)
+        self.assertEqual((s1.ticks_up, s1.ticks_total), (2, 2))
+        self.assertEqual((s2.ticks_up, s2.ticks_total), (1, 2))
+        self.assertEqual(s2.sla_percent, 50.0)
+
+    def test_rerun_tick_does_not_double_count(self):
+        self._tick(0, [self.t1.id])
+        self._tick(0, [self.t1.id])
+        s1 = ServiceSLA.objects.get(challenge=self.challenge, team=self.t1)
+        self.assertEqual(s1.ticks_total, 1)
+        self.assertEqual(CheckResult.objects.filter(challenge=self.challenge, tick=0).count(), 2)
+
+    def test_tick_metrics_exported(self):
+        label = {"challenge": str(self.challenge.id)}
+
+        def sample(name):
+            return REGISTRY.get_sample_value(name, label) or 0
+
+        checks_before = sample("ctf_tick_check_latency_seconds_count")
+        ticks_before = sample("ctf_tick_duration_seconds_count")
+        in_flight_before = sample("ctf_tick_checks_in_flight")
+        self._tick(3, [self.t1.id])
+        self.assertEqual(sample("ctf_tick_last_completed"), 3)
+        self.assertEqual(sample("ctf_tick_check_latency_seconds_count") - checks_before, 2)
+        self.assertEqual(sample("ctf_tick_duration_seconds_count") - ticks_before, 1)
+        self.assertEqual(sample("ctf_tick_checks_in_flight"), in_flight_before)
+
+    def test_sla_endpoint(self):
+        self._tick(0, [self.t1.id])
+        r = APIClient().get(f"/api/ad/{self.challenge.id}/sla")
+        self.assertEqual(r.status_code, 200)
+        rows = {row["team_name"]: row for row in r.data["results"]}
+        self.assertEqual(rows["alpha"]["sla_percent"], 100.0)
+        self.assertEqual(rows["bravo"]["sla_percent"], 0.0)
+
+
+class ADFlagPhaseTests(TestCase):
+    def setUp(self):
+        self.t1 = Team.objects.create(name="alpha", slug="alpha")
+        self.t2 = Team.objects.create(name="bravo", slug="bravo")
+        self.challenge = Challenge.objects.create(
+            title="AD",
+            slug="ad",
+            description="ad",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_ATTACK_DEFENSE,
+            tick_seconds=60,
+            released_at=timezone.now(),
+            checker_config={"tick_budget_seconds": 0.3},
+        )
+        for t in (self.t1, self.t2):
+            TeamServiceInstance.objects.create(
+                team=t, challenge=self.challenge, status=TeamServiceInstance.STATUS_RUNNING, endpoint_url="http://x"
+            )
+
+    def test_lost_flag_marks_corrupt(self):
+        checker = _FlagStoreChecker(forgetful=[self.t2.id])
+        with mock.patch("apps.challenges.tasks.get_checker", return_value=checker):
+            run_tick(self.challenge.id, 0)
+            run_tick(self.challenge.id, 1)
+        # Placed flags are stored as this tick's defense tokens
+        self.assertEqual(DefenseToken.objects.filter(challenge=self.challenge, tick=0).count(), 2)
+        self.assertEqual(
+            CheckResult.objects.get(challenge=self.challenge, team=self.t1, tick=1).status, CheckResult.STATUS_UP
+        )
+        self.assertEqual(
+            CheckResult.objects.get(challenge=self.challenge, team=self.t2, tick=1).status, CheckResult.STATUS_CORRUPT
+        )
+
+    def test_flag_lost_every_tick_stays_corrupt(self):
+        checker = _FlagStoreChecker(forgetful=[self.t2.id])
+        with mock.patch("apps.challenges.tasks.get_checker", return_value=checker):
+            for tick in range(4):
+                run_tick(self.challenge.id, tick)
+        statuses = list(
+            CheckResult.objects.filter(challenge=self.challenge, team=self.t2).order_by("tick").values_list("status", flat=True)
+        )
+        self.assertEqual(statuses[1:], [CheckResult.STATUS_CORRUPT] * 3)
+        self.assertEqual(ServiceSLA.objects.get(challenge=self.challenge, team=self.t2).ticks_up, 1)
+
+    def test_placed_flag_is_stored_but_not_rewarded_when_later_phase_fails(self):
+        checker = _FlagStoreChecker(broken_havoc=[self.t2.id])
+        with mock.patch("apps.challenges.tasks.get_checker", return_value=checker):
+            run_tick(self.challenge.id, 0)
+        self.assertEqual(
+            CheckResult.objects.get(challenge=self.challenge, team=self.t2, tick=0).status, CheckResult.STATUS_MUMBLE
+        )
+        token = DefenseToken.objects.get(challenge=self.challenge, team=self.t2, tick=0)
+        self.assertEqual(token.token, checker.store[(self.t2.id, 0)])
+        self.assertEqual(
+            list(ScoreEvent.objects.filter(challenge_id=self.challenge.id).values_list("team_id", flat=True)), [self.t1.id]
+        )
+
+    def test_tick_budget_bounds_slow_checks(self):
+        checker = _FlagStoreChecker(slow=[self.t2.id])
+        started = time.monotonic()
+        with mock.patch("apps.challenges.tasks.get_checker", return_value=checker):
+            run_tick(self.challenge.id, 0)
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(
+            CheckResult.objects.get(challenge=self.challenge, team=self.t2, tick=0).status, CheckResult.STATUS_ERROR
+        )
+        self.assertFalse(DefenseToken.objects.filter(challenge=self.challenge, team=self.t2).exists())
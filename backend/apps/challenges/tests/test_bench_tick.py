@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from apps.core.models import Team
+from apps.challenges.models import Challenge, CheckResult
+
+
+class BenchTickCommandTests(TransactionTestCase):
+    def test_bench_runs_against_local_stubs_and_cleans_up(self):
+        out = StringIO()
+        call_command("bench_tick", "--teams", "3", "--ticks", "2", "--latency-ms", "0", "--failure-rate", "0", stdout=out)
+        lines = out.getvalue().splitlines()
+        tick_lines = [l for l in lines if l.startswith("tick=")]
+        self.assertEqual(len(tick_lines), 2)
+        self.assertIn("queries=", tick_lines[0])
+        self.assertIn("broadcasts=", tick_lines[0])
+        self.assertIn("stub_requests=6", lines[-1])
+        self.assertFalse(Challenge.objects.filter(slug__startswith="bench-").exists())
+        self.assertFalse(Team.objects.filter(slug__startswith="bench-").exists())
+        self.assertFalse(CheckResult.objects.exists())
+
+    def test_koth_status_bench_reports_cold_and_warm_phases(self):
+        out = StringIO()
+        call_command("bench_koth_status", "--requests", "6", "--concurrency", "2", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("phase=cold requests=6"))
+        self.assertTrue(lines[1].startswith("phase=warm requests=6"))
+        self.assertIn("queries_per_request=0", lines[1])
+        self.assertFalse(Challenge.objects.filter(slug__startswith="bench-").exists())
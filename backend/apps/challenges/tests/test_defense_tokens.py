@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Team, Membership
+from apps.challenges.models import Challenge, DefenseToken, AttackEvent
+from apps.challenges.tasks import mint_defense_tokens, prune_defense_tokens
+from apps.challenges.tokens import lookup_defense_token
+
+
+@override_settings(DEFENSE_TOKEN_GRACE_SECONDS=120)
+class DefenseTokenRetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.t1 = Team.objects.create(name="alpha", slug="alpha")
+        self.t2 = Team.objects.create(name="bravo", slug="bravo")
+        self.challenge = Challenge.objects.create(
+            title="AD",
+            slug="ad",
+            description="ad",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_ATTACK_DEFENSE,
+            tick_seconds=60,
+            released_at=timezone.now() - timedelta(seconds=60 * 10 + 5),
+        )
+
+    def _token(self, tick):
+        minted = self.challenge.released_at + timedelta(seconds=tick * 60)
+        return DefenseToken.objects.create(
+            team=self.t1,
+            challenge=self.challenge,
+            tick=tick,
+            token=f"tok-{tick}",
+            minted_at=minted,
+            expires_at=minted + timedelta(seconds=60),
+        )
+
+    def test_prune_drops_only_tokens_past_grace(self):
+        for tick in range(11):
+            self._token(tick)
+        self.assertEqual(prune_defense_tokens(), 7)
+        # Current tick is 10; ticks 7+ are within expiry + 120 s grace
+        self.assertEqual(
+            sorted(DefenseToken.objects.filter(challenge=self.challenge).values_list("tick", flat=True)), [7, 8, 9, 10]
+        )
+
+    def test_prune_keeps_tokens_checker_reads_back(self):
+        self.challenge.checker_config = {"flag_lookback_ticks": 5}
+        self.challenge.save(update_fields=["checker_config"])
+        for tick in range(11):
+            self._token(tick)
+        prune_defense_tokens()
+        self.assertEqual(DefenseToken.objects.filter(challenge=self.challenge).order_by("tick").first().tick, 5)
+
+    def test_minted_tokens_resolve_from_hot_index(self):
+        [dt] = mint_defense_tokens(self.challenge, 10, [(self.t2.id, None, "tok-t2")])
+        with self.assertNumQueries(0):
+            hot = lookup_defense_token(self.challenge.id, dt.token)
+        self.assertEqual((hot.team_id, hot.tick), (self.t2.id, 10))
+        # Cache miss falls back to the table
+        cache.clear()
+        self.assertEqual(lookup_defense_token(self.challenge.id, dt.token).team_id, self.t2.id)
+        self.assertIsNone(lookup_defense_token(self.challenge.id, "nope"))
+
+    def test_submit_uses_hot_index(self):
+        user = get_user_model().objects.create_user(username="attacker", password="verysecurepass")
+        Membership.objects.create(user=user, team=self.t1)
+        [dt] = mint_defense_tokens(self.challenge, 10, [(self.t2.id, None, "tok-t2")])
+        DefenseToken.objects.filter(id=dt.id).delete()
+        client = APIClient()
+        client.force_authenticate(user)
+        r = client.post(f"/api/ad/{self.challenge.id}/submit", {"token": dt.token}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(AttackEvent.objects.get(challenge=self.challenge).victim_team_id, self.t2.id)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import AuditLog, Team, Membership
+from apps.challenges import penalty
+from apps.challenges.models import Category, Challenge, Submission, hmac_flag
+
+User = get_user_model()
+
+
+@override_settings(
+    THROTTLE_REDIS_URL="",
+    FLAG_PENALTY_FREE_ATTEMPTS=2,
+    FLAG_PENALTY_IP_FREE_ATTEMPTS=4,
+    FLAG_PENALTY_BASE_SECONDS=10,
+    FLAG_PENALTY_MAX_SECONDS=60,
+)
+class FlagPenaltyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="alice", email="a@example.com", password="verysecurepass")
+        self.client.post("/api/auth/login", {"username": "alice", "password": "verysecurepass"}, format="json")
+        self.team = Team.objects.create(name="alpha", slug="alpha", captain=self.user)
+        Membership.objects.create(user=self.user, team=self.team, role=Membership.ROLE_CAPTAIN)
+        cat = Category.objects.create(name="Web", slug="web")
+        self.challenge = Challenge.objects.create(
+            title="Sample",
+            slug="sample",
+            description="desc",
+            category=cat,
+            points_min=50,
+            points_max=500,
+            released_at=timezone.now(),
+            flag_hmac=hmac_flag("CTF{demo}"),
+        )
+        self.url = f"/api/challenges/{self.challenge.id}/submit"
+
+    def _submit(self, flag="CTF{nope}", client=None):
+        return (client or self.client).post(self.url, {"flag": flag}, format="json")
+
+    def test_backoff_doubles_up_to_cap(self):
+        self.assertEqual([penalty.penalty_seconds(penalty.KIND_TEAM, n) for n in range(1, 8)], [0, 0, 10, 20, 40, 60, 60])
+        self.assertEqual(penalty.penalty_seconds(penalty.KIND_IP, 4), 0)
+        self.assertEqual(penalty.penalty_seconds(penalty.KIND_IP, 5), 10)
+        with override_settings(FLAG_PENALTY_BASE_SECONDS=0):
+            self.assertEqual(penalty.penalty_seconds(penalty.KIND_TEAM, 50), 0)
+
+    def test_boxed_team_is_rejected_before_the_view(self):
+        for _ in range(3):
+            self.assertEqual(self._submit().status_code, 200)
+        rows = Submission.objects.count()
+        with mock.patch("apps.challenges.views.verify_flag") as verify:
+            r = self._submit("CTF{demo}")
+        self.assertEqual(r.status_code, 429)
+        self.assertGreater(int(r["Retry-After"]), 0)
+        verify.assert_not_called()
+        self.assertEqual(Submission.objects.count(), rows)
+
+    def test_view_checks_team_when_not_cached(self):
+        for _ in range(3):
+            self._submit()
+        cache.delete(f"flagpen:team-of:{self.user.id}")
+        self.assertEqual(self._submit().status_code, 429)
+
+    def test_correct_flag_clears_streak(self):
+        self._submit()
+        self._submit()
+        self.assertEqual(self._submit("CTF{demo}").data["correct"], True)
+        subjects = [penalty.team_subject(self.team.id, self.challenge.id), penalty.ip_subject("127.0.0.1")]
+        self.assertEqual(penalty.inspect(subjects), [])
+
+    def test_ip_box_spans_teams_and_challenges(self):
+        now = 1000.0
+        for team_id in range(1, 6):
+            waited = penalty.record_miss(team_id, self.challenge.id, "10.1.1.1", now=now)
+        self.assertEqual(waited, 10)
+        self.assertAlmostEqual(penalty.blocked_for([penalty.ip_subject("10.1.1.1")], now=now + 4), 6.0)
+        self.assertEqual(penalty.blocked_for([penalty.ip_subject("10.1.1.2")], now=now), 0.0)
+
+    def test_ops_endpoint_inspects_and_clears(self):
+        for _ in range(3):
+            self._submit()
+        staff = User.objects.create_user(username="ops", email="o@example.com", password="x", is_staff=True)
+        ops = APIClient()
+        ops.force_authenticate(staff)
+        self.assertEqual(ops.get("/api/ops/flag-penalties").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/ops/flag-penalties?team_id={self.team.id}").status_code, 403)
+
+        r = ops.get(f"/api/ops/flag-penalties?team_id={self.team.id}&ip=127.0.0.1")
+        self.assertEqual(r.status_code, 200)
+        by_subject = {row["subject"]: row for row in r.data["results"]}
+        team_row = by_subject[penalty.team_subject(self.team.id, self.challenge.id)]
+        self.assertEqual(team_row["strikes"], 3)
+        self.assertGreater(team_row["blocked_for"], 0)
+        self.assertEqual(by_subject["ip:127.0.0.1"]["blocked_for"], 0.0)
+
+        r = ops.delete(f"/api/ops/flag-penalties?team_id={self.team.id}&challenge_id={self.challenge.id}")
+        self.assertEqual(r.data["cleared"], 1)
+        entry = AuditLog.objects.get(action="flag_penalty_clear")
+        self.assertEqual((entry.actor_user_id, entry.target_type, entry.target_id), (staff.id, "flag_penalty", str(self.team.id)))
+        self.assertEqual(entry.data["cleared"], 1)
+        self.assertEqual(self._submit().status_code, 200)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.models import Team, Membership
+from apps.challenges.models import Challenge, TeamServiceInstance
+from apps.challenges.quota import team_key
+
+
+@override_settings(INSTANCE_QUOTA_PER_TEAM=2)
+class InstanceQuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.team = Team.objects.create(name="alpha", slug="alpha")
+        self.user = get_user_model().objects.create_user(username="player", password="verysecurepass")
+        Membership.objects.create(user=self.user, team=self.team)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.challenges = [
+            Challenge.objects.create(
+                title=f"c{i}", slug=f"c{i}", description="x", flag_hmac="x" * 64, instance_required=True
+            )
+            for i in range(3)
+        ]
+        patcher = mock.patch("apps.challenges.views._enqueue_provisioning")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _spawn(self, challenge):
+        return self.client.post("/api/instances/spawn", {"challenge_id": challenge.id}, format="json")
+
+    def test_repeated_spawn_returns_active_instance(self):
+        first = self._spawn(self.challenges[0])
+        self.assertEqual(first.status_code, 201)
+        again = self._spawn(self.challenges[0])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data["id"], first.data["id"])
+        self.assertEqual(TeamServiceInstance.objects.count(), 1)
+        self.assertEqual(cache.get(team_key(self.team.id)), 1)
+
+    @override_settings(INSTANCE_SPAWN_WAIT_SECONDS=0.2)
+    def test_spawn_in_progress_waits_then_accepts(self):
+        lock_key = f"instq:spawn:{self.team.id}:{self.challenges[0].id}"
+        cache.add(lock_key, 1)
+        pending = self._spawn(self.challenges[0])
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual(pending["Retry-After"], "1")
+
+        def other_spawn_commits(_):
+            TeamServiceInstance.objects.get_or_create(team=self.team, challenge=self.challenges[0])
+
+        with mock.patch("apps.challenges.quota.time.sleep", side_effect=other_spawn_commits):
+            again = self._spawn(self.challenges[0])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data["id"], TeamServiceInstance.objects.get().id)
+
+    def test_team_quota_429_with_retry_after_and_release_on_stop(self):
+        a = self._spawn(self.challenges[0])
+        self._spawn(self.challenges[1])
+        denied = self._spawn(self.challenges[2])
+        self.assertEqual(denied.status_code, 429)
+        self.assertIn("Retry-After", denied)
+        self.assertGreaterEqual(int(denied["Retry-After"]), 5)
+        self.assertEqual(cache.get(team_key(self.team.id)), 2)
+
+        self.client.post("/api/instances/stop", {"instance_id": a.data["id"]}, format="json")
+        self.assertEqual(cache.get(team_key(self.team.id)), 1)
+        # Counters answer admission without a COUNT once cached
+        with self.assertNumQueries(5):  # challenge, team, active lookup, insert, post_save status broadcast
+            self.assertEqual(self._spawn(self.challenges[2]).status_code, 201)
+
+    def test_challenge_capacity(self):
+        c = self.challenges[0]
+        c.checker_config = {"max_instances": 1}
+        c.save()
+        other = Team.objects.create(name="bravo", slug="bravo")
+        TeamServiceInstance.objects.create(team=other, challenge=c, status=TeamServiceInstance.STATUS_RUNNING)
+        r = self._spawn(c)
+        self.assertEqual(r.status_code, 429)
+        self.assertTrue(str(r.data["detail"]).startswith("This challenge is at capacity."))
+        # The team slot reserved before the challenge check was rolled back
+        self.assertEqual(cache.get(team_key(self.team.id)), 0)
+
+    def test_counter_recounts_after_expiry(self):
+        TeamServiceInstance.objects.create(team=self.team, challenge=self.challenges[0], status=TeamServiceInstance.STATUS_RUNNING)
+        TeamServiceInstance.objects.create(team=self.team, challenge=self.challenges[1], status=TeamServiceInstance.STATUS_PENDING)
+        TeamServiceInstance.objects.create(team=self.team, challenge=self.challenges[2], status=TeamServiceInstance.STATUS_STOPPED)
+        self.assertEqual(self._spawn(self.challenges[2]).status_code, 429)
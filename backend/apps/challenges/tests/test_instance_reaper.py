@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Membership, Team
+from apps.challenges.models import Challenge, TeamServiceInstance
+from apps.challenges.provisioning import INSTANCE_ID_LABEL, K8sProvisioner
+from apps.challenges.tasks import reap_idle_instances_task
+
+
+class _DeleteRecorder:
+    def __init__(self):
+        self.selectors = []
+
+    def delete_collection_namespaced_custom_object(self, group, version, ns, plural, label_selector):
+        self.selectors.append(label_selector)
+
+
+@override_settings(INSTANCE_IDLE_TIMEOUT_MINUTES=60)
+class IdleReaperTests(TestCase):
+    def setUp(self):
+        self.teams = [Team.objects.create(name=f"t{i}", slug=f"t{i}") for i in range(6)]
+
+        def challenge(slug, **config):
+            return Challenge.objects.create(
+                title=slug, slug=slug, description="x", flag_hmac="x" * 64, instance_required=True, checker_config=config
+            )
+
+        self.fast = challenge("fast", idle_timeout_minutes=10)
+        self.default = challenge("default")
+        self.forever = challenge("forever", idle_timeout_minutes=0)
+
+    def _instances(self, challenge, idle_minutes, status=TeamServiceInstance.STATUS_RUNNING):
+        now = timezone.now()
+        rows = TeamServiceInstance.objects.bulk_create(
+            [
+                TeamServiceInstance(
+                    team=t,
+                    challenge=challenge,
+                    status=status,
+                    endpoint_url="http://x",
+                    last_activity_at=now - timedelta(minutes=idle_minutes),
+                )
+                for t in self.teams
+            ]
+        )
+        return [r.id for r in rows]
+
+    def _reap(self):
+        with mock.patch("apps.challenges.tasks.notify_instances") as notify:
+            reaped = reap_idle_instances_task()
+        return reaped, notify
+
+    def _statuses(self, challenge):
+        return set(TeamServiceInstance.objects.filter(challenge=challenge).values_list("status", flat=True))
+
+    def test_per_challenge_thresholds(self):
+        self._instances(self.fast, 15)
+        self._instances(self.default, 15)
+        self._instances(self.forever, 10_000)
+        reaped, notify = self._reap()
+        self.assertEqual(reaped, 6)
+        self.assertEqual(self._statuses(self.fast), {TeamServiceInstance.STATUS_STOPPED})
+        self.assertFalse(TeamServiceInstance.objects.filter(challenge=self.fast).exclude(endpoint_url="").exists())
+        self.assertEqual(self._statuses(self.default), {TeamServiceInstance.STATUS_RUNNING})
+        self.assertEqual(self._statuses(self.forever), {TeamServiceInstance.STATUS_RUNNING})
+        self.assertEqual(len(notify.call_args.args[0]), 6)
+        # Already stopped instances are not reaped again
+        self.assertEqual(self._reap()[0], 0)
+
+    @override_settings(INSTANCE_REAPER_BATCH_SIZE=4)
+    def test_query_count_does_not_grow_with_instances(self):
+        self._instances(self.fast, 15)
+        with CaptureQueriesContext(connection) as few:
+            self._reap()
+        self.teams += [Team.objects.create(name=f"u{i}", slug=f"u{i}") for i in range(2)]
+        TeamServiceInstance.objects.all().delete()
+        self._instances(self.default, 120)
+        self._instances(self.fast, 120)
+        with CaptureQueriesContext(connection) as many:
+            reaped, _ = self._reap()
+        self.assertEqual(reaped, 16)
+        # 1 challenge query, then 3 per batch (select ids, update, load) plus a final empty select per threshold
+        self.assertEqual(len(few.captured_queries), 1 + 2 * 3 + 1)
+        self.assertEqual(len(many.captured_queries), 1 + 4 * 3 + 2)
+
+    def test_activity_endpoint_keeps_instance_alive(self):
+        ids = self._instances(self.fast, 15)
+        staff = get_user_model().objects.create_user(username="ingress", password="verysecurepass", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        r = client.post("/api/instances/activity", {"instance_ids": ids[:2]}, format="json")
+        self.assertEqual(r.data, {"updated": 2})
+        self.assertEqual(client.post("/api/instances/activity", {"instance_ids": "1"}, format="json").status_code, 400)
+        self.assertEqual(self._reap()[0], 4)
+        self.assertEqual(
+            set(TeamServiceInstance.objects.filter(status=TeamServiceInstance.STATUS_RUNNING).values_list("id", flat=True)),
+            set(ids[:2]),
+        )
+        player = get_user_model().objects.create_user(username="player", password="verysecurepass")
+        client.force_authenticate(player)
+        self.assertEqual(client.post("/api/instances/activity", {"instance_ids": ids}, format="json").status_code, 403)
+
+    def test_k8s_deprovision_batches_deletes(self):
+        recorder = _DeleteRecorder()
+        prov = K8sProvisioner("ctf", coapi=recorder)
+        prov.DELETE_CHUNK = 4
+        self._instances(self.fast, 15)
+        with mock.patch("apps.challenges.tasks.get_provisioner", return_value=prov):
+            reaped, _ = self._reap()
+        self.assertEqual(reaped, 6)
+        self.assertEqual(len(recorder.selectors), 2)
+        self.assertTrue(all(s.startswith(f"{INSTANCE_ID_LABEL} in (") for s in recorder.selectors))
+
+    def test_stop_view_deletes_the_workload(self):
+        recorder = _DeleteRecorder()
+        inst_id = self._instances(self.fast, 0)[0]
+        user = get_user_model().objects.create_user(username="player", password="verysecurepass")
+        Membership.objects.create(user=user, team=self.teams[0])
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch("apps.challenges.views.get_provisioner", return_value=K8sProvisioner("ctf", coapi=recorder)):
+            for _ in range(2):
+                r = client.post("/api/instances/stop", {"instance_id": inst_id}, format="json")
+                self.assertEqual(r.status_code, 200)
+        self.assertEqual(recorder.selectors, [f"{INSTANCE_ID_LABEL} in ({inst_id})"])
+        self.assertEqual(TeamServiceInstance.objects.get(id=inst_id).status, TeamServiceInstance.STATUS_STOPPED)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from kubernetes import client
+from kubernetes.client import ApiException
+
+from apps.challenges.k8s import (
+    DEPLOYMENTS,
+    INSTANCES,
+    SERVICES,
+    SPEC_HASH_ANNOTATION,
+    TEMPLATES,
+    Informer,
+    Reconciler,
+    _desired_deployment,
+    instance_url,
+    spec_hash,
+)
+from apps.challenges.management.commands.run_k8s_operator import sync_team_instances
+from apps.challenges.models import Challenge, TeamServiceInstance
+from apps.challenges.provisioning import INSTANCE_ID_LABEL
+from apps.core.models import Team
+
+
+class FakeKube:
+    """
+    In-memory API server: list/watch per kind plus the write calls the reconciler makes.
+    Writes are recorded in `calls` and echoed to watchers like the real API server would.
+    """
+
+    def __init__(self):
+        self.objects = {TEMPLATES: {}, INSTANCES: {}, DEPLOYMENTS: {}, SERVICES: {}}
+        self.watchers = {kind: queue.Queue() for kind in self.objects}
+        self.calls = []
+        self.rv = 0
+
+    def put(self, kind, obj, event="ADDED"):
+        self.rv += 1
+        obj = dict(obj, metadata=dict(obj["metadata"], resourceVersion=str(self.rv)))
+        self.objects[kind][obj["metadata"]["name"]] = obj
+        self.watchers[kind].put((event, obj))
+        return obj
+
+    def remove(self, kind, name):
+        obj = self.objects[kind].pop(name)
+        self.watchers[kind].put(("DELETED", obj))
+
+    def list_fn(self, kind):
+        return lambda: {"metadata": {"resourceVersion": str(self.rv)}, "items": list(self.objects[kind].values())}
+
+    def watch_fn(self, kind):
+        def stream(resource_version, timeout):
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                try:
+                    yield self.watchers[kind].get(timeout=0.05)
+                except queue.Empty:
+                    continue
+
+        return stream
+
+    def _sanitize(self, body):
+        return client.ApiClient().sanitize_for_serialization(body)
+
+    # AppsV1Api / CoreV1Api
+    def create_namespaced_deployment(self, ns, body):
+        self.calls.append(("create_deployment", body.metadata.name))
+        self.put(DEPLOYMENTS, self._sanitize(body))
+
+    def create_namespaced_service(self, ns, body):
+        self.calls.append(("create_service", body.metadata.name))
+        self.put(SERVICES, self._sanitize(body))
+
+    def delete_namespaced_deployment(self, name, ns):
+        self.calls.append(("delete_deployment", name))
+        self.remove(DEPLOYMENTS, name)
+
+    def delete_namespaced_service(self, name, ns):
+        self.calls.append(("delete_service", name))
+        self.remove(SERVICES, name)
+
+    def _patch(self, kind, name, body):
+        obj = self.objects[kind][name]
+        meta = dict(obj["metadata"], annotations=dict(obj["metadata"].get("annotations") or {}, **body["metadata"].get("annotations", {})))
+        spec = dict(obj["spec"])
+        if "template" in body.get("spec", {}):
+            spec["template"] = dict(spec["template"], spec=dict(spec["template"]["spec"], **body["spec"]["template"]["spec"]))
+        else:
+            spec.update(body.get("spec", {}))
+        self.put(kind, dict(obj, metadata=meta, spec=spec), event="MODIFIED")
+
+    def patch_namespaced_deployment(self, name, ns, body):
+        self.calls.append(("patch_deployment", name))
+        self._patch(DEPLOYMENTS, name, body)
+
+    def patch_namespaced_service(self, name, ns, body):
+        self.calls.append(("patch_service", name))
+        self._patch(SERVICES, name, body)
+
+    # CustomObjectsApi
+    def patch_namespaced_custom_object_status(self, group, version, ns, plural, name, body):
+        self.calls.append(("patch_status", name))
+        obj = self.objects[INSTANCES].get(name)
+        if obj is None:
+            raise ApiException(status=404)
+        self.put(INSTANCES, dict(obj, status=body["status"]), event="MODIFIED")
+
+
+def _template(name, image="registry/web:1"):
+    return {"metadata": {"name": name}, "spec": {"image": image, "resources": {"cpu": "100m", "memory": "64Mi"}}}
+
+
+def _instance(name, template, team_id):
+    return {"metadata": {"name": name}, "spec": {"templateRef": template, "owner": {"teamId": team_id, "eventId": 1}}}
+
+
+class WatchReconcilerTests(SimpleTestCase):
+    def setUp(self):
+        self.kube = FakeKube()
+        self.synced = []
+        self.reconciler = Reconciler("ctf", self.kube, self.kube, self.kube, sync=self.synced.extend)
+        self.reconciler.informers = {
+            kind: Informer(kind, self.kube.list_fn(kind), self.kube.watch_fn(kind), self.reconciler.on_change)
+            for kind in (TEMPLATES, INSTANCES, DEPLOYMENTS, SERVICES)
+        }
+        self.stop = threading.Event()
+        self.thread = None
+
+    def tearDown(self):
+        self.stop.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _start(self):
+        self.thread = threading.Thread(target=self.reconciler.run, args=(self.stop,), kwargs={"batch_wait": 0.05}, daemon=True)
+        self.thread.start()
+
+    def _settle(self, timeout=3.0):
+        """Wait until no new API writes happen for a short while."""
+        deadline = time.monotonic() + timeout
+        seen = -1
+        while time.monotonic() < deadline:
+            if len(self.kube.calls) == seen:
+                return
+            seen = len(self.kube.calls)
+            time.sleep(0.3)
+
+    def test_provisions_once_and_stays_quiet_in_steady_state(self):
+        self.kube.put(TEMPLATES, _template("web"))
+        for i in range(3):
+            self.kube.put(INSTANCES, _instance(f"web-t{i}", "web", i))
+        self._start()
+        self._settle()
+        kinds = sorted(c[0] for c in self.kube.calls)
+        self.assertEqual(kinds, ["create_deployment"] * 3 + ["create_service"] * 3 + ["patch_status"] * 3)
+        self.assertEqual(self.kube.objects[INSTANCES]["web-t0"]["status"]["url"], instance_url("web-t0", "ctf"))
+        self.assertEqual(sorted({r["name"] for r in self.synced}), ["web-t0", "web-t1", "web-t2"])
+
+        # Unrelated churn (deployment status updates, a full resync) costs no API writes
+        before = len(self.kube.calls)
+        dep = self.kube.objects[DEPLOYMENTS]["web-t1"]
+        self.kube.put(DEPLOYMENTS, dict(dep, status={"availableReplicas": 1}), event="MODIFIED")
+        self.reconciler.resync()
+        self._settle()
+        self.assertEqual(len(self.kube.calls), before)
+
+    def test_only_changed_instances_are_reconciled(self):
+        self.kube.put(TEMPLATES, _template("web"))
+        self.kube.put(INSTANCES, _instance("web-t0", "web", 0))
+        self._start()
+        self._settle()
+        self.kube.calls.clear()
+        self.kube.put(INSTANCES, _instance("web-t9", "web", 9))
+        self.kube.remove(INSTANCES, "web-t0")
+        self._settle()
+        self.assertEqual(
+            sorted(self.kube.calls),
+            sorted(
+                [
+                    ("create_deployment", "web-t9"),
+                    ("create_service", "web-t9"),
+                    ("patch_status", "web-t9"),
+                    ("delete_deployment", "web-t0"),
+                    ("delete_service", "web-t0"),
+                ]
+            ),
+        )
+
+    def test_relist_after_watch_expiry(self):
+        informer = self.reconciler.informers[INSTANCES]
+        self.kube.objects[INSTANCES]["a"] = _instance("a", "web", 1)
+        informer.relist()
+        self.kube.objects[INSTANCES].pop("a")
+        self.kube.objects[INSTANCES]["b"] = _instance("b", "web", 2)
+        informer.relist()
+        self.assertIsNone(informer.get("a"))
+        self.assertIsNotNone(informer.get("b"))
+        self.assertEqual(sorted(self.reconciler.queue.drain(timeout=0.1)), ["a", "b"])
+
+    def test_template_change_rolls_out_minimal_patch(self):
+        self.kube.put(TEMPLATES, _template("web"))
+        self.kube.put(TEMPLATES, _template("api"))
+        self.kube.put(INSTANCES, _instance("web-t0", "web", 0))
+        self.kube.put(INSTANCES, _instance("web-t1", "web", 1))
+        self.kube.put(INSTANCES, _instance("api-t0", "api", 0))
+        self._start()
+        self._settle()
+        hashes = {n: d["metadata"]["annotations"][SPEC_HASH_ANNOTATION] for n, d in self.kube.objects[DEPLOYMENTS].items()}
+        self.kube.calls.clear()
+
+        self.kube.put(TEMPLATES, _template("web", image="registry/web:2"), event="MODIFIED")
+        self._settle()
+        self.assertEqual(sorted(self.kube.calls), [("patch_deployment", "web-t0"), ("patch_deployment", "web-t1")])
+        dep = self.kube.objects[DEPLOYMENTS]["web-t0"]
+        self.assertEqual(dep["spec"]["template"]["spec"]["containers"][0]["image"], "registry/web:2")
+        self.assertNotEqual(dep["metadata"]["annotations"][SPEC_HASH_ANNOTATION], hashes["web-t0"])
+        self.assertEqual(self.kube.objects[DEPLOYMENTS]["api-t0"]["metadata"]["annotations"][SPEC_HASH_ANNOTATION], hashes["api-t0"])
+
+        # Converged: a resync finds nothing to do
+        self.kube.calls.clear()
+        self.reconciler.resync()
+        self._settle()
+        self.assertEqual(self.kube.calls, [])
+
+    def test_spec_hash_is_stable(self):
+        a = _desired_deployment("x", "ns", "img:1", {"cpu": "1"}, {"TEAM_ID": "1"})
+        b = _desired_deployment("x", "ns", "img:1", {"cpu": "1"}, {"TEAM_ID": "1"})
+        c = _desired_deployment("x", "ns", "img:2", {"cpu": "1"}, {"TEAM_ID": "1"})
+        self.assertEqual(spec_hash(a.spec), spec_hash(b.spec))
+        self.assertNotEqual(spec_hash(a.spec), spec_hash(c.spec))
+
+
+class SyncTeamInstancesTests(TestCase):
+    def setUp(self):
+        self.teams = [Team.objects.create(name=f"t{i}", slug=f"t{i}") for i in range(3)]
+        self.web = Challenge.objects.create(
+            title="Web", slug="web", description="x", flag_hmac="x" * 64, mode=Challenge.MODE_ATTACK_DEFENSE
+        )
+        self.pwn = Challenge.objects.create(
+            title="Pwn", slug="pwn", description="x", flag_hmac="x" * 64, mode=Challenge.MODE_ATTACK_DEFENSE
+        )
+
+    def _records(self, template, url="http://{}"):
+        return [
+            {"name": f"{template}-{t.slug}", "template": template, "team_id": t.id, "url": url.format(t.slug)}
+            for t in self.teams
+        ]
+
+    def test_bulk_writes_and_one_broadcast_per_challenge(self):
+        records = self._records("web") + self._records("pwn") + [{"name": "x", "template": "missing", "team_id": 1, "url": "u"}]
+        with mock.patch(
+            "apps.challenges.management.commands.run_k8s_operator._broadcast_ad_status"
+        ) as broadcast, mock.patch("apps.challenges.signals._broadcast_ad_status") as per_save:
+            with self.assertNumQueries(5):  # slugs, existing rows, savepoint + insert + release
+                affected = sync_team_instances(records)
+        self.assertEqual(affected, {self.web.id, self.pwn.id})
+        self.assertEqual(sorted(c.args[0] for c in broadcast.call_args_list), sorted([self.web.id, self.pwn.id]))
+        per_save.assert_not_called()
+        self.assertEqual(
+            TeamServiceInstance.objects.filter(status=TeamServiceInstance.STATUS_RUNNING).count(), 6
+        )
+
+    def test_unchanged_rows_are_not_written(self):
+        with mock.patch("apps.challenges.management.commands.run_k8s_operator._broadcast_ad_status"):
+            sync_team_instances(self._records("web"))
+        with mock.patch(
+            "apps.challenges.management.commands.run_k8s_operator._broadcast_ad_status"
+        ) as broadcast:
+            with self.assertNumQueries(2):
+                self.assertEqual(sync_team_instances(self._records("web")), set())
+            broadcast.assert_not_called()
+            TeamServiceInstance.objects.filter(team=self.teams[0]).update(status=TeamServiceInstance.STATUS_ERROR)
+            affected = sync_team_instances(self._records("web", url="http://{}:8080"))
+        self.assertEqual(affected, {self.web.id})
+        broadcast.assert_called_once_with(self.web.id)
+        self.assertEqual(TeamServiceInstance.objects.filter(challenge=self.web).count(), 3)
+        self.assertFalse(TeamServiceInstance.objects.exclude(endpoint_url__endswith=":8080").exists())
+        self.assertFalse(TeamServiceInstance.objects.exclude(status=TeamServiceInstance.STATUS_RUNNING).exists())
+
+    def test_matches_rows_by_label_or_cr_name_and_never_revives_stopped(self):
+        team = self.teams[0]
+        stopped = TeamServiceInstance.objects.create(
+            team=team, challenge=self.web, status=TeamServiceInstance.STATUS_STOPPED, cr_name="web-old"
+        )
+        pending = TeamServiceInstance.objects.create(team=team, challenge=self.web)
+        records = [
+            {"name": "web-old", "template": "web", "team_id": team.id, "url": "http://old"},
+            {
+                "name": "web-new",
+                "template": "web",
+                "team_id": team.id,
+                "labels": {INSTANCE_ID_LABEL: str(pending.id)},
+                "url": "http://new",
+            },
+        ]
+        with mock.patch("apps.challenges.management.commands.run_k8s_operator._broadcast_ad_status"):
+            self.assertEqual(sync_team_instances(records), {self.web.id})
+        stopped.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual((stopped.status, stopped.endpoint_url), (TeamServiceInstance.STATUS_STOPPED, ""))
+        self.assertEqual(
+            (pending.status, pending.endpoint_url, pending.cr_name),
+            (TeamServiceInstance.STATUS_RUNNING, "http://new", "web-new"),
+        )
+        self.assertEqual(TeamServiceInstance.objects.filter(team=team, challenge=self.web).count(), 2)
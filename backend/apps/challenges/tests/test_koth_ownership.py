@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Team
+from apps.challenges.checkers import BaseChecker, HttpChecker
+from apps.challenges.consumers import KothStatusConsumer
+from apps.challenges.models import Challenge, TeamServiceInstance, OwnershipEvent, KothHoldTotal
+from apps.challenges.tasks import run_tick
+
+
+class LegacyKothChecker(BaseChecker):
+    """checker_path plugin written against the original koth_owner(instances, config) contract."""
+
+    def koth_owner(self, instances, config):
+        return max(inst.team_id for inst in instances)
+
+
+class KothOwnershipTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teams = [Team.objects.create(name=f"team{i}", slug=f"team{i}") for i in range(4)]
+        self.challenge = Challenge.objects.create(
+            title="Hill",
+            slug="hill",
+            description="hill",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_KOTH,
+            tick_seconds=60,
+            released_at=timezone.now(),
+            checker_config={"proof_path": "/proof"},
+        )
+        self.instances = [
+            TeamServiceInstance.objects.create(
+                team=t, challenge=self.challenge, status=TeamServiceInstance.STATUS_RUNNING, endpoint_url=f"http://hill{i}"
+            )
+            for i, t in enumerate(self.teams)
+        ]
+
+    def _fake_get(self, responses, delay=0.0):
+        def fake(url, timeout=3.0):
+            time.sleep(delay)
+            return responses.get(url.split("/")[2], (0, ""))
+
+        return fake
+
+    def test_owner_is_deterministic_and_probes_run_concurrently(self):
+        t0, t1, t2, t3 = self.teams
+        responses = {
+            "hill0": (200, "welcome"),
+            "hill2": (200, f"owned_by:{t2.id}"),
+            "hill3": (200, f"owned_by:{t3.id}"),
+        }
+        checker = HttpChecker()
+        with mock.patch.object(HttpChecker, "_http_get", side_effect=self._fake_get(responses, delay=0.2)):
+            started = time.monotonic()
+            owner = checker.koth_owner(self.instances, self.challenge.checker_config)
+            elapsed = time.monotonic() - started
+            reversed_owner = checker.koth_owner(list(reversed(self.instances)), self.challenge.checker_config)
+        # A valid proof beats a bare 200; the pick among equals does not depend on probe order
+        self.assertIn(owner, (t2.id, t3.id))
+        self.assertEqual(reversed_owner, owner)
+        self.assertLess(elapsed, 0.6)
+
+    def test_ties_keep_current_owner_and_do_not_favour_low_ids(self):
+        t0, t1, t2, t3 = self.teams
+        responses = {
+            "hill0": (200, "welcome"),
+            "hill2": (200, f"owned_by:{t2.id}"),
+            "hill3": (200, f"owned_by:{t3.id}"),
+        }
+        checker = HttpChecker()
+        config = self.challenge.checker_config
+        with mock.patch.object(HttpChecker, "_http_get", side_effect=self._fake_get(responses)):
+            for holder in (t2, t3):
+                self.assertEqual(checker.koth_owner(self.instances, config, current_owner=holder.id, seed=7), holder.id)
+            # A bare 200 does not protect the holder against a valid proof
+            self.assertIn(checker.koth_owner(self.instances, config, current_owner=t0.id), (t2.id, t3.id))
+            winners = {checker.koth_owner(self.instances, config, seed=tick) for tick in range(20)}
+        self.assertEqual(winners, {t2.id, t3.id})
+
+    def test_two_argument_checker_plugins_still_decide_ownership(self):
+        self.challenge.checker_config = {"checker_path": f"{__name__}:LegacyKothChecker"}
+        self.challenge.save(update_fields=["checker_config"])
+        run_tick(self.challenge.id, 0)
+        run_tick(self.challenge.id, 1)  # with a current owner to pass on
+        ev = OwnershipEvent.objects.get(challenge=self.challenge)
+        self.assertEqual(ev.owner_team_id, max(t.id for t in self.teams))
+
+    def test_tick_caches_owner_for_status_view_and_consumer(self):
+        t1 = self.teams[1]
+        responses = {"hill1": (200, f"owned_by:{t1.id}")}
+        with mock.patch.object(HttpChecker, "_http_get", side_effect=self._fake_get(responses)):
+            run_tick(self.challenge.id, 0)
+            run_tick(self.challenge.id, 1)
+        ev = OwnershipEvent.objects.get(challenge=self.challenge)
+        self.assertEqual(TeamServiceInstance.objects.filter(challenge=self.challenge, last_check_at__isnull=False).count(), 4)
+
+        with self.assertNumQueries(0):
+            r = APIClient().get(f"/api/koth/{self.challenge.id}/status")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["owner_team_id"], t1.id)
+        self.assertEqual(r.data["owner_team_name"], t1.name)
+        self.assertEqual(r.data["from_ts"], ev.from_ts.isoformat())
+
+        async def connect():
+            comm = WebsocketCommunicator(
+                KothStatusConsumer.as_asgi(), f"/ws/koth/{self.challenge.id}/status"
+            )
+            comm.scope["url_route"] = {"kwargs": {"id": self.challenge.id}}
+            connected, _ = await comm.connect()
+            message = await comm.receive_json_from()
+            await comm.disconnect()
+            return connected, message
+
+        connected, message = async_to_sync(connect)()
+        self.assertTrue(connected)
+        self.assertEqual(message["payload"]["owner_team_id"], t1.id)
+
+    def test_status_etag_and_refresh_on_ownership_change(self):
+        t0, t1 = self.teams[:2]
+        client = APIClient()
+        url = f"/api/koth/{self.challenge.id}/status"
+        r = client.get(url)
+        self.assertIsNone(r.data["owner_team_id"])
+        etag = r["ETag"]
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ev = OwnershipEvent.objects.create(challenge=self.challenge, owner_team=t0, from_ts=timezone.now())
+        with self.assertNumQueries(0):
+            r = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["owner_team_name"], t0.name)
+        self.assertNotEqual(r["ETag"], etag)
+
+        # Admin edits re-materialize the status too
+        with self.captureOnCommitCallbacks(execute=True):
+            ev.owner_team = t1
+            ev.save()
+        self.assertEqual(client.get(url).data["owner_team_id"], t1.id)
+
+
+class KothHoldTotalsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.t1 = Team.objects.create(name="alpha", slug="alpha")
+        self.t2 = Team.objects.create(name="bravo", slug="bravo")
+        self.challenge = Challenge.objects.create(
+            title="Hill",
+            slug="hill",
+            description="hill",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_KOTH,
+            tick_seconds=60,
+            released_at=timezone.now() - timedelta(hours=1),
+            checker_config={"koth_points_per_tick": 5},
+        )
+        user = get_user_model().objects.create_user(username="viewer", password="verysecurepass")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def _tick(self, tick, owner):
+        with mock.patch("apps.challenges.tasks._compute_koth_owner", return_value=owner.id):
+            run_tick(self.challenge.id, tick)
+
+    def test_totals_update_incrementally(self):
+        self._tick(0, self.t1)
+        self._tick(1, self.t1)
+        self._tick(1, self.t1)  # re-dispatched tick is not counted twice
+        self._tick(2, self.t2)
+        a = KothHoldTotal.objects.get(challenge=self.challenge, team=self.t1)
+        b = KothHoldTotal.objects.get(challenge=self.challenge, team=self.t2)
+        self.assertEqual((a.hold_ticks, a.points), (2, 10))
+        self.assertEqual((b.hold_ticks, b.points), (1, 5))
+        closed = OwnershipEvent.objects.get(challenge=self.challenge, owner_team=self.t1)
+        self.assertAlmostEqual(a.hold_seconds, (closed.to_ts - closed.from_ts).total_seconds(), places=3)
+        self.assertEqual(closed.points_awarded, 10)
+
+        r = self.client.get(f"/api/koth/{self.challenge.id}/holds")
+        rows = {row["team_name"]: row for row in r.data["results"]}
+        self.assertTrue(rows["bravo"]["holding"])
+        self.assertEqual(rows["alpha"]["hold_ticks"], 2)
+
+    def test_timeline_merges_and_clips_spans(self):
+        base = self.challenge.released_at
+        spans = [(self.t1, 0, 10), (self.t1, 10, 20), (self.t2, 20, 30), (self.t1, 30, None)]
+        for team, a, b in spans:
+            OwnershipEvent.objects.create(
+                challenge=self.challenge,
+                owner_team=team,
+                from_ts=base + timedelta(minutes=a),
+                to_ts=base + timedelta(minutes=b) if b is not None else None,
+            )
+        with self.assertNumQueries(2):
+            r = self.client.get(
+                f"/api/koth/{self.challenge.id}/timeline",
+                {"from": (base + timedelta(minutes=5)).isoformat(), "to": (base + timedelta(minutes=40)).isoformat()},
+            )
+        self.assertEqual(r.status_code, 200)
+        got = [(row["owner_team_name"], row["seconds"]) for row in r.data["results"]]
+        self.assertEqual(got, [("alpha", 900.0), ("bravo", 600.0), ("alpha", 600.0)])
+        self.assertIsNone(r.data["results"][-1]["to_ts"])
+        bad = self.client.get(f"/api/koth/{self.challenge.id}/timeline", {"from": "yesterday"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_history_has_no_n_plus_one(self):
+        for i in range(5):
+            team = self.t1 if i % 2 else self.t2
+            OwnershipEvent.objects.create(challenge=self.challenge, owner_team=team, from_ts=timezone.now())
+        with self.assertNumQueries(2):
+            r = self.client.get(f"/api/koth/{self.challenge.id}/ownership-history")
+        self.assertEqual(len(r.data["results"]), 5)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from kubernetes.client import ApiException
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from apps.core.models import Team, Membership
+from apps.core.ws_auth import JWTAuthMiddleware
+from apps.challenges.consumers import UserEventsConsumer
+from apps.challenges.models import Challenge, TeamServiceInstance
+from apps.challenges.provisioning import K8sProvisioner, ProvisioningError, user_group
+from apps.challenges.tasks import provision_instance
+
+
+class FakeCustomObjects:
+    def __init__(self, exists=None):
+        self.exists = exists
+        self.created = []
+
+    def create_namespaced_custom_object(self, group, version, ns, plural, body):
+        if self.exists is not None:
+            raise ApiException(status=409, reason="AlreadyExists")
+        self.created.append(body)
+        return dict(body, metadata=dict(body["metadata"], resourceVersion="1"))
+
+    def get_namespaced_custom_object(self, group, version, ns, plural, name):
+        return self.exists
+
+    def list_namespaced_custom_object(self, *args, **kwargs):
+        raise AssertionError("only used through the watch")
+
+
+class FakeWatch:
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def stream(self, fn, *args, **kwargs):
+        self.calls.append(kwargs)
+        for ev in self.events:
+            yield ev
+
+    def stop(self):
+        pass
+
+
+def _cr(phase, url=None, rv="2"):
+    return {"metadata": {"name": "x", "resourceVersion": rv}, "status": {"phase": phase, "url": url}}
+
+
+class ProvisioningTests(TestCase):
+    def setUp(self):
+        cache.clear()  # instance quota counters
+        self.team = Team.objects.create(name="alpha", slug="alpha")
+        self.user = get_user_model().objects.create_user(username="player", password="verysecurepass")
+        Membership.objects.create(user=self.user, team=self.team)
+        self.challenge = Challenge.objects.create(
+            title="Web", slug="web", description="x", flag_hmac="x" * 64, instance_required=True
+        )
+        self.inst = TeamServiceInstance.objects.create(team=self.team, challenge=self.challenge)
+
+    def _provision_and_receive(self):
+        layer = get_channel_layer()
+
+        async def run():
+            channel = await layer.new_channel()
+            await layer.group_add(user_group(self.user.id), channel)
+            result = await database_sync_to_async(provision_instance)(self.inst.id)
+            try:
+                message = await layer.receive(channel) if result != "cancelled" else None
+            finally:
+                await layer.group_discard(user_group(self.user.id), channel)
+            return result, message
+
+        return async_to_sync(run)()
+
+    def test_dev_provisioning_updates_once_and_notifies_members(self):
+        label = {"challenge": str(self.challenge.id), "result": "ready"}
+        before = REGISTRY.get_sample_value("ctf_instance_provision_seconds_count", label) or 0
+        result, message = self._provision_and_receive()
+        self.assertEqual(result, "ready")
+        self.inst.refresh_from_db()
+        self.assertEqual(self.inst.status, TeamServiceInstance.STATUS_RUNNING)
+        self.assertEqual(message["type"], "instance.update")
+        self.assertEqual(message["payload"]["endpoint_url"], self.inst.endpoint_url)
+        self.assertEqual(REGISTRY.get_sample_value("ctf_instance_provision_seconds_count", label) - before, 1)
+        # A second delivery of the same task is a no-op
+        self.assertIsNone(provision_instance(self.inst.id))
+
+    def test_stopped_while_provisioning_is_not_revived(self):
+        def stop_first(inst, timeout):
+            TeamServiceInstance.objects.filter(id=inst.id).update(status=TeamServiceInstance.STATUS_STOPPED)
+            return "http://late"
+
+        with mock.patch("apps.challenges.provisioning.DevProvisioner.provision", side_effect=stop_first):
+            result, _ = self._provision_and_receive()
+        self.assertEqual(result, "cancelled")
+        self.assertEqual(TeamServiceInstance.objects.get(id=self.inst.id).status, TeamServiceInstance.STATUS_STOPPED)
+
+    def test_failed_provisioning_marks_error(self):
+        with mock.patch("apps.challenges.provisioning.DevProvisioner.provision", side_effect=ProvisioningError("boom")):
+            result, message = self._provision_and_receive()
+        self.assertEqual(result, "error")
+        self.assertEqual(message["payload"]["status"], TeamServiceInstance.STATUS_ERROR)
+
+    def test_k8s_provisioner_waits_on_watch(self):
+        watch = FakeWatch([
+            {"type": "MODIFIED", "raw_object": _cr("Provisioning", rv="2")},
+            {"type": "MODIFIED", "raw_object": _cr("Ready", "http://svc:8080", rv="3")},
+        ])
+        coapi = FakeCustomObjects()
+        prov = K8sProvisioner("ctf", coapi=coapi, watch_factory=lambda: watch)
+        self.assertEqual(prov.provision(self.inst, timeout=30), "http://svc:8080")
+        body = coapi.created[0]
+        self.assertEqual(body["spec"]["templateRef"], "web")
+        self.assertEqual(body["spec"]["owner"]["teamId"], self.team.id)
+        self.assertEqual(watch.calls[0]["field_selector"], f"metadata.name={prov.cr_name(self.inst)}")
+        self.assertEqual(watch.calls[0]["resource_version"], "1")
+
+    def test_k8s_provisioner_existing_and_failed(self):
+        ready = K8sProvisioner("ctf", coapi=FakeCustomObjects(exists=_cr("Ready", "http://svc")), watch_factory=FakeWatch)
+        self.assertEqual(ready.provision(self.inst, timeout=30), "http://svc")
+        failed = K8sProvisioner(
+            "ctf", coapi=FakeCustomObjects(), watch_factory=lambda: FakeWatch([{"type": "MODIFIED", "raw_object": _cr("Failed")}])
+        )
+        with self.assertRaises(ProvisioningError):
+            failed.provision(self.inst, timeout=30)
+
+    def test_spawn_enqueues_provisioning(self):
+        TeamServiceInstance.objects.filter(id=self.inst.id).update(status=TeamServiceInstance.STATUS_STOPPED)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch("apps.challenges.tasks.provision_instance.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                r = client.post("/api/instances/spawn", {"challenge_id": self.challenge.id}, format="json")
+        self.assertEqual(r.status_code, 201)
+        delay.assert_called_once_with(r.data["id"])
+
+    def test_user_events_consumer(self):
+        async def connect(user):
+            comm = WebsocketCommunicator(UserEventsConsumer.as_asgi(), "/ws/me")
+            comm.scope["user"] = user
+            connected, _ = await comm.connect()
+            message = await comm.receive_json_from() if connected else None
+            await comm.disconnect()
+            return connected, message
+
+        connected, message = async_to_sync(connect)(self.user)
+        self.assertTrue(connected)
+        self.assertEqual(message["type"], "instances")
+        self.assertEqual([row["id"] for row in message["payload"]], [self.inst.id])
+        connected, _ = async_to_sync(connect)(AnonymousUser())
+        self.assertFalse(connected)
+
+    def test_user_events_consumer_accepts_jwt(self):
+        async def connect(path, headers=None):
+            comm = WebsocketCommunicator(JWTAuthMiddleware(UserEventsConsumer.as_asgi()), path, headers=headers)
+            connected, _ = await comm.connect()
+            await comm.disconnect()
+            return connected
+
+        token = str(AccessToken.for_user(self.user))
+        self.assertTrue(async_to_sync(connect)(f"/ws/me?token={token}"))
+        self.assertTrue(async_to_sync(connect)("/ws/me", [(b"authorization", f"Bearer {token}".encode())]))
+        self.assertFalse(async_to_sync(connect)("/ws/me?token=garbage"))
+        self.assertFalse(async_to_sync(connect)("/ws/me"))
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.challenges.models import Challenge
+from apps.challenges.routing import route_task, tick_queue_for
+from apps.challenges.tasks import run_tick, schedule_ticks
+
+
+@override_settings(TICK_QUEUE_PREFIX="ticks", TICK_QUEUE_SHARDS=4, TICK_SCHEDULER_INTERVAL_SECONDS=30)
+class TickSchedulingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.challenge = Challenge.objects.create(
+            title="KotH",
+            slug="koth",
+            description="koth",
+            flag_hmac="x" * 64,
+            mode=Challenge.MODE_KOTH,
+            tick_seconds=60,
+            released_at=timezone.now() - timedelta(seconds=125),
+        )
+
+    def test_routing_shards_by_challenge_id(self):
+        self.assertEqual(tick_queue_for(5), "ticks.1")
+        self.assertEqual(tick_queue_for(8), "ticks.0")
+        self.assertEqual(route_task("apps.challenges.tasks.run_tick", (6, 1), {}, {}), {"queue": "ticks.2"})
+        self.assertIsNone(route_task("apps.challenges.tasks.schedule_ticks", (), {}, {}))
+        self.assertEqual(route_task("apps.challenges.tasks.provision_instance", (3,), {}, {}), {"queue": "provisioning"})
+
+    def test_schedule_dispatches_at_tick_boundaries(self):
+        with mock.patch("apps.challenges.tasks.run_tick.apply_async") as apply_async:
+            schedule_ticks()
+            # First run resumes at the current tick (2) without replaying 0..1
+            self.assertEqual([c.args[0] for c in apply_async.call_args_list], [(self.challenge.id, 2)])
+            self.assertEqual(apply_async.call_args.kwargs["queue"], tick_queue_for(self.challenge.id))
+            self.assertIsNone(apply_async.call_args.kwargs["eta"])
+
+            apply_async.reset_mock()
+            cache.set(f"koth_ad:last_tick:{self.challenge.id}", 1, timeout=None)
+            with mock.patch("apps.challenges.tasks.timezone.now", return_value=self.challenge.released_at + timedelta(seconds=170)):
+                schedule_ticks()
+            calls = {c.args[0][1]: c.kwargs["eta"] for c in apply_async.call_args_list}
+            self.assertEqual(sorted(calls), [2, 3])
+            self.assertIsNone(calls[2])
+            self.assertEqual(calls[3], self.challenge.released_at + timedelta(seconds=180))
+
+            apply_async.reset_mock()
+            schedule_ticks()
+            apply_async.assert_not_called()
+
+    def test_tick_skipped_while_another_is_in_flight(self):
+        cache.add(f"koth_ad:tick_lock:{self.challenge.id}", "other", timeout=60)
+        with mock.patch("apps.challenges.tasks._run_tick_locked") as locked:
+            run_tick(self.challenge.id, 0)
+        locked.assert_not_called()
+        cache.delete(f"koth_ad:tick_lock:{self.challenge.id}")
+        with mock.patch("apps.challenges.tasks._run_tick_locked") as locked:
+            run_tick(self.challenge.id, 0)
+        locked.assert_called_once()
+        self.assertIsNone(cache.get(f"koth_ad:tick_lock:{self.challenge.id}"))
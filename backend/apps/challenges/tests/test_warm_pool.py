@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from kubernetes.client import ApiException
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from apps.core.models import Team, Membership
+from apps.challenges.management.commands.run_k8s_operator import sync_warm_instances
+from apps.challenges.models import Challenge, TeamServiceInstance, WarmInstance
+from apps.challenges.provisioning import INSTANCE_ID_LABEL, K8sProvisioner
+from apps.challenges.tasks import refill_warm_pools
+from apps.challenges.warmpool import claim_warm_instance, mark_warm_ready, pool_size
+
+
+class WarmPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()  # instance quota counters
+        self.team = Team.objects.create(name="alpha", slug="alpha")
+        self.challenge = Challenge.objects.create(
+            title="Web",
+            slug="web",
+            description="x",
+            flag_hmac="x" * 64,
+            instance_required=True,
+            checker_config={"warm_pool_size": 2},
+        )
+
+    def _warm_up(self):
+        warm = list(WarmInstance.objects.filter(challenge=self.challenge))
+        mark_warm_ready(warm, {w.id: f"http://{w.name}" for w in warm})
+
+    def _claims(self, result):
+        return REGISTRY.get_sample_value(
+            "ctf_warm_pool_claims_total", {"challenge": str(self.challenge.id), "result": result}
+        ) or 0
+
+    def test_pool_size_config(self):
+        self.assertEqual(pool_size(self.challenge), 2)
+        self.challenge.checker_config = {"warm_pool_size": "bogus"}
+        self.assertEqual(pool_size(self.challenge), 0)
+        self.challenge.checker_config = {"warm_pool_size": 10_000}
+        self.assertEqual(pool_size(self.challenge), 50)
+        self.challenge.instance_required = False
+        self.assertEqual(pool_size(self.challenge), 0)
+
+    def test_refill_counts_pending_and_is_idempotent(self):
+        self.assertEqual(refill_warm_pools(), 2)
+        self.assertEqual(refill_warm_pools(), 0)
+        self._warm_up()
+        self.assertEqual(refill_warm_pools(self.challenge.id), 0)
+        self.assertEqual(
+            WarmInstance.objects.filter(challenge=self.challenge, status=WarmInstance.STATUS_READY).count(), 2
+        )
+
+    def test_claim_binds_oldest_ready_instance_once(self):
+        refill_warm_pools()
+        self._warm_up()
+        first, second = WarmInstance.objects.order_by("ready_at", "id")
+        inst = claim_warm_instance(self.challenge, self.team.id)
+        self.assertEqual((inst.status, inst.endpoint_url), (TeamServiceInstance.STATUS_RUNNING, first.endpoint_url))
+        self.assertEqual(list(WarmInstance.objects.values_list("id", flat=True)), [second.id])
+        claim_warm_instance(self.challenge, self.team.id)
+        self.assertIsNone(claim_warm_instance(self.challenge, self.team.id))
+
+    def test_claim_lost_race_moves_to_next_instance(self):
+        refill_warm_pools()
+        self._warm_up()
+        first, second = WarmInstance.objects.order_by("ready_at", "id")
+        real_filter = WarmInstance.objects.filter
+        stolen = []
+
+        def racing_filter(*args, **kwargs):
+            # Another spawn deletes the instance between our read and our claim
+            if "id" in kwargs and not stolen:
+                stolen.append(kwargs["id"])
+                real_filter(id=kwargs["id"]).delete()
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(WarmInstance.objects, "filter", side_effect=racing_filter):
+            inst = claim_warm_instance(self.challenge, self.team.id)
+        self.assertEqual(stolen, [first.id])
+        self.assertEqual(inst.endpoint_url, second.endpoint_url)
+
+    def test_spawn_view_hit_and_miss(self):
+        user = get_user_model().objects.create_user(username="player", password="verysecurepass")
+        Membership.objects.create(user=user, team=self.team)
+        client = APIClient()
+        client.force_authenticate(user)
+        refill_warm_pools()
+        self._warm_up()
+        hits, misses = self._claims("hit"), self._claims("miss")
+        with mock.patch("apps.challenges.tasks.refill_warm_pools.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                r = client.post("/api/instances/spawn", {"challenge_id": self.challenge.id}, format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.data["status"], TeamServiceInstance.STATUS_RUNNING)
+        self.assertTrue(r.data["endpoint_url"].startswith("http://warm-web-"))
+        delay.assert_called_once_with(self.challenge.id)
+
+        WarmInstance.objects.all().delete()
+        # A second click while the instance runs returns it; stop it to spawn cold
+        self.assertEqual(client.post("/api/instances/spawn", {"challenge_id": self.challenge.id}, format="json").data["id"], r.data["id"])
+        client.post("/api/instances/stop", {"instance_id": r.data["id"]}, format="json")
+        with mock.patch("apps.challenges.tasks.refill_warm_pools.delay"):
+            r = client.post("/api/instances/spawn", {"challenge_id": self.challenge.id}, format="json")
+        self.assertEqual(r.data["status"], TeamServiceInstance.STATUS_PENDING)
+        self.assertEqual(self._claims("hit") - hits, 1)
+        self.assertEqual(self._claims("miss") - misses, 1)
+
+    def test_k8s_sync_marks_teamless_instances_ready(self):
+        refill_warm_pools()
+        names = list(WarmInstance.objects.values_list("name", flat=True))
+        records = [{"name": names[0], "template": "web", "team_id": None, "url": "http://svc:8080"}]
+        self.assertEqual(sync_warm_instances(records), 1)
+        self.assertEqual(sync_warm_instances(records), 0)
+        warm = WarmInstance.objects.get(name=names[0])
+        self.assertEqual((warm.status, warm.endpoint_url), (WarmInstance.STATUS_READY, "http://svc:8080"))
+        self.assertIsNotNone(warm.ready_at)
+
+    def test_k8s_refill_creates_crs_and_claim_hands_them_over(self):
+        coapi = _FakeCustomObjects(fail_first=True)
+        prov = K8sProvisioner("ctf", coapi=coapi)
+        with mock.patch("apps.challenges.warmpool.get_provisioner", return_value=prov):
+            self.assertEqual(refill_warm_pools(), 1)  # the failed create is dropped and retried
+            self.assertEqual(refill_warm_pools(), 1)
+            self.assertEqual(sorted(coapi.created), sorted(WarmInstance.objects.values_list("name", flat=True)))
+            self._warm_up()
+            with self.captureOnCommitCallbacks(execute=True):
+                inst = claim_warm_instance(self.challenge, self.team.id)
+        self.assertTrue(inst.cr_name.startswith("warm-web-"))
+        self.assertEqual(
+            coapi.patched,
+            [(inst.cr_name, {"metadata": {"labels": {INSTANCE_ID_LABEL: str(inst.id)}}, "spec": {"owner": {"teamId": self.team.id}}})],
+        )
+        prov.deprovision([inst])
+        self.assertEqual(coapi.selectors, [f"{INSTANCE_ID_LABEL} in ({inst.id})"])
+        self.assertEqual(coapi.deleted, [inst.cr_name])
+
+
+class _FakeCustomObjects:
+    def __init__(self, fail_first=False):
+        self.fail_first = fail_first
+        self.created, self.patched, self.selectors, self.deleted = [], [], [], []
+
+    def create_namespaced_custom_object(self, group, version, ns, plural, body):
+        self.check_teamless(body)
+        if self.fail_first:
+            self.fail_first = False
+            raise ApiException(status=500, reason="InternalError")
+        self.created.append(body["metadata"]["name"])
+        return body
+
+    @staticmethod
+    def check_teamless(body):
+        assert "teamId" not in body["spec"]["owner"] and not body["metadata"].get("labels")
+
+    def patch_namespaced_custom_object(self, group, version, ns, plural, name, body):
+        self.patched.append((name, body))
+
+    def delete_collection_namespaced_custom_object(self, group, version, ns, plural, label_selector):
+        self.selectors.append(label_selector)
+
+    def delete_namespaced_custom_object(self, group, version, ns, plural, name):
+        self.deleted.append(name)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Challenge, DefenseToken
+
+# What ADSubmitView needs from a token; DefenseToken rows expose the same attributes.
+HotToken = namedtuple("HotToken", ["team_id", "tick", "expires_at"])
+
+
+def grace_seconds() -> int:
+    return int(getattr(settings, "DEFENSE_TOKEN_GRACE_SECONDS", 600))
+
+
+def _hot_key(challenge_id: int, token: str) -> str:
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return f"ad:token:{challenge_id}:{digest}"
+
+
+def index_defense_tokens(tokens: Iterable[DefenseToken]) -> None:
+    """
+    Put freshly minted tokens into the hot cache index. Entries live until expires_at plus the
+    grace window, so submissions inside the validity window never reach the DefenseToken table.
+    """
+    now = timezone.now()
+    by_ttl: dict[int, dict[str, tuple]] = {}
+    for dt in tokens:
+        ttl = int((dt.expires_at - now).total_seconds()) + grace_seconds()
+        if ttl <= 0:
+            continue
+        by_ttl.setdefault(ttl, {})[_hot_key(dt.challenge_id, dt.token)] = (dt.team_id, dt.tick, dt.expires_at.timestamp())
+    for ttl, entries in by_ttl.items():
+        cache.set_many(entries, timeout=ttl)
+
+
+def lookup_defense_token(challenge_id: int, token: str):
+    """
+    Resolve a submitted token to (team_id, tick, expires_at): hot cache first, then the
+    (challenge, token) index, which pruning keeps limited to the retention window.
+    """
+    hit = cache.get(_hot_key(challenge_id, token))
+    if hit is not None:
+        team_id, tick, expires_ts = hit
+        return HotToken(team_id, tick, datetime.fromtimestamp(expires_ts, tz=dt_timezone.utc))
+    return (
+        DefenseToken.objects.filter(challenge_id=challenge_id, token=token)
+        .only("team_id", "tick", "expires_at")
+        .first()
+    )
+
+
+def prune_cutoff_tick(challenge: Challenge, now: Optional[datetime] = None) -> Optional[int]:
+    """
+    First tick whose tokens must be kept for a challenge: tokens still inside expiry + grace,
+    and tokens the checker reads back flag_lookback_ticks later, are never pruned.
+    """
+    if not challenge.released_at or challenge.tick_seconds <= 0:
+        return None
+    now = now or timezone.now()
+    elapsed = (now - challenge.released_at).total_seconds()
+    current_tick = int(elapsed // challenge.tick_seconds)
+    lookback = int((challenge.checker_config or {}).get("flag_lookback_ticks", 1))
+    expired_before = int((elapsed - grace_seconds()) // challenge.tick_seconds) - 1
+    return min(current_tick - max(0, lookback), expired_before)
+
+
+def prune_defense_tokens_for(challenge: Challenge, batch_size: int = 5000, now: Optional[datetime] = None) -> int:
+    """
+    Delete expired tokens of one challenge older than prune_cutoff_tick, in batches of primary keys
+    so a large backlog never holds long locks. Redeemed tokens stay recorded as AttackEvent.token_hash.
+    """
+    now = now or timezone.now()
+    cutoff = prune_cutoff_tick(challenge, now)
+    if cutoff is None or cutoff <= 0:
+        return 0
+    qs = DefenseToken.objects.filter(
+        challenge_id=challenge.id, tick__lt=cutoff, expires_at__lt=now - timedelta(seconds=grace_seconds())
+    )
+    deleted = 0
+    while True:
+        ids = list(qs.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += DefenseToken.objects.filter(id__in=ids).delete()[0]
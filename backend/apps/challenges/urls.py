@@ -11,14 +11,19 @@ from .views import (
     ADAttackLogView,
     ADServicesStatusView,
     ADSubmitView,
+    ADSlaView,
     CategoriesListView,
     TagsListView,
     EventsListView,
     KothStatusView,
     KothOwnershipHistoryView,
+    KothHoldsView,
+    KothTimelineView,
     InstancesSpawnView,
     InstancesStopView,
     InstancesMyView,
+    InstancesActivityView,
+    FlagPenaltiesView,
 )
 
 urlpatterns = [
@@ -33,13 +38,19 @@ urlpatterns = [
     path("ad/<int:id>/submit", ADSubmitView.as_view()),
     path("ad/<int:id>/attack-log", ADAttackLogView.as_view()),
     path("ad/<int:id>/services/status", ADServicesStatusView.as_view()),
+    path("ad/<int:id>/sla", ADSlaView.as_view()),
     # KotH
     path("koth/<int:id>/status", KothStatusView.as_view()),
     path("koth/<int:id>/ownership-history", KothOwnershipHistoryView.as_view()),
+    path("koth/<int:id>/holds", KothHoldsView.as_view()),
+    path("koth/<int:id>/timeline", KothTimelineView.as_view()),
     # Instances
     path("instances/spawn", InstancesSpawnView.as_view()),
     path("instances/stop", InstancesStopView.as_view()),
     path("instances/my", InstancesMyView.as_view()),
+    path("instances/activity", InstancesActivityView.as_view()),
+    # Ops
+    path("ops/flag-penalties", FlagPenaltiesView.as_view()),
     # Admin
     path("admin/challenges", AdminChallengeListCreateView.as_view()),
     path("admin/challenges/<int:id>", AdminChallengeDetailView.as_view()),
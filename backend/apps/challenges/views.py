@@ -1,18 +1,24 @@
 from __future__ import annotations
 
 import hashlib
+from datetime import timedelta
 import logging
 from typing import Optional
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Count, F, Sum
 from django.http import Http404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import permissions, status
+from rest_framework.exceptions import Throttled
 from rest_framework.generics import ListAPIView, RetrieveAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.audit import record_request
 from apps.core.models import Team, Membership, ScoreEvent
 from apps.core.metrics import flag_submissions_total
 from .models import (
@@ -23,10 +29,11 @@ from .models import (
     Tag,
     Event,
     ChallengeSnapshot,
-    DefenseToken,
     AttackEvent,
     TeamServiceInstance,
     OwnershipEvent,
+    ServiceSLA,
+    KothHoldTotal,
 )
 from .serializers import (
     ChallengeListItemSerializer,
@@ -37,6 +44,13 @@ from .serializers import (
     CategorySerializer,
     EventSerializer,
 )
+from .koth import STATUS_FIELDS as KOTH_STATUS_FIELDS, get_koth_status, refresh_koth_status
+from .tokens import lookup_defense_token
+from .warmpool import claim_warm_instance, pool_size
+from .reaper import record_activity
+from .provisioning import get_provisioner, instance_payload
+from .quota import ACTIVE_STATUSES, QuotaExceeded, active_instance, admit, await_active_instance, release
+from . import penalty
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +86,10 @@ class ChallengeDetailView(RetrieveAPIView):
 class FlagSubmitView(APIView):
     throttle_scope = "flag-submit"
 
+    def get_throttles(self):
+        # Penalty box first: boxed teams/IPs are turned away on cache reads alone
+        return [penalty.FlagPenaltyThrottle()] + super().get_throttles()
+
     def post(self, request, id: int):
         try:
             challenge = Challenge.objects.get(id=id)
@@ -85,6 +103,12 @@ class FlagSubmitView(APIView):
         team = Team.objects.filter(memberships__user=request.user).first()
         if not team:
             return Response({"detail": "Join or create a team first."}, status=status.HTTP_400_BAD_REQUEST)
+        if penalty.enabled():
+            penalty.remember_team(request.user.id, team.id)
+            if not getattr(request, "flag_penalty_team_checked", False):
+                wait = penalty.blocked_for([penalty.team_subject(team.id, challenge.id)])
+                if wait > 0:
+                    raise Throttled(wait=wait, detail="Too many incorrect flags for this challenge.")
 
         user_agent = request.META.get("HTTP_USER_AGENT", "")[:400]
         ip = request.META.get("REMOTE_ADDR")
@@ -119,6 +143,7 @@ class FlagSubmitView(APIView):
                     ip=ip,
                     user_agent=user_agent,
                 )
+                penalty.record_miss(team.id, challenge.id, penalty.client_ip(request))
                 # Metrics
                 try:
                     flag_submissions_total.labels(correct="false").inc()
@@ -175,6 +200,7 @@ class FlagSubmitView(APIView):
                 )
 
             team_total = team.score  # dynamic property aggregates ScoreEvents
+            penalty.record_solve(team.id, challenge.id, penalty.client_ip(request))
 
         # Metrics
         try:
@@ -194,11 +220,21 @@ class FlagSubmitView(APIView):
         )
 
 
+def _audited_fields(serializer) -> list:
+    # Names only: values can be large (descriptions) and the flag itself must never reach the log
+    return sorted(serializer.validated_data.keys())
+
+
 class AdminChallengeListCreateView(ListCreateAPIView):
     queryset = Challenge.objects.all().order_by("-created_at")
     serializer_class = ChallengeAdminSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def perform_create(self, serializer):
+        fields = _audited_fields(serializer)
+        c = serializer.save()
+        record_request(self.request, "challenge_create", "challenge", c.id, data={"slug": c.slug, "fields": fields})
+
 
 class AdminChallengeDetailView(RetrieveUpdateDestroyAPIView):
     queryset = Challenge.objects.all()
@@ -206,6 +242,16 @@ class AdminChallengeDetailView(RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "id"
 
+    def perform_update(self, serializer):
+        fields = _audited_fields(serializer)
+        c = serializer.save()
+        record_request(self.request, "challenge_update", "challenge", c.id, data={"slug": c.slug, "fields": fields})
+
+    def perform_destroy(self, instance):
+        cid, slug = instance.id, instance.slug
+        instance.delete()
+        record_request(self.request, "challenge_delete", "challenge", cid, data={"slug": slug})
+
 
 class AdminChallengeSnapshotView(APIView):
     permission_classes = [permissions.IsAdminUser]
@@ -306,7 +352,7 @@ class ADSubmitView(APIView):
             return Response({"detail": "token is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Locate defense token
-        dt = DefenseToken.objects.filter(challenge=challenge, token=token).first()
+        dt = lookup_defense_token(challenge.id, token)
         if not dt:
             return Response({"detail": "Invalid token."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -386,16 +432,51 @@ class ADServicesStatusView(APIView):
         if challenge.mode != Challenge.MODE_ATTACK_DEFENSE:
             return Response({"detail": "Not an Attack-Defense challenge."}, status=status.HTTP_400_BAD_REQUEST)
 
-        rows = TeamServiceInstance.objects.filter(challenge=challenge).order_by("team__name")
+        rows = TeamServiceInstance.objects.filter(challenge=challenge).select_related("team").order_by("team__name")
+        sla = {s.team_id: s for s in ServiceSLA.objects.filter(challenge=challenge)}
+        results = []
+        for inst in rows:
+            s = sla.get(inst.team_id)
+            results.append(
+                {
+                    "team_id": inst.team_id,
+                    "team_name": inst.team.name,
+                    "status": inst.status,
+                    "endpoint_url": inst.endpoint_url,
+                    "last_check_at": inst.last_check_at,
+                    "sla_percent": s.sla_percent if s else None,
+                    "last_check_status": s.get_last_status_display() if s else None,
+                }
+            )
+        return Response({"results": results})
+
+
+class ADSlaView(APIView):
+    """
+    Per-team SLA for an Attack-Defense challenge, served from the ServiceSLA rollup.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, id: int):
+        try:
+            challenge = Challenge.objects.get(id=id)
+        except Challenge.DoesNotExist:
+            raise Http404
+        if challenge.mode != Challenge.MODE_ATTACK_DEFENSE:
+            return Response({"detail": "Not an Attack-Defense challenge."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ServiceSLA.objects.filter(challenge=challenge).select_related("team").order_by("team__name")
         results = [
             {
-                "team_id": inst.team_id,
-                "team_name": inst.team.name,
-                "status": inst.status,
-                "endpoint_url": inst.endpoint_url,
-                "last_check_at": inst.last_check_at,
+                "team_id": r.team_id,
+                "team_name": r.team.name,
+                "ticks_up": r.ticks_up,
+                "ticks_total": r.ticks_total,
+                "sla_percent": r.sla_percent,
+                "last_tick": r.last_tick,
+                "last_check_status": r.get_last_status_display(),
             }
-            for inst in rows
+            for r in rows
         ]
         return Response({"results": results})
 
@@ -403,29 +484,26 @@ class ADServicesStatusView(APIView):
 # --- KotH endpoints ---
 
 class KothStatusView(APIView):
+    """
+    Current hill owner. Served from the status materialized in the cache by run_tick and
+    OwnershipEvent changes, without touching the database; supports If-None-Match.
+    """
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, id: int):
-        try:
-            challenge = Challenge.objects.get(id=id)
-        except Challenge.DoesNotExist:
-            raise Http404
-        if challenge.mode != Challenge.MODE_KOTH:
-            return Response({"detail": "Not a KotH challenge."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Current owner: latest event with open interval or latest by from_ts
-        ev = (
-            OwnershipEvent.objects.filter(challenge=challenge, to_ts__isnull=True)
-            .order_by("-from_ts")
-            .first()
-        ) or (
-            OwnershipEvent.objects.filter(challenge=challenge)
-            .order_by("-from_ts")
-            .first()
-        )
-        if not ev:
-            return Response({"owner_team_id": None, "owner_team_name": None})
-        return Response({"owner_team_id": ev.owner_team_id, "owner_team_name": ev.owner_team.name, "from_ts": ev.from_ts})
+        cached = get_koth_status(id)
+        if cached is None:
+            try:
+                challenge = Challenge.objects.get(id=id)
+            except Challenge.DoesNotExist:
+                raise Http404
+            if challenge.mode != Challenge.MODE_KOTH:
+                return Response({"detail": "Not a KotH challenge."}, status=status.HTTP_400_BAD_REQUEST)
+            cached = refresh_koth_status(challenge.id)
+        headers = {"ETag": cached["etag"], "Cache-Control": "no-cache"}
+        if request.headers.get("If-None-Match") == cached["etag"]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({k: cached[k] for k in KOTH_STATUS_FIELDS}, headers=headers)
 
 
 class KothOwnershipHistoryView(APIView):
@@ -439,7 +517,7 @@ class KothOwnershipHistoryView(APIView):
         if challenge.mode != Challenge.MODE_KOTH:
             return Response({"detail": "Not a KotH challenge."}, status=status.HTTP_400_BAD_REQUEST)
 
-        rows = OwnershipEvent.objects.filter(challenge=challenge).order_by("-from_ts")[:100]
+        rows = OwnershipEvent.objects.filter(challenge=challenge).select_related("owner_team").order_by("-from_ts")[:100]
         results = [
             {
                 "owner_team_id": r.owner_team_id,
@@ -453,8 +531,122 @@ class KothOwnershipHistoryView(APIView):
         return Response({"results": results})
 
 
+class KothHoldsView(APIView):
+    """
+    Per-team KotH totals (hold seconds, hold ticks, points) from the incremental KothHoldTotal rollup.
+    The current owner's open span is added to its hold_seconds on the fly.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, id: int):
+        try:
+            challenge = Challenge.objects.get(id=id)
+        except Challenge.DoesNotExist:
+            raise Http404
+        if challenge.mode != Challenge.MODE_KOTH:
+            return Response({"detail": "Not a KotH challenge."}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        current = OwnershipEvent.objects.filter(challenge=challenge, to_ts__isnull=True).order_by("-from_ts").first()
+        rows = KothHoldTotal.objects.filter(challenge=challenge).select_related("team")
+        results = []
+        for r in rows:
+            seconds = r.hold_seconds
+            if current and current.owner_team_id == r.team_id:
+                seconds += max(0.0, (now - current.from_ts).total_seconds())
+            results.append(
+                {
+                    "team_id": r.team_id,
+                    "team_name": r.team.name,
+                    "hold_seconds": round(seconds, 3),
+                    "hold_ticks": r.hold_ticks,
+                    "points": r.points,
+                    "holding": bool(current and current.owner_team_id == r.team_id),
+                }
+            )
+        results.sort(key=lambda row: (-row["hold_seconds"], row["team_name"]))
+        return Response({"results": results})
+
+
+class KothTimelineView(APIView):
+    """
+    Run-length-encoded ownership spans within ?from=&to= (ISO 8601; defaults: release time / last 24 h, now).
+    Consecutive events of the same owner are merged; spans are clipped to the range and an open span has to_ts null.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, id: int):
+        try:
+            challenge = Challenge.objects.get(id=id)
+        except Challenge.DoesNotExist:
+            raise Http404
+        if challenge.mode != Challenge.MODE_KOTH:
+            return Response({"detail": "Not a KotH challenge."}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        try:
+            end = _parse_ts(request.query_params.get("to")) or now
+            start = _parse_ts(request.query_params.get("from")) or challenge.released_at or (end - timedelta(hours=24))
+        except ValueError:
+            return Response({"detail": "from/to must be ISO 8601 timestamps."}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({"detail": "from must be before to."}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = (
+            OwnershipEvent.objects.filter(challenge=challenge, from_ts__lt=end)
+            .exclude(to_ts__lte=start)
+            .select_related("owner_team")
+            .order_by("from_ts")
+        )
+        spans = []
+        for ev in events.iterator(chunk_size=500):
+            span_from = max(ev.from_ts, start)
+            span_to = min(ev.to_ts, end) if ev.to_ts else None
+            last = spans[-1] if spans else None
+            if last and last["owner_team_id"] == ev.owner_team_id and last["to_ts"] is not None and last["to_ts"] >= span_from:
+                last["to_ts"] = span_to
+            else:
+                spans.append(
+                    {"owner_team_id": ev.owner_team_id, "owner_team_name": ev.owner_team.name, "from_ts": span_from, "to_ts": span_to}
+                )
+        for span in spans:
+            span["seconds"] = round(max(0.0, ((span["to_ts"] or min(now, end)) - span["from_ts"]).total_seconds()), 3)
+        return Response({"from": start, "to": end, "results": spans})
+
+
+def _parse_ts(value: Optional[str]):
+    if not value:
+        return None
+    parsed = parse_datetime(value.strip())
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 # --- Instances API (spawn/stop/list) ---
 
+def _enqueue_warm_refill(challenge_id: int) -> None:
+    from .tasks import refill_warm_pools
+
+    try:
+        refill_warm_pools.delay(challenge_id)
+    except Exception:
+        # Broker unavailable: the beat refill catches up
+        logger.warning("Could not enqueue warm pool refill for challenge %s", challenge_id)
+
+
+def _enqueue_provisioning(instance_id: int) -> None:
+    from .tasks import provision_instance
+
+    try:
+        provision_instance.delay(instance_id)
+    except Exception:
+        # Broker unavailable: the instance stays pending for run_operator (dev) to pick up
+        logger.warning("Could not enqueue provisioning for instance %s", instance_id)
+
+
 class InstancesSpawnView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -474,19 +666,46 @@ class InstancesSpawnView(APIView):
         if not team:
             return Response({ "detail": "Join or create a team first." }, status=status.HTTP_400_BAD_REQUEST)
 
-        inst = TeamServiceInstance.objects.create(
-            team=team,
-            challenge=challenge,
-            status=TeamServiceInstance.STATUS_PENDING,
-            endpoint_url="",
-        )
-        return Response({
-            "id": inst.id,
-            "team_id": inst.team_id,
-            "challenge_id": inst.challenge_id,
-            "status": inst.status,
-            "endpoint_url": inst.endpoint_url,
-        }, status=status.HTTP_201_CREATED)
+        # Repeated clicks: one spawn per (team, challenge) at a time, later ones get the active instance
+        lock_key = f"instq:spawn:{team.id}:{challenge.id}"
+        if not cache.add(lock_key, 1, timeout=30):
+            existing = await_active_instance(
+                team.id, challenge.id, float(getattr(settings, "INSTANCE_SPAWN_WAIT_SECONDS", 2))
+            )
+            if existing is not None:
+                return Response(instance_payload(existing))
+            return Response(
+                {"detail": "A spawn for this challenge is already in progress."},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "1"},
+            )
+        try:
+            existing = active_instance(team.id, challenge.id)
+            if existing is not None:
+                return Response(instance_payload(existing))
+            try:
+                admit(team.id, challenge)
+            except QuotaExceeded as e:
+                raise Throttled(wait=e.retry_after, detail=e.detail)
+            try:
+                inst = None
+                if pool_size(challenge):
+                    inst = claim_warm_instance(challenge, team.id)
+                    transaction.on_commit(lambda: _enqueue_warm_refill(challenge.id))
+                if inst is None:
+                    inst = TeamServiceInstance.objects.create(
+                        team=team,
+                        challenge=challenge,
+                        status=TeamServiceInstance.STATUS_PENDING,
+                        endpoint_url="",
+                    )
+                    transaction.on_commit(lambda: _enqueue_provisioning(inst.id))
+            except Exception:
+                release([(team.id, challenge.id)])
+                raise
+        finally:
+            cache.delete(lock_key)
+        return Response(instance_payload(inst), status=status.HTTP_201_CREATED)
 
 
 class InstancesStopView(APIView):
@@ -506,11 +725,93 @@ class InstancesStopView(APIView):
         if not team or inst.team_id != team.id:
             return Response({"detail": "Not allowed."}, status=status.HTTP_403_FORBIDDEN)
 
+        if inst.status == TeamServiceInstance.STATUS_STOPPED:
+            return Response({"ok": True})
+        was_active = inst.status in ACTIVE_STATUSES
         inst.status = TeamServiceInstance.STATUS_STOPPED
         inst.save(update_fields=["status"])
+        if was_active:
+            release([(inst.team_id, inst.challenge_id)])
+        # Delete the workload as the idle reaper does; errored instances may still have one
+        try:
+            get_provisioner().deprovision([inst])
+        except Exception:
+            logger.exception("Deprovisioning stopped instance %s failed", inst.id)
         return Response({"ok": True})
 
 
+class InstancesActivityView(APIView):
+    """
+    Ingress/log-shipper hook (staff credentials): report instances that received traffic so the
+    idle reaper keeps them. Body: {"instance_ids": [1, 2, ...]}; one UPDATE per call.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        ids = request.data.get("instance_ids")
+        if not isinstance(ids, list) or len(ids) > 5000:
+            return Response({"detail": "instance_ids must be a list of at most 5000 ids"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return Response({"detail": "instance_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": record_activity(ids)})
+
+
+class FlagPenaltiesView(APIView):
+    """
+    Ops view of the wrong-flag penalty box (staff only). Select subjects with query params:
+    team_id (optionally with challenge_id; all challenges otherwise) and/or ip.
+    GET lists their strikes and remaining block; DELETE clears them.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def _subjects(self, request):
+        params = request.query_params
+        subjects = []
+        try:
+            team_id = int(params["team_id"]) if params.get("team_id") else None
+            challenge_id = int(params["challenge_id"]) if params.get("challenge_id") else None
+        except ValueError:
+            return None
+        if team_id is not None:
+            if challenge_id is not None:
+                challenge_ids = [challenge_id]
+            else:
+                challenge_ids = Challenge.objects.order_by("id").values_list("id", flat=True)
+            subjects.extend(penalty.team_subject(team_id, cid) for cid in challenge_ids)
+        if params.get("ip"):
+            subjects.append(penalty.ip_subject(params["ip"].strip()))
+        return subjects
+
+    def get(self, request):
+        subjects = self._subjects(request)
+        if not subjects:
+            return Response({"detail": "team_id (and optional challenge_id) or ip required"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": penalty.inspect(subjects)})
+
+    def delete(self, request):
+        subjects = self._subjects(request)
+        if not subjects:
+            return Response({"detail": "team_id (and optional challenge_id) or ip required"}, status=status.HTTP_400_BAD_REQUEST)
+        cleared = len(penalty.inspect(subjects))
+        penalty.clear(subjects)
+        params = request.query_params
+        record_request(
+            request,
+            "flag_penalty_clear",
+            "flag_penalty",
+            params.get("team_id") or params.get("ip"),
+            data={
+                "team_id": params.get("team_id"),
+                "challenge_id": params.get("challenge_id"),
+                "ip": params.get("ip"),
+                "cleared": cleared,
+            },
+        )
+        return Response({"cleared": cleared})
+
+
 class InstancesMyView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import secrets
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Challenge, TeamServiceInstance, WarmInstance
+from .provisioning import get_provisioner
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for checker_config["warm_pool_size"]; a typo must not provision hundreds of pods
+MAX_POOL_SIZE = 50
+# Attempts at claiming when another spawn takes the same ready instance first
+CLAIM_ATTEMPTS = 3
+
+
+def pool_size(challenge: Challenge) -> int:
+    """
+    Target number of idle instances for a challenge (checker_config["warm_pool_size"], default 0).
+    """
+    if not challenge.instance_required:
+        return 0
+    try:
+        size = int((challenge.checker_config or {}).get("warm_pool_size", 0))
+    except (TypeError, ValueError):
+        return 0
+    return max(0, min(size, MAX_POOL_SIZE))
+
+
+def warm_instance_name(challenge: Challenge) -> str:
+    return f"warm-{challenge.slug}-{secrets.token_hex(4)}"[:128]
+
+
+def claim_warm_instance(challenge: Challenge, team_id: int) -> Optional[TeamServiceInstance]:
+    """
+    Bind the oldest ready warm instance to the team and return the new running TeamServiceInstance,
+    or None when the pool is empty. The claim is a compare-and-delete on the ready row, so two
+    concurrent spawns never get the same instance, also on databases without row locks. The row keeps
+    the warm CR's name, and the provisioner hands the workload to the team once the claim commits.
+    """
+    from apps.core.metrics import warm_pool_claims_total
+
+    inst = None
+    for _ in range(CLAIM_ATTEMPTS):
+        warm = (
+            WarmInstance.objects.filter(challenge=challenge, status=WarmInstance.STATUS_READY)
+            .order_by("ready_at", "id")
+            .only("id", "name", "endpoint_url")
+            .first()
+        )
+        if warm is None:
+            break
+        with transaction.atomic():
+            deleted, _ = WarmInstance.objects.filter(id=warm.id, status=WarmInstance.STATUS_READY).delete()
+            if deleted:
+                inst = TeamServiceInstance.objects.create(
+                    team_id=team_id,
+                    challenge=challenge,
+                    status=TeamServiceInstance.STATUS_RUNNING,
+                    endpoint_url=warm.endpoint_url,
+                    last_check_at=timezone.now(),
+                    cr_name=warm.name,
+                )
+                transaction.on_commit(lambda: _adopt(inst))
+                break
+    try:
+        warm_pool_claims_total.labels(challenge=str(challenge.id), result="hit" if inst else "miss").inc()
+    except Exception:
+        pass
+    return inst
+
+
+def _adopt(inst: TeamServiceInstance) -> None:
+    try:
+        get_provisioner().adopt_warm(inst)
+    except Exception:
+        # The row keeps cr_name, so stopping or reaping it still deletes the workload by name
+        logger.exception("Handing warm instance %s to team %s failed", inst.cr_name, inst.team_id)
+
+
+def refill_pool(challenge: Challenge) -> int:
+    """
+    Top the challenge's pool up to pool_size with pending warm instances and request their workloads;
+    returns how many were added. Pending ones count towards the target, so repeated refills before the
+    operator catches up are no-ops; rows whose workload could not be requested are dropped again so the
+    next refill retries them.
+    """
+    from apps.core.metrics import warm_pool_ready
+
+    target = pool_size(challenge)
+    counts: Dict[str, int] = {WarmInstance.STATUS_PENDING: 0, WarmInstance.STATUS_READY: 0}
+    for st in WarmInstance.objects.filter(challenge=challenge).values_list("status", flat=True):
+        counts[st] = counts.get(st, 0) + 1
+    try:
+        warm_pool_ready.labels(challenge=str(challenge.id)).set(counts[WarmInstance.STATUS_READY])
+    except Exception:
+        pass
+    missing = target - sum(counts.values())
+    if missing <= 0:
+        return 0
+    added = WarmInstance.objects.bulk_create(
+        [WarmInstance(challenge=challenge, name=warm_instance_name(challenge)) for _ in range(missing)]
+    )
+    failed = get_provisioner().provision_warm(added)
+    if failed:
+        WarmInstance.objects.filter(id__in=[w.id for w in failed]).delete()
+    return missing - len(failed)
+
+
+def mark_warm_ready(instances: Iterable[WarmInstance], urls: Dict[int, str]) -> int:
+    """
+    Operator hook: flip pending warm instances to ready with their endpoint (urls: warm id -> URL)
+    and record time-to-ready. Returns the number of instances updated.
+    """
+    from apps.core.metrics import warm_pool_time_to_ready_seconds
+
+    now = timezone.now()
+    ready = []
+    for w in instances:
+        if w.status != WarmInstance.STATUS_PENDING or w.id not in urls:
+            continue
+        w.status = WarmInstance.STATUS_READY
+        w.endpoint_url = urls[w.id]
+        w.ready_at = now
+        ready.append(w)
+        try:
+            warm_pool_time_to_ready_seconds.labels(challenge=str(w.challenge_id)).observe(
+                max(0.0, (now - w.created_at).total_seconds())
+            )
+        except Exception:
+            pass
+    if ready:
+        WarmInstance.objects.bulk_update(ready, ["status", "endpoint_url", "ready_at"])
+    return len(ready)
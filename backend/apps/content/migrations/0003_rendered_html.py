@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def render_existing(apps, schema_editor):
+    from apps.content.rendering import content_hash, render_markdown
+
+    for model_name in ('ContentPage', 'WriteUp'):
+        Model = apps.get_model('content', model_name)
+        for obj in Model.objects.only('id', 'content_md').iterator():
+            Model.objects.filter(id=obj.id).update(
+                content_html=render_markdown(obj.content_md), content_hash=content_hash(obj.content_md)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_writeup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentpage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contentpage',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='writeup',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='writeup',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
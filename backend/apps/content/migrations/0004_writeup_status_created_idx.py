@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_rendered_html'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='writeup',
+            index=models.Index(fields=['status', '-created_at'], name='content_wri_status_created_idx'),
+        ),
+    ]
@@ -7,8 +7,36 @@ from django.utils import timezone
 from apps.challenges.models import Challenge
 from apps.core.models import Team
 
+from .rendering import content_hash, render_markdown
 
-class ContentPage(models.Model):
+
+class RenderedMarkdownMixin(models.Model):
+    """
+    Keeps content_html (sanitized render of content_md) and content_hash in step with the source.
+    Rendering happens in save() only when the hash changed, so reads never touch Markdown or bleach.
+    """
+
+    content_html = models.TextField(blank=True, default="", editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    class Meta:
+        abstract = True
+
+    def refresh_rendered(self) -> bool:
+        digest = content_hash(self.content_md)
+        if digest == self.content_hash:
+            return False
+        self.content_html = render_markdown(self.content_md)
+        self.content_hash = digest
+        return True
+
+    def save(self, *args, **kwargs):
+        if self.refresh_rendered() and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "content_html", "content_hash"}
+        super().save(*args, **kwargs)
+
+
+class ContentPage(RenderedMarkdownMixin):
     slug = models.SlugField(max_length=140, unique=True)
     title = models.CharField(max_length=200)
     content_md = models.TextField(blank=True, default="")
@@ -21,7 +49,7 @@ class ContentPage(models.Model):
         return self.slug
 
 
-class WriteUp(models.Model):
+class WriteUp(RenderedMarkdownMixin):
     STATUS_PENDING = "pending"
     STATUS_APPROVED = "approved"
     STATUS_REJECTED = "rejected"
@@ -42,7 +70,11 @@ class WriteUp(models.Model):
     published_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        indexes = [models.Index(fields=["challenge", "status", "-created_at"])]
+        indexes = [
+            models.Index(fields=["challenge", "status", "-created_at"]),
+            # Moderation queue across challenges (keyset pagination by status)
+            models.Index(fields=["status", "-created_at"], name="content_wri_status_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
\ No newline at end of file
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+# Keyset pagination for (created_at DESC, id DESC) listings: the cursor is the last row's position,
+# so every page is an index range scan (challenge, status, -created_at) no matter how deep the
+# client pages, unlike OFFSET which reads and discards every earlier row.
+
+MAX_PAGE_SIZE = 100
+# "count" is bounded by default: COUNT over at most this many index entries, flagged as not exact beyond
+COUNT_CAP = 1000
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("utf-8")
+        ts, pk = raw.rsplit("|", 1)
+        created_at = parse_datetime(ts)
+        if created_at is None:
+            raise ValueError
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("invalid cursor")
+
+
+def keyset_page(qs: QuerySet, params, default_page_size: int = 20, default_count: str = "bounded") -> dict:
+    """
+    One page of `qs` ordered newest first. Query params: cursor (from a previous next_cursor),
+    page_size (1..MAX_PAGE_SIZE), count ("bounded" | "exact" | "none").
+    Returns {"rows", "next_cursor", "has_next", "has_prev", "page_size", "count", "count_exact"};
+    raises ValueError for malformed parameters.
+    """
+    try:
+        page_size = int(params.get("page_size") or default_page_size)
+    except ValueError:
+        raise ValueError("page_size must be an integer")
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    count_mode = params.get("count") or default_count
+    if count_mode not in {"bounded", "exact", "none"}:
+        raise ValueError("count must be 'bounded', 'exact' or 'none'")
+
+    count: Optional[int] = None
+    count_exact = False
+    if count_mode == "exact":
+        count, count_exact = qs.count(), True
+    elif count_mode == "bounded":
+        # COUNT(*) over a LIMITed subquery: cost stays flat on huge moderation queues
+        count = qs.order_by()[: COUNT_CAP + 1].count()
+        count_exact = count <= COUNT_CAP
+        count = min(count, COUNT_CAP)
+
+    cursor = params.get("cursor")
+    page_qs = qs.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        page_qs = page_qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(page_qs[: page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "rows": rows,
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None,
+        "has_next": has_next,
+        "has_prev": bool(cursor),
+        "page_size": page_size,
+        "count": count,
+        "count_exact": count_exact,
+    }
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import hashlib
+
+import bleach
+import markdown
+
+# Rendered once per content version (see RenderedMarkdownMixin) and served as-is, so the allow-list
+# is the only thing standing between user-submitted write-ups and other players' browsers.
+ALLOWED_TAGS = frozenset(bleach.sanitizer.ALLOWED_TAGS) | {
+    "p", "br", "hr", "pre", "code", "span", "div", "del", "sub", "sup",
+    "h1", "h2", "h3", "h4", "h5", "h6", "img",
+    "table", "thead", "tbody", "tr", "th", "td",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title", "rel"],
+    "abbr": ["title"],
+    "acronym": ["title"],
+    "img": ["src", "alt", "title"],
+    "code": ["class"],  # language-xyz from fenced blocks, for client-side highlighting
+    "th": ["align"],
+    "td": ["align"],
+}
+ALLOWED_PROTOCOLS = frozenset({"http", "https", "mailto"})
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+# Bump when the pipeline above changes so stored HTML is re-rendered on next save
+RENDERER_VERSION = "1"
+
+
+def content_hash(source: str) -> str:
+    """Digest of the Markdown source and renderer version; equal hashes mean the stored HTML is current."""
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{source or ''}".encode("utf-8")).hexdigest()
+
+
+def render_markdown(source: str) -> str:
+    """Markdown -> HTML, sanitized with bleach (disallowed tags stripped, unsafe URLs dropped)."""
+    html = markdown.markdown(source or "", extensions=MARKDOWN_EXTENSIONS, output_format="html")
+    return bleach.clean(
+        html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, protocols=ALLOWED_PROTOCOLS, strip=True
+    )
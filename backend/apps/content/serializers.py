@@ -8,7 +8,7 @@ from .models import ContentPage, WriteUp
 class ContentPageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContentPage
-        fields = ["slug", "title", "content_md", "content_json", "version", "published"]
+        fields = ["slug", "title", "content_md", "content_html", "content_hash", "content_json", "version", "published"]
 
 
 class WriteUpSerializer(serializers.ModelSerializer):
@@ -28,12 +28,23 @@ class WriteUpSerializer(serializers.ModelSerializer):
             "team",
             "title",
             "content_md",
+            "content_html",
+            "content_hash",
             "status",
             "moderation_notes",
             "created_at",
             "published_at",
         ]
-        read_only_fields = ["user", "team", "status", "moderation_notes", "published_at", "created_at"]
+        read_only_fields = [
+            "user",
+            "team",
+            "content_html",
+            "content_hash",
+            "status",
+            "moderation_notes",
+            "published_at",
+            "created_at",
+        ]
 
     def get_username(self, obj):
         try:
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.challenges.models import Challenge
+from apps.content.models import ContentPage, WriteUp
+from apps.content.rendering import content_hash, render_markdown
+
+User = get_user_model()
+
+
+class RenderMarkdownTests(TestCase):
+    def test_renders_markdown_and_strips_unsafe_markup(self):
+        html = render_markdown(
+            "# Solve\n\n```python\nprint(1)\n```\n\n"
+            "[ok](https://example.com) [bad](javascript:alert(1))\n\n"
+            "<script>alert(1)</script><img src=x onerror=alert(1)>"
+        )
+        self.assertIn("<h1>Solve</h1>", html)
+        self.assertIn('<code class="language-python">', html)
+        self.assertIn('<a href="https://example.com">ok</a>', html)
+        self.assertNotIn("javascript:", html)
+        self.assertNotIn("<script", html)
+        self.assertNotIn("onerror", html)
+
+    def test_content_hash_tracks_source(self):
+        self.assertEqual(content_hash("a"), content_hash("a"))
+        self.assertNotEqual(content_hash("a"), content_hash("b"))
+
+
+class RenderedContentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="u1", password="pass123456789")
+        self.staff = User.objects.create_user(username="staff", password="pass123456789", is_staff=True)
+        self.challenge = Challenge.objects.create(
+            title="Chal", slug="chal", description="desc", flag_hmac="x" * 64, points_max=500
+        )
+
+    def test_writeup_rendered_once_at_create_and_served_public(self):
+        self.client.login(username="u1", password="pass123456789")
+        with mock.patch("apps.content.models.render_markdown", wraps=render_markdown) as render:
+            resp = self.client.post(
+                "/api/content/challenges/%d/writeups" % self.challenge.id,
+                {"title": "W", "content_md": "**bold** <script>x</script>"},
+            )
+            self.assertEqual(resp.status_code, 201)
+            self.assertEqual(resp.json()["content_html"], "<p><strong>bold</strong> x</p>")
+
+            self.client.login(username="staff", password="pass123456789")
+            self.client.post("/api/content/writeups/%d/moderate" % resp.json()["id"], {"action": "approve"})
+            rows = self.client.get("/api/content/challenges/%d/writeups" % self.challenge.id).json()["results"]
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(rows[0]["content_html"], "<p><strong>bold</strong> x</p>")
+        self.assertEqual(rows[0]["content_hash"], content_hash("**bold** <script>x</script>"))
+
+    def test_partial_save_rerenders_changed_source(self):
+        w = WriteUp.objects.create(challenge=self.challenge, user=self.user, title="W", content_md="one")
+        WriteUp.objects.filter(id=w.id).update(content_md="two")  # e.g. a bulk edit bypassing save()
+        w.refresh_from_db()
+        w.status = WriteUp.STATUS_APPROVED
+        w.save(update_fields=["status"])
+        w.refresh_from_db()
+        self.assertEqual(w.content_html, "<p>two</p>")
+        self.assertEqual(w.content_hash, content_hash("two"))
+
+    def test_content_page_etag(self):
+        ContentPage.objects.create(slug="rules", title="Rules", content_md="- no DoS")
+        resp = self.client.get("/api/content/pages/rules")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["content_html"], "<ul>\n<li>no DoS</li>\n</ul>")
+        self.assertEqual(self.client.get("/api/content/pages/rules", HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+
+        page = ContentPage.objects.get(slug="rules")
+        page.content_md = "- no DoS\n- no sharing"
+        page.save()
+        self.assertEqual(self.client.get("/api/content/pages/rules", HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 200)
+
+    def test_content_page_etag_covers_every_field(self):
+        ContentPage.objects.create(slug="rules", title="Rules", content_md="- no DoS")
+        etag = self.client.get("/api/content/pages/rules")["ETag"]
+        # Admin edits that leave the Markdown (and version) alone still change the validator
+        ContentPage.objects.filter(slug="rules").update(title="House rules")
+        resp = self.client.get("/api/content/pages/rules", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["title"], "House rules")
+        ContentPage.objects.filter(slug="rules").update(content_json={"blocks": []})
+        self.assertNotEqual(self.client.get("/api/content/pages/rules")["ETag"], resp["ETag"])
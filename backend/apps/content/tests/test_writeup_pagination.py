@@ -0,0 +1,86 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.challenges.models import Challenge
+from apps.content.models import WriteUp
+
+User = get_user_model()
+
+
+class WriteUpPaginationTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", password="pass123456789", is_staff=True)
+        self.challenge = Challenge.objects.create(
+            title="Chal", slug="chal", description="desc", flag_hmac="x" * 64, points_max=500
+        )
+        other = Challenge.objects.create(title="Other", slug="other", description="d", flag_hmac="y" * 64)
+        base = timezone.now()
+        rows = []
+        for i in range(25):
+            user = User.objects.create_user(username=f"u{i}")
+            # Pairs share a timestamp so the id tie-breaker is exercised
+            rows.append(
+                WriteUp(challenge=self.challenge if i % 5 else other, user=user, title=f"w{i}", content_md="x",
+                        created_at=base - timedelta(seconds=i // 2))
+            )
+        WriteUp.objects.bulk_create(rows)
+        self.client.login(username="staff", password="pass123456789")
+
+    def _walk(self, url):
+        seen, cursor = [], None
+        while True:
+            resp = self.client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            self.assertEqual(resp.status_code, 200)
+            data = resp.json()
+            seen.extend(r["id"] for r in data["results"])
+            cursor = data["next_cursor"]
+            if not data["has_next"]:
+                self.assertIsNone(cursor)
+                return seen, data
+
+    def test_cursor_walk_visits_every_row_once_in_order(self):
+        seen, _ = self._walk("/api/content/writeups?status=pending&page_size=4")
+        expected = list(WriteUp.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+        seen, _ = self._walk(f"/api/content/writeups?status=pending&challenge_id={self.challenge.id}&page_size=7")
+        self.assertEqual(len(seen), 20)
+
+    def test_admin_list_is_constant_in_queries_and_counts_bounded(self):
+        def queries(page_size):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(f"/api/content/writeups?status=pending&page_size={page_size}")
+            self.assertEqual(resp.status_code, 200)
+            return len(ctx), resp.json()
+
+        small, data = queries(2)
+        large, _ = queries(25)
+        self.assertEqual(small, large)  # user and challenge come from the same query
+        self.assertEqual((data["count"], data["count_exact"]), (25, True))
+        self.assertEqual(data["results"][0]["username"], "u1")
+
+        with mock.patch("apps.content.pagination.COUNT_CAP", 10):
+            data = self.client.get("/api/content/writeups?status=pending").json()
+        self.assertEqual((data["count"], data["count_exact"]), (10, False))
+        self.assertIsNone(self.client.get("/api/content/writeups?count=none").json()["count"])
+
+    def test_public_listing_is_paginated(self):
+        WriteUp.objects.update(status=WriteUp.STATUS_APPROVED)
+        self.client.logout()
+        url = f"/api/content/challenges/{self.challenge.id}/writeups?page_size=5"
+        data = self.client.get(url).json()
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNone(data["count"])
+        seen, _ = self._walk(url)
+        self.assertEqual(len(set(seen)), 20)
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get("/api/content/writeups?cursor=not-a-cursor").status_code, 400)
+        self.assertEqual(self.client.get("/api/content/writeups?page_size=abc").status_code, 400)
+        self.assertEqual(self.client.get("/api/content/writeups?count=maybe").status_code, 400)
@@ -83,4 +83,6 @@ class WriteUpModerationTests(TestCase):
         resp_csv = self.client.get(f"/api/content/writeups/{wid}/audit.csv")
         self.assertEqual(resp_csv.status_code, 200)
         self.assertTrue(resp_csv["Content-Type"].startswith("text/csv"))
-        self.assertIn("timestamp,actor_username,action,notes,prev_status,new_status,hash,prev_hash", resp_csv.content.decode("utf-8").splitlines()[0])
\ No newline at end of file
+        # Streamed response
+        body = b"".join(resp_csv.streaming_content).decode("utf-8")
+        self.assertIn("timestamp,actor_username,action,notes,prev_status,new_status,hash,prev_hash", body.splitlines()[0])
\ No newline at end of file
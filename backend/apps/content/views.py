@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import hashlib
+import json
+
 from django.http import Http404
 from django.utils import timezone
 from django.conf import settings
@@ -8,17 +10,31 @@ from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.audit import iter_audit_rows, record_request, stream_csv
 from apps.core.models import Team, ScoreEvent, Membership, AuditLog
 from apps.challenges.models import Challenge
 from django.contrib.auth import get_user_model
 
 from .models import ContentPage, WriteUp
+from .pagination import keyset_page
 from .serializers import ContentPageSerializer, WriteUpSerializer
 
 
 User = get_user_model()
 
 
+def _page_payload(page: dict) -> dict:
+    return {
+        "results": WriteUpSerializer(page["rows"], many=True).data,
+        "next_cursor": page["next_cursor"],
+        "has_next": page["has_next"],
+        "has_prev": page["has_prev"],
+        "page_size": page["page_size"],
+        "count": page["count"],
+        "count_exact": page["count_exact"],
+    }
+
+
 class ContentPageView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -27,24 +43,37 @@ class ContentPageView(APIView):
             page = ContentPage.objects.get(slug=slug, published=True)
         except ContentPage.DoesNotExist:
             raise Http404
-        return Response(ContentPageSerializer(page).data)
+        # Validator over everything the response carries (title, content_json, ... not only the Markdown):
+        # unchanged pages cost clients no body at all
+        data = ContentPageSerializer(page).data
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+        headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
 
 
 class ChallengeWriteUpsView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, id: int):
+        """
+        Write-ups of a challenge (default approved), newest first, keyset-paginated:
+        ?cursor=<next_cursor>&page_size=20; add count=bounded|exact for a total.
+        """
         status_q = request.query_params.get("status", WriteUp.STATUS_APPROVED)
         try:
             challenge = Challenge.objects.get(id=id)
         except Challenge.DoesNotExist:
             raise Http404
-        qs = WriteUp.objects.filter(challenge=challenge)
+        qs = WriteUp.objects.filter(challenge=challenge).select_related("user", "challenge")
         if status_q:
             qs = qs.filter(status=status_q)
-        qs = qs.order_by("-published_at", "-created_at")
-        data = WriteUpSerializer(qs, many=True).data
-        return Response({"results": data})
+        try:
+            page = keyset_page(qs, request.query_params, default_count="none")
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_page_payload(page))
 
     def post(self, request, id: int):
         if not request.user or not request.user.is_authenticated:
@@ -109,24 +138,12 @@ class WriteUpModerateView(APIView):
             w.moderation_notes = notes
             w.save(update_fields=["status", "moderation_notes"])
 
-        # Audit log (chain)
-        prev = (
-            AuditLog.objects.filter(target_type="writeup", target_id=str(w.id)).order_by("-timestamp").first()
-        )
-        prev_hash = prev.hash if prev else ""
-        actor_id = getattr(request.user, "id", None)
-        payload = f"{prev_hash}|{actor_id}|{action}|writeup|{w.id}|{notes}|{prev_status}->{w.status}|{w.moderation_notes}|{timezone.now().isoformat()}"
-        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
-        AuditLog.objects.create(
-            actor_user=request.user,
-            action="writeup_moderate",
-            target_type="writeup",
-            target_id=str(w.id),
-            timestamp=timezone.now(),
-            ip=request.META.get("REMOTE_ADDR"),
+        record_request(
+            request,
+            "writeup_moderate",
+            "writeup",
+            w.id,
             data={"action": action, "notes": notes, "prev_status": prev_status, "new_status": w.status},
-            prev_hash=prev_hash,
-            hash=digest,
         )
 
         return Response(WriteUpSerializer(w).data)
@@ -134,41 +151,28 @@ class WriteUpModerateView(APIView):
 
 class WriteUpsAdminListView(APIView):
     """
-    Staff-only listing of write-ups by status (default pending), optional challenge_id filter, with pagination.
+    Staff-only listing of write-ups by status (default pending), optional challenge_id filter, with keyset
+    pagination (?cursor=<next_cursor>&page_size=20). count is bounded by default (exact above COUNT_CAP
+    only with count=exact; count=none skips it).
     """
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
         status_q = (request.query_params.get("status") or WriteUp.STATUS_PENDING).strip()
         challenge_id = request.query_params.get("challenge_id")
-        try:
-            page = int(request.query_params.get("page", "1"))
-        except ValueError:
-            page = 1
-        try:
-            page_size = int(request.query_params.get("page_size", "20"))
-        except ValueError:
-            page_size = 20
-        qs = WriteUp.objects.all()
+        qs = WriteUp.objects.select_related("user", "challenge")
         if challenge_id:
-            qs = qs.filter(challenge_id=challenge_id)
+            try:
+                qs = qs.filter(challenge_id=int(challenge_id))
+            except ValueError:
+                return Response({"detail": "challenge_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
         if status_q:
             qs = qs.filter(status=status_q)
-        qs = qs.order_by("-created_at")
-        total = qs.count()
-        start = max(0, (page - 1) * page_size)
-        end = start + page_size
-        data = WriteUpSerializer(qs[start:end], many=True).data
-        return Response(
-            {
-                "results": data,
-                "count": total,
-                "page": page,
-                "page_size": page_size,
-                "has_next": end < total,
-                "has_prev": start > 0,
-            }
-        )
+        try:
+            page = keyset_page(qs, request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_page_payload(page))
 
 
 class WriteUpAuditLogView(APIView):
@@ -178,7 +182,11 @@ class WriteUpAuditLogView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, id: int):
-        logs = AuditLog.objects.filter(target_type="writeup", target_id=str(id)).order_by("-timestamp")
+        logs = (
+            AuditLog.objects.filter(target_type="writeup", target_id=str(id))
+            .select_related("actor_user")
+            .order_by("-timestamp")
+        )
         results = []
         for l in logs:
             results.append(
@@ -198,29 +206,31 @@ class WriteUpAuditLogView(APIView):
 
 class WriteUpAuditLogCsvView(APIView):
     """
-    Staff-only CSV export of audit trail for a write-up.
+    Staff-only CSV export of audit trail for a write-up (streamed).
     """
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, id: int):
-        import csv
-        from io import StringIO
         logs = AuditLog.objects.filter(target_type="writeup", target_id=str(id)).order_by("-timestamp")
-        buf = StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(["timestamp", "actor_username", "action", "notes", "prev_status", "new_status", "hash", "prev_hash"])
-        for l in logs:
-            writer.writerow([
-                l.timestamp.isoformat(),
-                getattr(l.actor_user, "username", "") if l.actor_user_id else "",
-                l.action,
-                (l.data or {}).get("notes", ""),
-                (l.data or {}).get("prev_status", ""),
-                (l.data or {}).get("new_status", ""),
-                l.hash,
-                l.prev_hash,
-            ])
-        from django.http import HttpResponse
-        resp = HttpResponse(buf.getvalue(), content_type="text/csv")
-        resp["Content-Disposition"] = f'attachment; filename="writeup-{id}-audit.csv"'
-        return resp
\ No newline at end of file
+        fields = ("timestamp", "actor_user__username", "action", "data", "hash", "prev_hash")
+
+        def row(values):
+            ts, username, action, data, digest, prev_hash = values
+            data = data or {}
+            return [
+                ts.isoformat(),
+                username or "",
+                action,
+                data.get("notes", ""),
+                data.get("prev_status", ""),
+                data.get("new_status", ""),
+                digest,
+                prev_hash,
+            ]
+
+        return stream_csv(
+            ["timestamp", "actor_username", "action", "notes", "prev_status", "new_status", "hash", "prev_hash"],
+            iter_audit_rows(logs, fields, row),
+            f"writeup-{id}-audit.csv",
+            request,
+        )
\ No newline at end of file
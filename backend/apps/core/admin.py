@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Team, Membership, ScoreEvent, AuditLog, RateLimitConfig, UiConfig
+from .models import Team, Membership, ScoreEvent, AuditLog, AuditSeal, RateLimitConfig, UiConfig
 
 
 @admin.register(Team)
@@ -23,10 +23,15 @@ class ScoreEventAdmin(admin.ModelAdmin):
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ("timestamp", "actor_user", "action", "target_type", "target_id")
+    list_display = ("seq", "timestamp", "actor_user", "action", "target_type", "target_id")
     search_fields = ("action", "target_type", "target_id")
 
 
+@admin.register(AuditSeal)
+class AuditSealAdmin(admin.ModelAdmin):
+    list_display = ("day", "first_seq", "last_seq", "leaf_count", "root", "created_at")
+
+
 @admin.register(RateLimitConfig)
 class RateLimitConfigAdmin(admin.ModelAdmin):
     list_display = ("scope", "user_rate", "ip_rate", "updated_at")
@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import ipaddress
+import json
+import logging
+import threading
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Max, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.ipv6 import clean_ipv6_address
+
+from . import locks
+from .merkle import MerkleBuilder, inclusion_proof
+from .models import AuditLog, AuditSeal
+
+logger = logging.getLogger(__name__)
+
+# --- Global hash chain ---
+#
+# Every AuditLog row carries a global sequence number and hash = sha256(canonical entry incl. seq and
+# prev_hash), prev_hash being the hash of row seq - 1. Subsystems call record()/record_request();
+# with AUDIT_QUEUE_REDIS_URL the entry is pushed onto a Redis list after commit and the
+# flush_audit_queue task (the single writer) appends queued entries in batches. Without Redis the
+# entry is appended right away. Appends are optimistic: seq is unique, so a writer that lost a race
+# re-reads the head and retries instead of forking the chain.
+
+AUDIT_QUEUE_KEY = "audit:queue"
+AUDIT_WRITER_LOCK_KEY = "audit:writer"
+# Writer lock TTL, renewed before each batch (apps.core.locks)
+AUDIT_WRITER_LOCK_SECONDS = 60
+
+_queue_client = None
+_queue_lock = threading.Lock()
+
+
+def _queue_redis():
+    """Client for AUDIT_QUEUE_REDIS_URL (defaults to REDIS_URL); None without Redis."""
+    global _queue_client
+    url = getattr(settings, "AUDIT_QUEUE_REDIS_URL", None)
+    if not url:
+        return None
+    if _queue_client is None:
+        with _queue_lock:
+            if _queue_client is None:
+                import redis
+
+                _queue_client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    return _queue_client
+
+
+def _normalize_ip(ip: Optional[str]) -> Optional[str]:
+    # In the form the database hands back, so the hash can be recomputed from the stored row
+    if not ip:
+        return None
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    return clean_ipv6_address(ip) if addr.version == 6 else str(addr)
+
+
+def canonical_entry(log: AuditLog) -> bytes:
+    """The exact bytes hashed for a row: every stored field except hash, as sorted compact JSON."""
+    ts = log.timestamp.astimezone(dt_timezone.utc).isoformat()
+    return json.dumps(
+        {
+            "seq": log.seq,
+            "prev_hash": log.prev_hash,
+            "timestamp": ts,
+            "actor_user_id": log.actor_user_id,
+            "actor_team_id": log.actor_team_id,
+            "action": log.action,
+            "target_type": log.target_type,
+            "target_id": log.target_id,
+            "ip": log.ip,
+            "data": log.data or {},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def entry_hash(log: AuditLog) -> str:
+    return hashlib.sha256(canonical_entry(log)).hexdigest()
+
+
+def build_entry(
+    action: str,
+    target_type: str,
+    target_id,
+    actor_user_id: Optional[int] = None,
+    actor_team_id: Optional[int] = None,
+    ip: Optional[str] = None,
+    data: Optional[dict] = None,
+) -> dict:
+    """A JSON-serializable pending entry; seq and hashes are assigned by the writer."""
+    return {
+        "timestamp": timezone.now().astimezone(dt_timezone.utc).isoformat(),
+        "actor_user_id": actor_user_id,
+        "actor_team_id": actor_team_id,
+        "action": action,
+        "target_type": target_type,
+        "target_id": str(target_id),
+        "ip": _normalize_ip(ip),
+        # Round-trip through JSON so the hashed value equals what the JSONField reads back
+        "data": json.loads(json.dumps(data or {}, default=str)),
+    }
+
+
+def append_entries(entries: Sequence[dict], attempts: int = 5) -> List[AuditLog]:
+    """
+    Append pending entries to the chain in one transaction and one INSERT. Retries from the new head
+    when another writer appended concurrently (unique seq).
+    """
+    if not entries:
+        return []
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                head = AuditLog.objects.filter(seq__isnull=False).order_by("-seq").values_list("seq", "hash").first()
+                seq, prev_hash = head or (0, "")
+                rows = []
+                for entry in entries:
+                    seq += 1
+                    row = AuditLog(
+                        seq=seq,
+                        prev_hash=prev_hash,
+                        timestamp=parse_datetime(entry["timestamp"]),
+                        actor_user_id=entry.get("actor_user_id"),
+                        actor_team_id=entry.get("actor_team_id"),
+                        action=entry["action"],
+                        target_type=entry["target_type"],
+                        target_id=entry["target_id"],
+                        ip=entry.get("ip"),
+                        data=entry.get("data") or {},
+                    )
+                    row.hash = entry_hash(row)
+                    prev_hash = row.hash
+                    rows.append(row)
+                AuditLog.objects.bulk_create(rows)
+            break
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+    from .metrics import audit_entries_written_total
+
+    try:
+        audit_entries_written_total.inc(len(rows))
+    except Exception:
+        pass
+    return rows
+
+
+def _enqueue(entry: dict) -> None:
+    client = _queue_redis()
+    try:
+        client.rpush(AUDIT_QUEUE_KEY, json.dumps(entry))
+    except Exception:
+        # Never drop an audit entry: write it inline instead
+        logger.warning("Audit queue unavailable, appending inline", exc_info=True)
+        append_entries([entry])
+
+
+def record(
+    action: str,
+    target_type: str,
+    target_id,
+    actor=None,
+    team=None,
+    ip: Optional[str] = None,
+    data: Optional[dict] = None,
+) -> None:
+    """
+    Audit an action. Queued (written by flush_audit_queue) when AUDIT_QUEUE_REDIS_URL is set, else
+    appended immediately; queued entries are only pushed once the caller's transaction commits.
+    """
+    entry = build_entry(
+        action,
+        target_type,
+        target_id,
+        actor_user_id=getattr(actor, "pk", None),
+        actor_team_id=getattr(team, "pk", None),
+        ip=ip,
+        data=data,
+    )
+    if _queue_redis() is None:
+        append_entries([entry])
+    else:
+        transaction.on_commit(lambda: _enqueue(entry))
+
+
+def record_request(request, action: str, target_type: str, target_id, data: Optional[dict] = None) -> None:
+    """record() with the acting user and client IP taken from the request."""
+    user = getattr(request, "user", None)
+    record(
+        action,
+        target_type,
+        target_id,
+        actor=user if user is not None and user.is_authenticated else None,
+        ip=request.META.get("REMOTE_ADDR"),
+        data=data,
+    )
+
+
+def flush_queue(batch_size: Optional[int] = None, max_batches: int = 100) -> int:
+    """
+    Single writer: drain queued entries in batches onto the chain; returns how many were written.
+    A token-checked Redis lock, renewed per batch, keeps concurrent invocations from interleaving. At-least-once: a crash between the
+    commit and the LTRIM re-appends that batch on the next run.
+    """
+    client = _queue_redis()
+    if client is None:
+        return 0
+    batch_size = batch_size or int(getattr(settings, "AUDIT_BATCH_SIZE", 500))
+    token = locks.acquire(AUDIT_WRITER_LOCK_KEY, AUDIT_WRITER_LOCK_SECONDS, client=client)
+    if token is None:
+        return 0
+    written = 0
+    try:
+        for _ in range(max_batches):
+            # Renewed per batch; a writer stalled past the TTL stops instead of re-reading the batch
+            # the next lock holder is appending
+            if not locks.extend(AUDIT_WRITER_LOCK_KEY, token, AUDIT_WRITER_LOCK_SECONDS, client=client):
+                logger.warning("Audit writer lock lost after %d entries, stopping", written)
+                break
+            items = client.lrange(AUDIT_QUEUE_KEY, 0, batch_size - 1)
+            if not items:
+                break
+            append_entries([json.loads(item) for item in items])
+            client.ltrim(AUDIT_QUEUE_KEY, len(items), -1)
+            written += len(items)
+            if len(items) < batch_size:
+                break
+    finally:
+        locks.release(AUDIT_WRITER_LOCK_KEY, token, client=client)
+    from .metrics import audit_queue_depth
+
+    try:
+        audit_queue_depth.set(client.llen(AUDIT_QUEUE_KEY))
+    except Exception:
+        pass
+    return written
+
+
+# --- Verification and sealing ---
+#
+# verify_chain() re-derives every hash in one pass over a server-side cursor, holding only the
+# previous row. seal_day() stores a Merkle root (apps.core.merkle) over the contiguous seq range
+# appended since the previous seal, so a single entry can later be proven against a small, signed-off
+# root with an O(log n) path instead of replaying the chain.
+
+VERIFY_CHUNK_SIZE = 2000
+
+_VERIFY_FIELDS = (
+    "id", "seq", "prev_hash", "hash", "timestamp", "actor_user_id", "actor_team_id",
+    "action", "target_type", "target_id", "ip", "data",
+)
+
+
+def verify_chain(from_seq: int = 1, to_seq: Optional[int] = None) -> Iterator[dict]:
+    """
+    Yield one problem dict ({"seq", "problem", ...}) per broken link: a gap in seq, a prev_hash that
+    does not match the previous row, or a hash that does not match the row's contents. The last item
+    is always {"checked": n, "head": hash} summarizing the pass.
+    """
+    qs = AuditLog.objects.filter(seq__gte=from_seq).order_by("seq").only(*_VERIFY_FIELDS)
+    if to_seq is not None:
+        qs = qs.filter(seq__lte=to_seq)
+    expected_seq = from_seq
+    prev_hash = ""
+    if from_seq > 1:
+        prev_hash = AuditLog.objects.filter(seq=from_seq - 1).values_list("hash", flat=True).first() or ""
+    checked = 0
+    for log in qs.iterator(chunk_size=VERIFY_CHUNK_SIZE):
+        if log.seq != expected_seq:
+            yield {"seq": log.seq, "problem": "gap", "expected_seq": expected_seq}
+        if log.prev_hash != prev_hash:
+            yield {"seq": log.seq, "problem": "prev_hash", "expected": prev_hash, "found": log.prev_hash}
+        digest = entry_hash(log)
+        if digest != log.hash:
+            yield {"seq": log.seq, "problem": "hash", "expected": digest, "found": log.hash}
+        prev_hash, expected_seq = log.hash, log.seq + 1
+        checked += 1
+    yield {"checked": checked, "head": prev_hash}
+
+
+def _hashes(first_seq: int, last_seq: int) -> Iterator[str]:
+    qs = AuditLog.objects.filter(seq__gte=first_seq, seq__lte=last_seq).order_by("seq").values_list("hash", flat=True)
+    return qs.iterator(chunk_size=VERIFY_CHUNK_SIZE)
+
+
+def seal_day(day: Optional[date] = None) -> Optional[AuditSeal]:
+    """
+    Seal `day` (default: yesterday, UTC): the Merkle root over every entry appended since the previous
+    seal whose seq is at most the last one timestamped before the end of that day. Idempotent; returns
+    None when there is nothing new to seal. Days are sealed in order: ValueError for a day before the
+    latest seal.
+    """
+    if day is None:
+        day = (timezone.now().astimezone(dt_timezone.utc) - timedelta(days=1)).date()
+    existing = AuditSeal.objects.filter(day=day).first()
+    if existing is not None:
+        return existing
+    prev = AuditSeal.objects.order_by("-day").first()
+    if prev is not None and prev.day > day:
+        raise ValueError(f"{day} precedes the latest seal ({prev.day})")
+    first_seq = prev.last_seq + 1 if prev else 1
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+    last_seq = AuditLog.objects.filter(seq__gte=first_seq, timestamp__lt=end).aggregate(m=Max("seq"))["m"]
+    if last_seq is None:
+        return None
+    builder = MerkleBuilder()
+    for h in _hashes(first_seq, last_seq):
+        builder.add(h)
+    seal = AuditSeal.objects.create(
+        day=day, first_seq=first_seq, last_seq=last_seq, leaf_count=builder.count, root=builder.root()
+    )
+    logger.info("Sealed audit day %s: seq %s-%s root %s", day, first_seq, last_seq, seal.root)
+    return seal
+
+
+def verify_seal(seal: AuditSeal) -> bool:
+    """Recompute a seal's root from the stored entries (streaming)."""
+    builder = MerkleBuilder()
+    for h in _hashes(seal.first_seq, seal.last_seq):
+        builder.add(h)
+    return builder.count == seal.leaf_count and builder.root() == seal.root
+
+
+def entry_proof(seq: int) -> Optional[dict]:
+    """
+    Inclusion proof for entry `seq` against the seal covering it: only that seal's leaf hashes are
+    read. None when the entry does not exist or is not sealed yet.
+    """
+    log = AuditLog.objects.filter(seq=seq).only("seq", "hash").first()
+    seal = AuditSeal.objects.filter(first_seq__lte=seq, last_seq__gte=seq).first()
+    if log is None or seal is None:
+        return None
+    index = seq - seal.first_seq
+    return {
+        "seq": seq,
+        "hash": log.hash,
+        "day": seal.day.isoformat(),
+        "root": seal.root,
+        "leaf_index": index,
+        "leaf_count": seal.leaf_count,
+        "path": inclusion_proof(list(_hashes(seal.first_seq, seal.last_seq)), index),
+    }
+
+
+# --- CSV export ---
+#
+# Streaming CSV export of AuditLog rows. Rows are read through a server-side cursor
+# (QuerySet.iterator) with the actor's username joined in, and written out in small chunks, so
+# memory stays flat and the first bytes go out before the query has been fully read.
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows per yielded chunk: fewer, larger writes than one per row, still a quick first byte
+ROWS_PER_WRITE = 200
+
+# Global export columns (values_list fields; "data" is written as JSON)
+AUDIT_CSV_FIELDS = (
+    "timestamp",
+    "actor_user__username",
+    "action",
+    "target_type",
+    "target_id",
+    "ip",
+    "data",
+    "prev_hash",
+    "hash",
+)
+AUDIT_CSV_HEADER = [
+    "timestamp",
+    "actor_username",
+    "action",
+    "target_type",
+    "target_id",
+    "ip",
+    "data",
+    "prev_hash",
+    "hash",
+]
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line back instead of buffering it
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_chunks(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    lines: List[str] = []
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+async def _aiter_chunks(chunks: Iterator[str]) -> AsyncIterator[str]:
+    """
+    Async view of a sync chunk generator. Each chunk is produced in the request's sync thread
+    (thread_sensitive, so the server-side cursor stays on one connection) and handed to the server
+    before the next is read; the generator is closed if the client goes away.
+    """
+    done = object()
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await pull(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence], filename: str, request=None) -> StreamingHttpResponse:
+    """
+    CSV download streamed chunk by chunk. Pass the request: under ASGI the body must be an async
+    iterator, or Django buffers a sync one completely before sending the first byte.
+    """
+    chunks = csv_chunks(header, rows)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        chunks = _aiter_chunks(chunks)
+    resp = StreamingHttpResponse(chunks, content_type="text/csv")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def iter_audit_rows(qs: QuerySet, fields: Sequence[str], transform: Callable[[tuple], Sequence]) -> Iterator[Sequence]:
+    """values_list rows of `qs` (joins included) through a server-side cursor, mapped by `transform`."""
+    for values in qs.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield transform(values)
+
+
+def _global_row(values: tuple) -> Sequence:
+    ts, username, action, target_type, target_id, ip, data, prev_hash, digest = values
+    return [
+        ts.isoformat(),
+        username or "",
+        action,
+        target_type,
+        target_id,
+        ip or "",
+        json.dumps(data or {}, sort_keys=True, separators=(",", ":")),
+        prev_hash,
+        digest,
+    ]
+
+
+def audit_csv_response(qs: QuerySet, filename: str, request=None) -> StreamingHttpResponse:
+    """All columns of the AuditLog rows in `qs`, in the queryset's order."""
+    return stream_csv(AUDIT_CSV_HEADER, iter_audit_rows(qs, AUDIT_CSV_FIELDS, _global_row), filename, request)
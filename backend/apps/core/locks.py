@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import secrets
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Short-lived mutual exclusion between workers (tick runs, the audit writer). With LOCK_REDIS_URL
+# (defaults to REDIS_URL) a lock is SET NX PX with a random token, and renew/release compare the token
+# in a Lua script so a holder whose lock already expired can never extend or delete someone else's.
+# Without Redis the default cache is used under a process lock: with LocMemCache that only excludes
+# threads of one process, so run several workers only against Redis.
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_client = None
+_client_lock = threading.Lock()
+_local_lock = threading.Lock()
+
+
+def lock_redis():
+    """Client for LOCK_REDIS_URL; None without Redis."""
+    global _client
+    url = getattr(settings, "LOCK_REDIS_URL", None)
+    if not url:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import redis
+
+                _client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    return _client
+
+
+def acquire(key: str, ttl_seconds: float, client=None) -> Optional[str]:
+    """Take the lock for ttl_seconds; the token to renew/release it with, or None if it is held."""
+    token = secrets.token_hex(16)
+    client = client or lock_redis()
+    if client is not None:
+        return token if client.set(key, token, nx=True, px=int(ttl_seconds * 1000)) else None
+    return token if cache.add(key, token, timeout=ttl_seconds) else None
+
+
+def extend(key: str, token: str, ttl_seconds: float, client=None) -> bool:
+    """Reset the TTL of a lock still held with `token`; False if it was lost."""
+    client = client or lock_redis()
+    if client is not None:
+        return bool(client.eval(_EXTEND_LUA, 1, key, token, int(ttl_seconds * 1000)))
+    with _local_lock:
+        if cache.get(key) != token:
+            return False
+        cache.set(key, token, timeout=ttl_seconds)
+        return True
+
+
+def release(key: str, token: str, client=None) -> None:
+    """Delete the lock only if it is still held with `token`."""
+    client = client or lock_redis()
+    if client is not None:
+        client.eval(_RELEASE_LUA, 1, key, token)
+        return
+    with _local_lock:
+        if cache.get(key) == token:
+            cache.delete(key)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import pickle
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import SimpleRateThrottle
+
+from apps.core.throttles import GCRARateThrottle, _gcra_redis
+
+
+class _BenchMixin:
+    scope = "bench"
+    bench_key = "bench"
+
+    def get_cache_key(self, request, view):
+        return f"throttle_{self.bench_key}"
+
+
+def _throttle_classes(rate: str, run_id: str) -> Dict[str, type]:
+    # Fixed rate and one shared key per run: every thread competes for the same bucket
+    legacy = type("LegacyBench", (_BenchMixin, SimpleRateThrottle), {"rate": rate, "bench_key": f"legacy-{run_id}"})
+    gcra = type("GCRABench", (_BenchMixin, GCRARateThrottle), {"rate": rate, "bench_key": f"gcra-{run_id}"})
+    return {"legacy": legacy, "gcra": gcra}
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the DRF list-based throttle (SimpleRateThrottle) against the atomic GCRA throttle under "
+        "concurrent load on one key. Reports admitted requests vs. the limit, throughput and call latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent callers (default: 16)")
+        parser.add_argument("--requests", type=int, default=400, help="Calls per thread (default: 400)")
+        parser.add_argument("--rate", default="100/min", help="Throttle rate (default: 100/min)")
+        parser.add_argument("--engine", choices=["legacy", "gcra", "both"], default="both")
+
+    def handle(self, *args, **options):
+        threads, per_thread = options["threads"], options["requests"]
+        if threads <= 0 or per_thread <= 0:
+            raise CommandError("--threads and --requests must be positive")
+        run_id = str(int(time.time() * 1000))
+        classes = _throttle_classes(options["rate"], run_id)
+        limit, duration = classes["legacy"]().parse_rate(options["rate"])
+        cache_backend = settings.CACHES["default"]["BACKEND"].rsplit(".", 1)[-1]
+        backend = "redis (Lua)" if _gcra_redis() is not None else "local (cache + process lock)"
+        self.stdout.write(
+            self.style.WARNING(
+                f"threads={threads} calls={threads * per_thread} rate={options['rate']} cache={cache_backend} gcra={backend}"
+            )
+        )
+        engines = ["legacy", "gcra"] if options["engine"] == "both" else [options["engine"]]
+        for name in engines:
+            self._run(name, classes[name], threads, per_thread, limit, duration)
+
+    def _run(self, name: str, cls: type, threads: int, per_thread: int, limit: int, duration: int) -> None:
+        request = APIRequestFactory().post("/bench")
+        allowed = [0] * threads
+        latencies: List[List[float]] = [[] for _ in range(threads)]
+        barrier = threading.Barrier(threads)
+
+        def worker(i: int):
+            barrier.wait()
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                if cls().allow_request(request, None):
+                    allowed[i] += 1
+                latencies[i].append((time.perf_counter() - started) * 1e6)
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - started
+
+        flat = [v for per in latencies for v in per]
+        admitted = sum(allowed)
+        # The burst plus what legitimately refills while the run lasts
+        budget = limit + int(wall * limit / duration)
+        key = cls().get_cache_key(request, None)
+        state = cache.get(key if name == "legacy" else f"gcra:{key}")
+        state_bytes = len(pickle.dumps(state)) if state is not None else 0
+        style = self.style.SUCCESS if admitted <= budget else self.style.ERROR
+        self.stdout.write(
+            style(
+                f"{name:6s} admitted={admitted} budget={budget} overshoot={max(0, admitted - budget)} "
+                f"calls/s={len(flat) / wall:.0f} p50_us={statistics.median(flat):.0f} p99_us={_pct(flat, 0.99):.0f} "
+                f"state_bytes={state_bytes}"
+            )
+        )
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.core.audit import seal_day
+
+
+class Command(BaseCommand):
+    help = "Store the Merkle root of a day's audit entries (default: yesterday, UTC)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", type=str, help="Day to seal (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        day = None
+        if options.get("day"):
+            try:
+                day = parse_date(options["day"])
+            except ValueError:
+                day = None
+            if day is None:
+                raise CommandError("--day must be YYYY-MM-DD")
+        try:
+            seal = seal_day(day)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if seal is None:
+            self.stdout.write(self.style.WARNING("Nothing to seal."))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"{seal.day}: seq {seal.first_seq}-{seal.last_seq} ({seal.leaf_count}) root {seal.root}")
+        )
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.audit import verify_chain, verify_seal
+from apps.core.models import AuditLog, AuditSeal
+
+
+class Command(BaseCommand):
+    help = "Verify the AuditLog hash chain (and optionally the daily Merkle seals) in one streaming pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-seq", type=int, default=1, help="First seq to check (default: 1)")
+        parser.add_argument("--to-seq", type=int, default=None, help="Last seq to check (default: head)")
+        parser.add_argument("--seals", action="store_true", help="Also recompute every stored seal root")
+        parser.add_argument("--max-problems", type=int, default=20, help="Stop reporting after this many")
+
+    def handle(self, *args, **options):
+        problems = 0
+        summary = {}
+        for item in verify_chain(options["from_seq"], options["to_seq"]):
+            if "problem" not in item:
+                summary = item
+                continue
+            problems += 1
+            if problems <= options["max_problems"]:
+                detail = ", ".join(f"{k}={v}" for k, v in item.items() if k not in ("seq", "problem"))
+                self.stdout.write(self.style.ERROR(f"seq {item['seq']}: {item['problem']} mismatch ({detail})"))
+
+        unsequenced = AuditLog.objects.filter(seq__isnull=True).count()
+        if unsequenced:
+            problems += 1
+            self.stdout.write(self.style.ERROR(f"{unsequenced} entries are outside the chain (no seq)"))
+
+        if options["seals"]:
+            for seal in AuditSeal.objects.order_by("day").iterator():
+                if not verify_seal(seal):
+                    problems += 1
+                    self.stdout.write(self.style.ERROR(f"seal {seal.day}: root mismatch"))
+
+        self.stdout.write(f"Checked {summary.get('checked', 0)} entries; head {summary.get('head') or '-'}")
+        if problems:
+            raise CommandError(f"Audit chain verification failed ({problems} problems)")
+        self.stdout.write(self.style.SUCCESS("Audit chain OK"))
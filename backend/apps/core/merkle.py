@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, List, Sequence
+
+# Merkle trees over audit entry hashes, shaped as in RFC 6962 (Certificate Transparency): leaves and
+# interior nodes are domain-separated (0x00 / 0x01 prefixes) and an n-leaf tree splits at the
+# largest power of two below n. Hashes are exchanged as hex strings.
+
+
+def leaf_hash(entry_hash: str) -> str:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(entry_hash)).hexdigest()
+
+
+def node_hash(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _split(n: int) -> int:
+    # Largest power of two strictly below n (n >= 2)
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+class MerkleBuilder:
+    """
+    Streaming root computation: add() leaves in order, root() at the end. Keeps one pending subtree
+    root per set bit of the leaf count, so memory is O(log n) however many entries are sealed.
+    """
+
+    def __init__(self):
+        self._stack: List[tuple] = []  # (size, hash), sizes strictly decreasing powers of two
+        self.count = 0
+
+    def add(self, entry_hash: str) -> None:
+        size, digest = 1, leaf_hash(entry_hash)
+        while self._stack and self._stack[-1][0] == size:
+            _, left = self._stack.pop()
+            size, digest = size * 2, node_hash(left, digest)
+        self._stack.append((size, digest))
+        self.count += 1
+
+    def root(self) -> str:
+        if not self._stack:
+            return hashlib.sha256(b"").hexdigest()
+        digest = self._stack[-1][1]
+        for _, left in reversed(self._stack[:-1]):
+            digest = node_hash(left, digest)
+        return digest
+
+
+def merkle_root(entry_hashes: Iterable[str]) -> str:
+    builder = MerkleBuilder()
+    for h in entry_hashes:
+        builder.add(h)
+    return builder.root()
+
+
+def _subtree_root(leaves: Sequence[str]) -> str:
+    if len(leaves) == 1:
+        return leaves[0]
+    k = _split(len(leaves))
+    return node_hash(_subtree_root(leaves[:k]), _subtree_root(leaves[k:]))
+
+
+def inclusion_proof(entry_hashes: Sequence[str], index: int) -> List[str]:
+    """Audit path for the entry at `index`, sibling hashes from the leaf upwards."""
+    if not 0 <= index < len(entry_hashes):
+        raise IndexError("leaf index out of range")
+    leaves = [leaf_hash(h) for h in entry_hashes]
+    path: List[str] = []
+
+    def walk(lo: int, hi: int, m: int) -> None:
+        if hi - lo == 1:
+            return
+        k = _split(hi - lo)
+        if m < k:
+            walk(lo, lo + k, m)
+            path.append(_subtree_root(leaves[lo + k : hi]))
+        else:
+            walk(lo + k, hi, m - k)
+            path.append(_subtree_root(leaves[lo : lo + k]))
+
+    walk(0, len(leaves), index)
+    return path
+
+
+def verify_inclusion(entry_hash: str, index: int, size: int, path: Sequence[str], root: str) -> bool:
+    """Check an audit path against a sealed root (RFC 9162, section 2.1.3.2)."""
+    if not 0 <= index < size:
+        return False
+    fn, sn, digest = index, size - 1, leaf_hash(entry_hash)
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            digest = node_hash(sibling, digest)
+            while not fn & 1 and fn != 0:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            digest = node_hash(digest, sibling)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and digest == root
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from prometheus_client import Counter
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+# Most tick, provisioning and pool metrics are updated inside Celery workers. Workers serve them on
+# WORKER_METRICS_PORT (see ctfplatform/celery.py); with a prefork pool set PROMETHEUS_MULTIPROC_DIR
+# so the children's values are aggregated. Gauges declare how they combine across processes.
 
 # Submission counters
 flag_submissions_total = Counter(
@@ -8,6 +14,22 @@ flag_submissions_total = Counter(
     "Total flag submissions",
     labelnames=("correct",),
 )
+flag_penalties_total = Counter(
+    "ctf_flag_penalties_total",
+    "Penalty-box blocks imposed after repeated wrong flags (kind: team = team+challenge, ip = client IP)",
+    labelnames=("kind",),
+)
+flag_penalty_rejections_total = Counter(
+    "ctf_flag_penalty_rejections_total",
+    "Flag submissions rejected while the team or IP was in the penalty box",
+)
+
+# Throttles (scope = throttle scope, e.g. flag-submit / flag-submit-ip; result = allowed | denied)
+throttle_requests_total = Counter(
+    "ctf_throttle_requests_total",
+    "Requests checked by the rate throttles, by scope and decision",
+    labelnames=("scope", "result"),
+)
 
 # Attack-Defense counters
 ad_defense_uptime_ticks_total = Counter(
@@ -18,9 +40,102 @@ ad_attack_success_total = Counter(
     "ctf_ad_attack_success_total",
     "Total successful attack events",
 )
+defense_tokens_pruned_total = Counter(
+    "ctf_defense_tokens_pruned_total",
+    "Total expired defense tokens deleted by retention",
+)
 
 # KotH counters
 koth_hold_ticks_total = Counter(
     "ctf_koth_hold_ticks_total",
     "Total KotH hold ticks awarded",
-)
\ No newline at end of file
+)
+koth_probe_latency_seconds = Histogram(
+    "ctf_koth_probe_latency_seconds",
+    "Latency of a single KotH ownership probe",
+    labelnames=("challenge",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Instance warm pool (hit rate = result="hit" / all claims)
+warm_pool_claims_total = Counter(
+    "ctf_warm_pool_claims_total",
+    "Instance spawns by warm pool outcome (hit: claimed a ready instance, miss: cold provision)",
+    labelnames=("challenge", "result"),
+)
+warm_pool_time_to_ready_seconds = Histogram(
+    "ctf_warm_pool_time_to_ready_seconds",
+    "Time from creating a warm instance to the operator reporting it ready",
+    labelnames=("challenge",),
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+warm_pool_ready = Gauge(
+    "ctf_warm_pool_ready",
+    "Ready, unclaimed warm instances at the last refill",
+    labelnames=("challenge",),
+    multiprocess_mode="mostrecent",
+)
+
+instance_provision_seconds = Histogram(
+    "ctf_instance_provision_seconds",
+    "Time from instance spawn to ready (or failure) in the provisioning task",
+    labelnames=("challenge", "result"),
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+instances_reaped_total = Counter(
+    "ctf_instances_reaped_total",
+    "Instances stopped by the idle reaper",
+    labelnames=("challenge",),
+)
+
+# Tick engine (labelled by challenge id; AD/KotH challenges are few per event)
+tick_duration_seconds = Histogram(
+    "ctf_tick_duration_seconds",
+    "Wall time of a run_tick execution",
+    labelnames=("challenge",),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+tick_check_latency_seconds = Histogram(
+    "ctf_tick_check_latency_seconds",
+    "Latency of a single service check within a tick",
+    labelnames=("challenge",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+tick_schedule_lag_seconds = Histogram(
+    "ctf_tick_schedule_lag_seconds",
+    "Delay between a tick's nominal start (released_at + n * tick_seconds) and its execution",
+    labelnames=("challenge",),
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+tick_last_completed = Gauge(
+    "ctf_tick_last_completed",
+    "Index of the last completed tick",
+    labelnames=("challenge",),
+    multiprocess_mode="max",
+)
+tick_checks_in_flight = Gauge(
+    "ctf_tick_checks_in_flight",
+    "Service checks currently running",
+    labelnames=("challenge",),
+    multiprocess_mode="livesum",
+)
+
+# Audit chain
+audit_entries_written_total = Counter(
+    "ctf_audit_entries_written_total",
+    "Audit log entries appended to the hash chain",
+)
+audit_queue_depth = Gauge(
+    "ctf_audit_queue_depth",
+    "Audit entries waiting in the queue after the last flush",
+    multiprocess_mode="mostrecent",
+)
+
+
+def worker_registry():
+    """Registry a worker exporter serves: every pool process's values under PROMETHEUS_MULTIPROC_DIR."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
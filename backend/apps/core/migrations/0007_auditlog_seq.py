@@ -0,0 +1,73 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+
+
+def _canonical(log, seq, prev_hash):
+    # Frozen copy of apps.core.audit.canonical_entry as of this migration
+    return json.dumps(
+        {
+            'seq': seq,
+            'prev_hash': prev_hash,
+            'timestamp': log.timestamp.astimezone(dt_timezone.utc).isoformat(),
+            'actor_user_id': log.actor_user_id,
+            'actor_team_id': log.actor_team_id,
+            'action': log.action,
+            'target_type': log.target_type,
+            'target_id': log.target_id,
+            'ip': log.ip,
+            'data': log.data or {},
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    ).encode('utf-8')
+
+
+def rechain(apps, schema_editor):
+    # Legacy rows were chained per target over a payload that cannot be rebuilt from the row (it
+    # included the write time); fold them, oldest first, into the global chain so the whole log is
+    # verifiable. Their original hash/prev_hash move into data, where the new chain covers them, and a
+    # row whose prev_hash does not match its target's previous hash is flagged rather than silently
+    # accepted.
+    AuditLog = apps.get_model('core', 'AuditLog')
+    prev_hash = ''
+    last_by_target = {}
+    batch = []
+    for seq, log in enumerate(AuditLog.objects.order_by('timestamp', 'id').iterator(chunk_size=2000), start=1):
+        target = (log.target_type, log.target_id)
+        data = dict(log.data or {})
+        data['legacy_hash'] = log.hash
+        data['legacy_prev_hash'] = log.prev_hash
+        if log.prev_hash != last_by_target.get(target, ''):
+            data['legacy_link_broken'] = True
+        last_by_target[target] = log.hash
+        log.data = data
+        log.seq = seq
+        log.prev_hash = prev_hash
+        log.hash = hashlib.sha256(_canonical(log, seq, prev_hash)).hexdigest()
+        prev_hash = log.hash
+        batch.append(log)
+        if len(batch) >= 500:
+            AuditLog.objects.bulk_update(batch, ['seq', 'data', 'prev_hash', 'hash'])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ['seq', 'data', 'prev_hash', 'hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_uiconfig_event_overrides'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(rechain, migrations.RunPython.noop),
+    ]
@@ -78,6 +78,12 @@ class ScoreEvent(models.Model):
 
 
 class AuditLog(models.Model):
+    """
+    Append-only audit trail forming one global hash chain: seq is the position in the chain and
+    hash covers the entry plus prev_hash (see apps.core.audit). Write through apps.core.audit.record.
+    """
+
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)
     actor_user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     actor_team = models.ForeignKey(Team, null=True, blank=True, on_delete=models.SET_NULL)
     action = models.CharField(max_length=200)
@@ -96,6 +102,26 @@ class AuditLog(models.Model):
         return f"{self.timestamp} {self.action} {self.target_type}:{self.target_id}"
 
 
+class AuditSeal(models.Model):
+    """
+    Merkle root over the audit entries seq first_seq..last_seq (everything appended since the previous
+    seal up to the end of `day`, UTC). Leaves are the entries' chain hashes; see apps.core.merkle.
+    """
+
+    day = models.DateField(unique=True)
+    first_seq = models.BigIntegerField()
+    last_seq = models.BigIntegerField(unique=True)
+    leaf_count = models.IntegerField()
+    root = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-day"]
+
+    def __str__(self) -> str:
+        return f"{self.day} seq {self.first_seq}-{self.last_seq} {self.root[:12]}"
+
+
 class RateLimitConfig(models.Model):
     """
     Optional DB-backed throttling configuration.
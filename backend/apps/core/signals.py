@@ -2,12 +2,13 @@ from __future__ import annotations
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.db.models import Sum
 
-from .models import ScoreEvent, Team
+from .models import RateLimitConfig, ScoreEvent, Team
+from .throttles import invalidate_rate_cache
 
 
 def _compute_leaderboard_payload():
@@ -35,4 +36,11 @@ def broadcast_leaderboard_on_scoreevent(sender, instance: ScoreEvent, created: b
         )
     except Exception:
         # Avoid breaking request flow due to broadcasting issues
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver(post_save, sender=RateLimitConfig)
+@receiver(post_delete, sender=RateLimitConfig)
+def invalidate_rate_limits_on_change(sender, instance: RateLimitConfig, **kwargs):
+    # Covers admin edits too: every worker reloads the scope's rates within a second
+    invalidate_rate_cache(instance.scope)
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from celery import shared_task
+
+from .audit import flush_queue, seal_day
+
+
+@shared_task(ignore_result=True)
+def flush_audit_queue():
+    """Single audit writer: append queued entries to the hash chain in batches."""
+    return flush_queue()
+
+
+@shared_task(ignore_result=True)
+def seal_audit_day():
+    """Seal yesterday's audit entries under a Merkle root; a no-op once the day is sealed."""
+    seal = seal_day()
+    return seal.root if seal else None
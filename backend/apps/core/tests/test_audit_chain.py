@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from apps.core import audit
+from apps.core.models import AuditLog
+
+User = get_user_model()
+
+
+class FakeRedis:
+    """The list/lock subset of redis used by the audit queue."""
+
+    def __init__(self):
+        self.lists, self.values = {}, {}
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value.encode() if isinstance(value, str) else value)
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def eval(self, script, numkeys, key, token, *args):
+        # apps.core.locks compare-and-delete / compare-and-pexpire
+        if self.values.get(key) != token.encode():
+            return 0
+        if "del" in script:
+            del self.values[key]
+        return 1
+
+
+def assert_chain(test, rows):
+    prev = ""
+    for i, row in enumerate(rows, start=1):
+        test.assertEqual(row.seq, i)
+        test.assertEqual(row.prev_hash, prev)
+        test.assertEqual(row.hash, audit.entry_hash(row))
+        prev = row.hash
+
+
+class AuditChainTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_record_appends_verifiable_global_chain(self):
+        audit.record("a", "x", 1, actor=self.staff, ip="::ffff:10.0.0.1", data={"n": 1})
+        audit.record("b", "y", "k")
+        audit.append_entries([audit.build_entry("c", "z", i, data={"when": object}) for i in range(3)])
+        rows = list(AuditLog.objects.order_by("seq"))
+        self.assertEqual([r.action for r in rows], ["a", "b", "c", "c", "c"])
+        assert_chain(self, rows)
+
+        rows[1].data = {"tampered": True}
+        self.assertNotEqual(audit.entry_hash(rows[1]), rows[1].hash)
+
+    def test_subsystems_write_to_the_chain(self):
+        self.client.delete("/api/ops/rate-limits?scope=flag-submit")
+        self.client.post("/api/ui/config", {"challenge_list_layout": "grid"}, format="json")
+        resp = self.client.post(
+            "/api/admin/challenges",
+            {"title": "T", "slug": "t", "description": "d", "flag": "flag{secret}"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201)
+        self.client.patch(f"/api/admin/challenges/{resp.json()['id']}", {"points_max": 400}, format="json")
+        self.client.delete(f"/api/admin/challenges/{resp.json()['id']}")
+
+        rows = list(AuditLog.objects.order_by("seq"))
+        self.assertEqual(
+            [r.action for r in rows],
+            ["ratelimit_delete", "uiconfig_update", "challenge_create", "challenge_update",
+             "challenge_delete"],
+        )
+        self.assertEqual(rows[0].actor_user_id, self.staff.id)
+        self.assertEqual(rows[3].data["fields"], ["points_max"])
+        self.assertNotIn("secret", str([r.data for r in rows]))
+        assert_chain(self, rows)
+
+    def test_queued_entries_are_flushed_in_batches_by_one_writer(self):
+        fake = FakeRedis()
+        with mock.patch("apps.core.audit._queue_redis", return_value=fake):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(5):
+                    audit.record("queued", "x", i)
+            self.assertFalse(AuditLog.objects.exists())
+            self.assertEqual(fake.llen(audit.AUDIT_QUEUE_KEY), 5)
+
+            fake.values[audit.AUDIT_WRITER_LOCK_KEY] = b"other"
+            self.assertEqual(audit.flush_queue(batch_size=2), 0)  # another writer holds the lock
+            del fake.values[audit.AUDIT_WRITER_LOCK_KEY]
+
+            with mock.patch("apps.core.audit.append_entries", wraps=audit.append_entries) as append:
+                self.assertEqual(audit.flush_queue(batch_size=2), 5)
+            self.assertEqual([len(c.args[0]) for c in append.call_args_list], [2, 2, 1])
+        self.assertEqual(fake.llen(audit.AUDIT_QUEUE_KEY), 0)
+        self.assertNotIn(audit.AUDIT_WRITER_LOCK_KEY, fake.values)
+        rows = list(AuditLog.objects.order_by("seq"))
+        self.assertEqual([r.target_id for r in rows], ["0", "1", "2", "3", "4"])
+        assert_chain(self, rows)
+
+    def test_writer_that_lost_its_lock_stops_draining(self):
+        fake = FakeRedis()
+        with mock.patch("apps.core.audit._queue_redis", return_value=fake):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(5):
+                    audit.record("queued", "x", i)
+
+            append = audit.append_entries
+
+            def stall_past_ttl(entries):
+                append(entries)
+                fake.values[audit.AUDIT_WRITER_LOCK_KEY] = b"next-writer"
+
+            with mock.patch("apps.core.audit.append_entries", side_effect=stall_past_ttl):
+                with self.assertLogs("apps.core.audit", "WARNING"):
+                    self.assertEqual(audit.flush_queue(batch_size=2), 2)
+        self.assertEqual(fake.llen(audit.AUDIT_QUEUE_KEY), 3)
+        self.assertEqual(fake.values[audit.AUDIT_WRITER_LOCK_KEY], b"next-writer")  # not released by us
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_queue_outage_falls_back_to_inline_append(self):
+        fake = mock.Mock()
+        fake.rpush.side_effect = ConnectionError("down")
+        with mock.patch("apps.core.audit._queue_redis", return_value=fake):
+            with self.assertLogs("apps.core.audit", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+                audit.record("fallback", "x", 1)
+        self.assertEqual(AuditLog.objects.get().seq, 1)
+
+
+class LegacyRechainMigrationTests(TestCase):
+    def test_rechain_keeps_legacy_hashes_and_flags_broken_links(self):
+        rechain = import_module("apps.core.migrations.0007_auditlog_seq").rechain
+        t0 = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        # (target_id, prev_hash, hash) as the per-target chain wrote them; the last link was tampered with
+        legacy = [("1", "", "a1"), ("2", "", "b1"), ("1", "a1", "a2"), ("1", "zz", "a3")]
+        for i, (target_id, prev_hash, digest) in enumerate(legacy):
+            AuditLog.objects.create(
+                action="writeup_moderate",
+                target_type="writeup",
+                target_id=target_id,
+                timestamp=t0 + timedelta(minutes=i),
+                data={"notes": str(i)},
+                prev_hash=prev_hash,
+                hash=digest,
+            )
+        rechain(apps, None)
+        rows = list(AuditLog.objects.order_by("seq"))
+        assert_chain(self, rows)
+        self.assertEqual(
+            [(r.data["legacy_prev_hash"], r.data["legacy_hash"]) for r in rows], [(p, h) for _, p, h in legacy]
+        )
+        self.assertEqual([r.data.get("legacy_link_broken", False) for r in rows], [False, False, False, True])
+        self.assertEqual(rows[0].data["notes"], "0")
+
+
+class ConcurrentAppendTests(TransactionTestCase):
+    def test_racing_writers_do_not_fork_the_chain(self):
+        if connection.vendor == "sqlite":
+            self.skipTest("needs a database with concurrent writers")
+
+        def write(n):
+            try:
+                for i in range(5):
+                    audit.append_entries([audit.build_entry("race", "t", f"{n}-{i}")], attempts=50)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_chain(self, list(AuditLog.objects.order_by("seq")))
+        self.assertEqual(AuditLog.objects.count(), 20)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.core import locks
+
+
+class CacheLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_the_holder_renews_or_releases(self):
+        token = locks.acquire("l", 30)
+        self.assertIsNotNone(token)
+        self.assertIsNone(locks.acquire("l", 30))
+        self.assertFalse(locks.extend("l", "stale", 30))
+        locks.release("l", "stale")
+        self.assertIsNone(locks.acquire("l", 30))
+        self.assertTrue(locks.extend("l", token, 30))
+        locks.release("l", token)
+        self.assertIsNotNone(locks.acquire("l", 30))
+
+
+class RedisLockTests(SimpleTestCase):
+    def test_compare_and_delete_runs_server_side(self):
+        client = mock.Mock()
+        client.set.return_value = True
+        client.eval.return_value = 1
+        token = locks.acquire("l", 2.5, client=client)
+        client.set.assert_called_once_with("l", token, nx=True, px=2500)
+        self.assertTrue(locks.extend("l", token, 10, client=client))
+        locks.release("l", token, client=client)
+        scripts = [c.args[0] for c in client.eval.call_args_list]
+        self.assertEqual(scripts, [locks._EXTEND_LUA, locks._RELEASE_LUA])
+        self.assertEqual(client.eval.call_args.args[1:], (1, "l", token))
+
+        client.set.return_value = None
+        self.assertIsNone(locks.acquire("l", 1, client=client))
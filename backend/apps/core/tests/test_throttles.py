@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.core.models import RateLimitConfig
+from apps.core import throttles
+from apps.core.throttles import (
+    DynamicScopedRateThrottle,
+    PerIPRateThrottle,
+    _get_db_rate,
+    gcra_consume,
+    record_denial,
+    top_denied,
+)
+
+
+class _View:
+    throttle_scope = "flag-submit"
+
+
+@override_settings(THROTTLE_REDIS_URL="")
+class GCRAEngineTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_steady_rate(self):
+        now = 1000.0
+        allowed = [gcra_consume("k", 5, 60, now=now)[0] for _ in range(6)]
+        self.assertEqual(allowed, [True] * 5 + [False])
+        ok, wait = gcra_consume("k", 5, 60, now=now)
+        self.assertFalse(ok)
+        self.assertAlmostEqual(wait, 12.0)
+        # One interval (60/5 s) later exactly one more request fits
+        self.assertTrue(gcra_consume("k", 5, 60, now=now + 12)[0])
+        self.assertFalse(gcra_consume("k", 5, 60, now=now + 12)[0])
+        # A full idle window restores the whole burst
+        self.assertEqual(sum(gcra_consume("k", 5, 60, now=now + 200)[0] for _ in range(10)), 5)
+
+    def test_concurrent_requests_never_exceed_limit(self):
+        results = []
+        barrier = threading.Barrier(16)
+
+        def hammer():
+            barrier.wait()
+            for _ in range(10):
+                results.append(gcra_consume("hot", 25, 60, now=5000.0)[0])
+
+        threads = [threading.Thread(target=hammer) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sum(results), 25)
+
+    def test_redis_errors_fall_back_to_local(self):
+        broken = mock.Mock(side_effect=ConnectionError("down"))
+        with mock.patch("apps.core.throttles._gcra_redis", return_value=broken):
+            self.assertEqual(gcra_consume("k2", 1, 60, now=1.0), (True, 0.0))
+            self.assertFalse(gcra_consume("k2", 1, 60, now=1.0)[0])
+
+
+@override_settings(THROTTLE_REDIS_URL="")
+class ThrottleClassTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def _allow(self, cls, ip="10.0.0.1"):
+        request = self.factory.post("/x", REMOTE_ADDR=ip)
+        request.user = mock.Mock(is_authenticated=False)
+        throttle = cls()
+        return throttle.allow_request(request, _View()), throttle
+
+    def test_scoped_throttle_uses_db_override_and_reports_wait(self):
+        RateLimitConfig.objects.create(scope="flag-submit", user_rate="2/min", ip_rate="")
+        results = [self._allow(DynamicScopedRateThrottle)[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        ok, throttle = self._allow(DynamicScopedRateThrottle)
+        self.assertFalse(ok)
+        self.assertGreater(throttle.wait(), 0)
+        self.assertTrue(self._allow(DynamicScopedRateThrottle, ip="10.0.0.2")[0])
+
+    def test_per_ip_throttle_resolves_scope_rate(self):
+        RateLimitConfig.objects.create(scope="flag-submit", user_rate="", ip_rate="3/min")
+        self.assertEqual([self._allow(PerIPRateThrottle)[0] for _ in range(4)], [True, True, True, False])
+
+    def test_per_ip_scope_without_ip_rate_is_unthrottled(self):
+        view = _View()
+        view.throttle_scope = "no-such-scope"
+        request = self.factory.post("/x", REMOTE_ADDR="10.0.0.9")
+        self.assertTrue(PerIPRateThrottle().allow_request(request, view))
+
+
+class RateConfigCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttles._local_rates.clear()
+        throttles._version_checked_at = float("-inf")
+
+    def test_repeat_lookups_skip_the_cache(self):
+        RateLimitConfig.objects.create(scope="flag-submit", user_rate="2/min", ip_rate="4/min")
+        with mock.patch.object(throttles, "_version_check_interval", return_value=60.0):
+            self.assertEqual(_get_db_rate("flag-submit", None), "2/min")
+            self.assertEqual(_get_db_rate("flag-submit", "ip"), "4/min")
+            with mock.patch.object(throttles, "cache") as spy, self.assertNumQueries(0):
+                for _ in range(5):
+                    self.assertEqual(_get_db_rate("flag-submit", None), "2/min")
+                    self.assertEqual(_get_db_rate("flag-submit", "ip"), "4/min")
+            spy.get.assert_not_called()
+
+    def test_model_save_and_delete_apply_immediately(self):
+        cfg = RateLimitConfig.objects.create(scope="flag-submit", user_rate="2/min", ip_rate="")
+        self.assertEqual(_get_db_rate("flag-submit", None), "2/min")
+        cfg.user_rate = "5/min"
+        cfg.save()
+        self.assertEqual(_get_db_rate("flag-submit", None), "5/min")
+        cfg.delete()
+        self.assertIsNone(_get_db_rate("flag-submit", None))
+
+    def test_version_change_from_another_process_reloads(self):
+        RateLimitConfig.objects.create(scope="flag-submit", user_rate="2/min", ip_rate="")
+        with mock.patch.object(throttles, "_version_check_interval", return_value=1.0), \
+                mock.patch.object(throttles.time, "monotonic", return_value=100.0) as clock:
+            self.assertEqual(_get_db_rate("flag-submit", None), "2/min")
+            # Another worker changed the row (no signal here) and replaced the version token
+            RateLimitConfig.objects.filter(scope="flag-submit").update(user_rate="7/min")
+            cache.delete("ratelimit:flag-submit:user")
+            cache.set(throttles.RATE_VERSION_KEY, "other-worker")
+            clock.return_value = 100.5
+            self.assertEqual(_get_db_rate("flag-submit", None), "2/min")
+            clock.return_value = 101.1
+            self.assertEqual(_get_db_rate("flag-submit", None), "7/min")
+
+
+@override_settings(THROTTLE_REDIS_URL="", THROTTLE_HEAVY_HITTERS_CAPACITY=3)
+class ThrottleTelemetryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_top_denied_merges_window_and_stays_bounded(self):
+        now = 6000.0
+        for _ in range(5):
+            record_denial("flag-submit", "ip", "10.0.0.1", now=now - 600)  # ten minutes ago
+        for _ in range(3):
+            record_denial("flag-submit", "ip", "10.0.0.2", now=now - 60)
+        record_denial("flag-submit", "ip", "10.0.0.2", now=now)
+        record_denial("login", "ip", "10.0.0.3", now=now)
+        record_denial("flag-submit", "user", "7", now=now)
+
+        top = top_denied(k=5, window_minutes=5, now=now)
+        self.assertEqual(
+            top["ip"],
+            [
+                {"ident": "10.0.0.2", "scope": "flag-submit", "denied": 4},
+                {"ident": "10.0.0.3", "scope": "login", "denied": 1},
+            ],
+        )
+        self.assertEqual(top["user"], [{"ident": "7", "scope": "flag-submit", "denied": 1}])
+        self.assertEqual(top_denied(k=1, window_minutes=15, now=now)["ip"][0]["ident"], "10.0.0.1")
+
+        # Each minute table keeps at most THROTTLE_HEAVY_HITTERS_CAPACITY members, replacing the lowest
+        for _ in range(4):
+            record_denial("flag-submit", "ip", "10.0.0.9", now=now)
+        for ip in ("10.0.1.1", "10.0.1.2", "10.0.1.3"):
+            record_denial("flag-submit", "ip", ip, now=now)
+        self.assertLessEqual(len(top_denied(k=50, window_minutes=1, now=now)["ip"]), 3)
+        self.assertEqual(top_denied(k=1, window_minutes=1, now=now)["ip"][0]["ident"], "10.0.0.9")
+
+    def test_subject_first_seen_in_a_full_table_is_counted(self):
+        now = 6000.0
+        for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            for _ in range(2):
+                record_denial("flag-submit", "ip", ip, now=now)
+        for _ in range(50):
+            record_denial("flag-submit", "ip", "attacker", now=now)
+        top = top_denied(k=3, window_minutes=1, now=now)["ip"]
+        self.assertEqual(len(top), 3)
+        # Space-Saving: the newcomer inherits the evicted count (2) and keeps climbing
+        self.assertEqual(top[0], {"ident": "attacker", "scope": "flag-submit", "denied": 52})
+
+    def test_throttle_exports_decisions_and_denials(self):
+        RateLimitConfig.objects.create(scope="flag-submit", user_rate="1/min", ip_rate="")
+        labels = {"scope": "flag-submit", "result": "denied"}
+        before = REGISTRY.get_sample_value("ctf_throttle_requests_total", labels) or 0
+        factory = APIRequestFactory()
+        for _ in range(3):
+            request = factory.post("/x", REMOTE_ADDR="10.9.9.9")
+            request.user = mock.Mock(is_authenticated=False)
+            DynamicScopedRateThrottle().allow_request(request, _View())
+        self.assertEqual(REGISTRY.get_sample_value("ctf_throttle_requests_total", labels) - before, 2)
+        self.assertEqual(top_denied(k=1)["ip"], [{"ident": "10.9.9.9", "scope": "flag-submit", "denied": 2}])
+
+    def test_ops_endpoint_lists_top_users(self):
+        User = get_user_model()
+        staff = User.objects.create_user(username="ops", email="o@example.com", password="x", is_staff=True)
+        player = User.objects.create_user(username="brute", email="b@example.com", password="x")
+        for _ in range(4):
+            record_denial("flag-submit", "user", str(player.pk))
+        client = APIClient()
+        self.assertEqual(client.get("/api/ops/rate-limits/top").status_code, 403)
+        client.force_authenticate(staff)
+        r = client.get("/api/ops/rate-limits/top?k=5&window=5")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data["users"], [{"ident": str(player.pk), "scope": "flag-submit", "denied": 4, "username": "brute"}])
+        self.assertEqual(r.data["ips"], [])
+        self.assertEqual(client.get("/api/ops/rate-limits/top?k=x").status_code, 400)
+
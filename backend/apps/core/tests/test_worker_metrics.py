@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from apps.core.metrics import worker_registry
+from ctfplatform import celery as celery_module
+
+
+class WorkerMetricsExporterTests(SimpleTestCase):
+    @override_settings(WORKER_METRICS_PORT=9808)
+    def test_worker_ready_starts_exporter(self):
+        with mock.patch.dict(os.environ, {}, clear=False), mock.patch("prometheus_client.start_http_server") as start:
+            os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+            celery_module._start_metrics_exporter()
+        start.assert_called_once_with(9808, registry=REGISTRY)
+
+    @override_settings(WORKER_METRICS_PORT=0)
+    def test_exporter_off_by_default(self):
+        with mock.patch("prometheus_client.start_http_server") as start:
+            celery_module._start_metrics_exporter()
+        start.assert_not_called()
+
+    def test_multiprocess_dir_aggregates_pool_processes(self):
+        with tempfile.TemporaryDirectory() as path:
+            open(os.path.join(path, "counter_123.db"), "wb").close()
+            with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": path}):
+                registry = worker_registry()
+                celery_module._reset_metrics_dir()
+            self.assertIsInstance(registry, CollectorRegistry)
+            self.assertIsNot(registry, REGISTRY)
+            self.assertEqual(os.listdir(path), [])
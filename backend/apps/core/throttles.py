@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import logging
+import math
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
 from django.core.cache import cache
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from rest_framework.throttling import SimpleRateThrottle, ScopedRateThrottle
 
+logger = logging.getLogger(__name__)
+
 try:
     # Local import to avoid migrations-order issues in settings import
     from .models import RateLimitConfig
@@ -11,14 +21,54 @@ except Exception:  # pragma: no cover - during early import/migration
     RateLimitConfig = None  # type: ignore
 
 
-def _get_db_rate(scope: str, suffix: str | None) -> str | None:
+# --- Effective rate lookup ---
+#
+# Rates are held in a per-process dict so a throttled request costs no cache round trip. Every
+# RateLimitConfig change replaces RATE_VERSION_KEY in the shared cache; each process compares it at most
+# once per RATE_CONFIG_VERSION_CHECK_SECONDS and drops its dict when it moved, so admin changes reach
+# all workers within that interval. Entries also expire after RATE_CONFIG_LOCAL_TTL as a safety net.
+
+RATE_VERSION_KEY = "ratelimit:version"
+
+_local_rates: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+_local_version = None
+_version_checked_at = float("-inf")
+
+
+def _version_check_interval() -> float:
+    # A process-local cache costs nothing to read: check the version on every lookup
+    if settings.CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+        return 0.0
+    return float(getattr(settings, "RATE_CONFIG_VERSION_CHECK_SECONDS", 1.0))
+
+
+def _sync_rate_version(now: float) -> None:
+    global _local_version, _version_checked_at
+    if now - _version_checked_at < _version_check_interval():
+        return
+    _version_checked_at = now
+    try:
+        version = cache.get(RATE_VERSION_KEY)
+    except Exception:
+        return  # cache down: keep serving local entries until their TTL
+    if version != _local_version:
+        _local_rates.clear()
+        _local_version = version
+
+
+def invalidate_rate_cache(scope: str | None = None) -> None:
     """
-    Retrieve a DB-configured rate for a given scope.
-    suffix: None for user, "ip" for per-IP.
-    Returns a DRF rate string like "10/min" or None if not configured.
+    Drop cached effective rates (one scope, or all) here and, through the version key, in every
+    other process. Called on RateLimitConfig save/delete and by the ops cache endpoints.
     """
-    if not RateLimitConfig:
-        return None
+    if scope:
+        cache.delete_many([f"ratelimit:{scope}:user", f"ratelimit:{scope}:ip"])
+    # A fresh token rather than a counter: still differs from every process's copy after cache.clear()
+    cache.set(RATE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _local_rates.clear()
+
+
+def _shared_db_rate(scope: str, suffix: str | None) -> str | None:
     cache_key = f"ratelimit:{scope}:{suffix or 'user'}"
     cached = cache.get(cache_key)
     if cached is not None:
@@ -33,9 +83,282 @@ def _get_db_rate(scope: str, suffix: str | None) -> str | None:
     return rate or None
 
 
-class DynamicScopedRateThrottle(ScopedRateThrottle):
+def _get_db_rate(scope: str, suffix: str | None) -> str | None:
+    """
+    Retrieve a DB-configured rate for a given scope.
+    suffix: None for user, "ip" for per-IP.
+    Returns a DRF rate string like "10/min" or None if not configured.
+    """
+    if not RateLimitConfig:
+        return None
+    now = time.monotonic()
+    _sync_rate_version(now)
+    key = (scope, suffix or "user")
+    hit = _local_rates.get(key)
+    if hit is not None and hit[1] > now:
+        return hit[0]
+    rate = _shared_db_rate(scope, suffix)
+    _local_rates[key] = (rate, now + float(getattr(settings, "RATE_CONFIG_LOCAL_TTL", 30)))
+    return rate
+
+
+# --- GCRA engine ---
+#
+# Generic cell rate algorithm: per key only the "theoretical arrival time" (TAT) is stored. A rate of
+# N/duration admits bursts of N and then one request every duration/N, like DRF's sliding log, but
+# check-and-consume is one atomic step and state is O(1) per key.
+
+GCRA_LUA = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + t[2] / 1000
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+  return {0, tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, '0'}
+"""
+
+_local_lock = threading.Lock()
+_redis_client = None
+_redis_script = None
+_redis_lock = threading.Lock()
+
+
+def _throttle_redis():
+    """
+    Client for THROTTLE_REDIS_URL (defaults to REDIS_URL); None without Redis.
+    """
+    global _redis_client
+    url = getattr(settings, "THROTTLE_REDIS_URL", None)
+    if not url:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                import redis
+
+                _redis_client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+    return _redis_client
+
+
+def _gcra_redis():
+    """
+    Registered Lua script on the throttle Redis; None without Redis.
+    """
+    global _redis_script
+    client = _throttle_redis()
+    if client is None:
+        return None
+    if _redis_script is None:
+        with _redis_lock:
+            if _redis_script is None:
+                _redis_script = client.register_script(GCRA_LUA)
+    return _redis_script
+
+
+def _gcra_local(key: str, interval: float, window: float, now: float) -> Tuple[bool, float]:
+    # Same algorithm on the Django cache; atomic per process (tests, dev, single-worker setups)
+    with _local_lock:
+        tat = max(cache.get(key) or now, now)
+        new_tat = tat + interval
+        allow_at = new_tat - window
+        if allow_at > now:
+            return False, allow_at - now
+        cache.set(key, new_tat, timeout=math.ceil(new_tat - now))
+        return True, 0.0
+
+
+def gcra_consume(key: str, num_requests: int, duration: float, now: Optional[float] = None) -> Tuple[bool, float]:
+    """
+    Check and consume one request for `key` under num_requests/duration.
+    Returns (allowed, seconds until the next request would be allowed).
+    """
+    interval = duration / num_requests
+    script = _gcra_redis()
+    if script is not None:
+        try:
+            allowed, wait_ms = script(keys=[f"gcra:{key}"], args=[interval * 1000, duration * 1000])
+            return bool(int(allowed)), float(wait_ms) / 1000
+        except Exception:
+            # Redis unreachable: degrade to the per-process limiter instead of failing requests
+            logger.warning("GCRA Redis throttle unavailable, using local limiter", exc_info=True)
+    return _gcra_local(f"gcra:{key}", interval, duration, time.time() if now is None else now)
+
+
+# --- Telemetry ---
+#
+# Every decision increments ctf_throttle_requests_total{scope,result}. Denials also feed a bounded
+# heavy-hitters table per minute bucket and subject kind (user / ip) of at most
+# THROTTLE_HEAVY_HITTERS_CAPACITY members: a Redis sorted set, or a dict on the Django cache without
+# Redis. A full table follows Space-Saving (Metwally et al.): a new member replaces the lowest one and
+# inherits its count + 1, so a subject first seen after the table filled still climbs (counts are
+# upper bounds). top_denied() merges the buckets of the last N minutes.
+
+# KEYS[1] table, ARGV: member, capacity, ttl seconds
+SPACE_SAVING_LUA = """
+local key, member, capacity = KEYS[1], ARGV[1], tonumber(ARGV[2])
+if redis.call('ZSCORE', key, member) or redis.call('ZCARD', key) < capacity then
+  redis.call('ZINCRBY', key, 1, member)
+else
+  local lowest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+  redis.call('ZREM', key, lowest[1])
+  redis.call('ZADD', key, tonumber(lowest[2]) + 1, member)
+end
+redis.call('EXPIRE', key, ARGV[3])
+return 1
+"""
+_hh_script = None
+
+KIND_USER = "user"
+KIND_IP = "ip"
+
+
+def _hh_capacity() -> int:
+    return int(getattr(settings, "THROTTLE_HEAVY_HITTERS_CAPACITY", 200))
+
+
+def hh_retention_minutes() -> int:
+    return int(getattr(settings, "THROTTLE_HEAVY_HITTERS_RETENTION_MINUTES", 60))
+
+
+def _hh_key(kind: str, bucket: int) -> str:
+    return f"throttle:hh:{kind}:{bucket}"
+
+
+def _hh_redis(client):
+    global _hh_script
+    if _hh_script is None:
+        with _redis_lock:
+            if _hh_script is None:
+                _hh_script = client.register_script(SPACE_SAVING_LUA)
+    return _hh_script
+
+
+def record_denial(scope: str, kind: str, ident: str, now: Optional[float] = None) -> None:
+    """Count one throttled request of `ident` (user id or IP) in `scope` in the current minute."""
+    now = time.time() if now is None else now
+    key = _hh_key(kind, int(now // 60))
+    member = f"{ident}|{scope}"
+    ttl = (hh_retention_minutes() + 1) * 60
+    client = _throttle_redis()
+    if client is not None:
+        try:
+            _hh_redis(client)(keys=[key], args=[member, _hh_capacity(), ttl])
+            return
+        except Exception:
+            logger.warning("Throttle telemetry Redis unavailable, using local table", exc_info=True)
+    with _local_lock:
+        counts: Dict[str, int] = cache.get(key) or {}
+        if member in counts or len(counts) < _hh_capacity():
+            counts[member] = counts.get(member, 0) + 1
+        else:
+            # Same choice as ZRANGE 0 0: lowest count, then lowest member
+            lowest = min(counts, key=lambda m: (counts[m], m))
+            counts[member] = counts.pop(lowest) + 1
+        cache.set(key, counts, timeout=ttl)
+
+
+def top_denied(k: int = 10, window_minutes: int = 15, now: Optional[float] = None) -> Dict[str, List[dict]]:
+    """
+    Top-k throttled users and IPs over the last `window_minutes` (minute granularity):
+    {"user": [{"ident", "scope", "denied"}, ...], "ip": [...]}, most denied first.
+    """
+    now = time.time() if now is None else now
+    current = int(now // 60)
+    window_minutes = max(1, min(window_minutes, hh_retention_minutes()))
+    buckets = range(current - window_minutes + 1, current + 1)
+    result: Dict[str, List[dict]] = {}
+    client = _throttle_redis()
+    for kind in (KIND_USER, KIND_IP):
+        keys = [_hh_key(kind, b) for b in buckets]
+        totals: Dict[str, float] = {}
+        tables = None
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zrange(key, 0, -1, withscores=True)
+                tables = [{m.decode() if isinstance(m, bytes) else m: c for m, c in rows} for rows in pipe.execute()]
+            except Exception:
+                logger.warning("Throttle telemetry Redis unavailable, reading local table", exc_info=True)
+        if tables is None:
+            tables = list(cache.get_many(keys).values())
+        for table in tables:
+            for member, count in table.items():
+                totals[member] = totals.get(member, 0) + count
+        top = sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:k]
+        result[kind] = [
+            {"ident": member.rsplit("|", 1)[0], "scope": member.rsplit("|", 1)[1], "denied": int(count)}
+            for member, count in top
+        ]
+    return result
+
+
+class GCRARateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle with the history list replaced by gcra_consume. Subclasses keep DRF's
+    get_cache_key/get_rate hooks; the rate is resolved per request after the cache key, so
+    scope-dependent rates (per-IP) are known by then.
+    """
+
+    def __init__(self):
+        # Rates are resolved in allow_request
+        self._wait = None
+
+    def allow_request(self, request, view):
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        if getattr(self, "rate", None) is None:
+            # ScopedRateThrottle resolved it already; others (per-IP) resolve it now that scope is set
+            self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        if getattr(self, "num_requests", None) is None:
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+        allowed, wait = gcra_consume(self.key, self.num_requests, self.duration, now=self.timer())
+        self._wait = wait
+        self._record(request, allowed)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+    def telemetry_subject(self, request) -> Tuple[str, Optional[str]]:
+        # Mirrors ScopedRateThrottle's cache key: the user when authenticated, the client IP otherwise
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return KIND_USER, str(user.pk)
+        return KIND_IP, self.get_ident(request)
+
+    def _record(self, request, allowed: bool) -> None:
+        from .metrics import throttle_requests_total
+
+        scope = getattr(self, "scope", None) or type(self).__name__
+        try:
+            throttle_requests_total.labels(scope=scope, result="allowed" if allowed else "denied").inc()
+        except Exception:
+            pass
+        if allowed:
+            return
+        kind, ident = self.telemetry_subject(request)
+        if ident:
+            try:
+                record_denial(scope, kind, ident)
+            except Exception:
+                logger.warning("Could not record throttle denial", exc_info=True)
+
+
+class DynamicScopedRateThrottle(ScopedRateThrottle, GCRARateThrottle):
     """
     Scoped throttle that can read its rate from DB (RateLimitConfig) or fall back to settings.
+    Counting goes through the atomic GCRA engine (MRO: ScopedRateThrottle -> GCRARateThrottle).
     """
 
     def get_rate(self):
@@ -48,7 +371,7 @@ class DynamicScopedRateThrottle(ScopedRateThrottle):
         return super().get_rate()
 
 
-class PerIPRateThrottle(SimpleRateThrottle):
+class PerIPRateThrottle(GCRARateThrottle):
     """
     A per-IP throttle that supports per-view scoped rates and DB overrides.
 
@@ -70,6 +393,9 @@ class PerIPRateThrottle(SimpleRateThrottle):
             return None
         return self.cache_format % {"scope": self.scope, "ident": ident}
 
+    def telemetry_subject(self, request) -> Tuple[str, Optional[str]]:
+        return KIND_IP, self.get_ident(request)
+
     def get_rate(self):
         # self.scope has already been set to "<scope>-ip" in get_cache_key
         scope = getattr(self, "scope", None)
@@ -79,5 +405,8 @@ class PerIPRateThrottle(SimpleRateThrottle):
         db_rate = _get_db_rate(base_scope, "ip")
         if db_rate:
             return db_rate
-        # fallback to DRF settings via parent implementation
-        return super().get_rate()
\ No newline at end of file
+        # fallback to DRF settings via parent implementation; a scope without "<scope>-ip" has no IP bucket
+        try:
+            return super().get_rate()
+        except ImproperlyConfigured:
+            return None
\ No newline at end of file
@@ -14,6 +14,9 @@ from .views import (
     TeamTransferView,
     RateLimitsStatusView,
     RateLimitsCacheView,
+    RateLimitsTopView,
+    AuditLogCsvView,
+    AuditProofView,
     RateLimitPresetsView,
     RateLimitPresetsValidateView,
     HealthzView,
@@ -36,6 +39,9 @@ urlpatterns = [
     path("teams/<int:id>/transfer", TeamTransferView.as_view()),
     path("ops/rate-limits", RateLimitsStatusView.as_view()),
     path("ops/rate-limits/cache", RateLimitsCacheView.as_view()),
+    path("ops/rate-limits/top", RateLimitsTopView.as_view()),
+    path("ops/audit.csv", AuditLogCsvView.as_view()),
+    path("ops/audit/<int:seq>/proof", AuditProofView.as_view()),
     path("ops/rate-limits/presets", RateLimitPresetsView.as_view()),
     path("ops/rate-limits/presets/validate", RateLimitPresetsValidateView.as_view()),
     # Observability
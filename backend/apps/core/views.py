@@ -4,6 +4,7 @@ import hmac
 import logging
 import json
 from pathlib import Path
+from datetime import datetime, time
 from typing import Dict, Any
 
 from django.conf import settings
@@ -11,6 +12,8 @@ from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.core.cache import cache
 from django.db import transaction
 from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -23,7 +26,9 @@ from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from .models import UiConfig
 from .serializers import UiConfigSerializer
 
-from .models import Team, Membership, RateLimitConfig
+from .audit import audit_csv_response, entry_proof, record_request
+from .models import AuditLog, Team, Membership, RateLimitConfig
+from .throttles import hh_retention_minutes, invalidate_rate_cache, top_denied
 from .serializers import (
     RegisterSerializer,
     UserPublicSerializer,
@@ -246,6 +251,7 @@ class RateLimitsStatusView(APIView):
         RateLimitConfig.objects.update_or_create(
             scope=scope, defaults={"user_rate": user_rate, "ip_rate": ip_rate}
         )
+        record_request(request, "ratelimit_update", "ratelimit", scope, data={"user_rate": user_rate, "ip_rate": ip_rate})
 
         # Warm caches for immediate effect
         cache.set(f"ratelimit:{scope}:user", user_rate or "", 60)
@@ -262,8 +268,8 @@ class RateLimitsStatusView(APIView):
         if not scope:
             return Response({"detail": "scope required"}, status=status.HTTP_400_BAD_REQUEST)
         RateLimitConfig.objects.filter(scope=scope).delete()
-        cache.delete(f"ratelimit:{scope}:user")
-        cache.delete(f"ratelimit:{scope}:ip")
+        invalidate_rate_cache(scope)
+        record_request(request, "ratelimit_delete", "ratelimit", scope)
         return Response(self._payload(), status=status.HTTP_200_OK)
 
 
@@ -276,15 +282,87 @@ class RateLimitsCacheView(APIView):
     def post(self, request):
         scope = (request.data.get("scope") or "").strip()
         if scope:
-            cache.delete(f"ratelimit:{scope}:user")
-            cache.delete(f"ratelimit:{scope}:ip")
+            invalidate_rate_cache(scope)
         else:
             cache.clear()
+            invalidate_rate_cache()
         # Return current payload
         view = RateLimitsStatusView()
         return Response(view._payload(), status=status.HTTP_200_OK)
 
 
+class RateLimitsTopView(APIView):
+    """
+    Who is being throttled: top-k users and IPs by denied requests over a sliding window of minutes.
+    Query: ?k=10&window=15 (window capped at THROTTLE_HEAVY_HITTERS_RETENTION_MINUTES).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            k = min(max(int(request.query_params.get("k", 10)), 1), 100)
+            window = min(max(int(request.query_params.get("window", 15)), 1), hh_retention_minutes())
+        except ValueError:
+            return Response({"detail": "k and window must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        top = top_denied(k=k, window_minutes=window)
+        ids = [int(row["ident"]) for row in top["user"] if row["ident"].isdigit()]
+        names = dict(User.objects.filter(pk__in=ids).values_list("pk", "username"))
+        for row in top["user"]:
+            row["username"] = names.get(int(row["ident"])) if row["ident"].isdigit() else None
+        return Response({"window_minutes": window, "k": k, "users": top["user"], "ips": top["ip"]})
+
+
+class AuditLogCsvView(APIView):
+    """
+    Staff-only streamed CSV export of the whole audit log, oldest first.
+    Filters: since / until (ISO date or datetime; since inclusive, until exclusive), target_type, action.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @staticmethod
+    def _parse_bound(value: str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def get(self, request):
+        params = request.query_params
+        qs = AuditLog.objects.all()
+        try:
+            if params.get("since"):
+                qs = qs.filter(timestamp__gte=self._parse_bound(params["since"]))
+            if params.get("until"):
+                qs = qs.filter(timestamp__lt=self._parse_bound(params["until"]))
+        except ValueError:
+            return Response({"detail": "since/until must be ISO dates or datetimes"}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get("target_type"):
+            qs = qs.filter(target_type=params["target_type"])
+        if params.get("action"):
+            qs = qs.filter(action=params["action"])
+        return audit_csv_response(qs.order_by("timestamp", "id"), "audit-log.csv", request)
+
+
+class AuditProofView(APIView):
+    """
+    Staff-only inclusion proof for one audit entry against its daily Merkle seal: recompute the root
+    with apps.core.merkle.verify_inclusion(hash, leaf_index, leaf_count, path, root). 404 until the
+    entry's day has been sealed.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, seq: int):
+        proof = entry_proof(seq)
+        if proof is None:
+            raise Http404
+        return Response(proof)
+
+
 class RateLimitPresetsView(APIView):
     """
     Manage preset configurations stored on disk (config/rate_limit_presets.json).
@@ -391,6 +469,7 @@ class RateLimitPresetsView(APIView):
         path.parent.mkdir(parents=True, exist_ok=True)
         with path.open("w") as f:
             json.dump(cfg, f, indent=2)
+        record_request(request, "ratelimit_presets_update", "ratelimit_presets", path.name, data=cfg)
 
         return Response(cfg, status=status.HTTP_200_OK)
 
@@ -567,4 +646,16 @@ class UiConfigView(APIView):
         obj.layout_by_tag = cleaned_tag
         obj.layout_by_event = cleaned_evt
         obj.save(update_fields=["challenge_list_layout", "layout_by_category", "layout_by_tag", "layout_by_event", "updated_at"])
+        record_request(
+            request,
+            "uiconfig_update",
+            "uiconfig",
+            obj.pk,
+            data={
+                "challenge_list_layout": obj.challenge_list_layout,
+                "layout_by_category": cleaned_cat,
+                "layout_by_tag": cleaned_tag,
+                "layout_by_event": cleaned_evt,
+            },
+        )
         return Response(UiConfigSerializer(obj).data)
\ No newline at end of file
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Optional
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+
+
+@database_sync_to_async
+def _jwt_user(raw: str):
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken
+
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _raw_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin1").partition(" ")
+            if scheme.lower() == "bearer" and token.strip():
+                return token.strip()
+    tokens = parse_qs((scope.get("query_string") or b"").decode("latin1")).get("token")
+    return tokens[-1] if tokens else None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Websocket counterpart of the REST API's JWTAuthentication: a connection the session did not
+    authenticate may present an access token, as "Authorization: Bearer <token>" or, since browsers
+    cannot set handshake headers, as ?token=<token>. Sits inside AuthMiddlewareStack.
+    """
+
+    async def __call__(self, scope, receive, send):
+        user = scope.get("user")
+        if user is None or not user.is_authenticated:
+            raw = _raw_token(scope)
+            jwt_user = await _jwt_user(raw) if raw else None
+            if jwt_user is not None:
+                scope = dict(scope, user=jwt_user)
+        return await super().__call__(scope, receive, send)
@@ -1,24 +1,29 @@
 import os
 from django.core.asgi import get_asgi_application
+from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import path
 
-from apps.challenges.consumers import LeaderboardConsumer, ADStatusConsumer, KothStatusConsumer
-
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ctfplatform.settings")
 
 django_asgi_app = get_asgi_application()
 
+# Consumers import models, so they load after the app registry is ready
+from apps.challenges.consumers import LeaderboardConsumer, ADStatusConsumer, KothStatusConsumer, UserEventsConsumer
+from apps.core.ws_auth import JWTAuthMiddleware
+
 # Websocket routing
 websocket_urlpatterns = [
     path("ws/leaderboard", LeaderboardConsumer.as_asgi()),
     path("ws/ad/<int:id>/status", ADStatusConsumer.as_asgi()),
     path("ws/koth/<int:id>/status", KothStatusConsumer.as_asgi()),
+    path("ws/me", UserEventsConsumer.as_asgi()),
 ]
 
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
-        "websocket": URLRouter(websocket_urlpatterns),
+        # Session or JWT auth populates scope["user"] for ws/me; the other streams are public
+        "websocket": AuthMiddlewareStack(JWTAuthMiddleware(URLRouter(websocket_urlpatterns))),
     }
 )
\ No newline at end of file
@@ -1,8 +1,48 @@
 import os
+import shutil
 from celery import Celery
+from celery.signals import celeryd_init, worker_process_shutdown, worker_ready
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ctfplatform.settings")
 
 app = Celery("ctfplatform")
 app.config_from_object("django.conf:settings", namespace="CELERY")
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+# Worker metrics exporter: tasks update metrics in the worker, which the web /api/metrics never sees.
+# With WORKER_METRICS_PORT set the worker's main process serves them; under a prefork pool set
+# PROMETHEUS_MULTIPROC_DIR (an empty, per-pod directory) so every child's values are included.
+
+
+@celeryd_init.connect
+def _reset_metrics_dir(**kwargs):
+    # Files left by a previous worker run would be aggregated as if they were live
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path and os.path.isdir(path):
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+            else:
+                os.remove(full)
+
+
+@worker_ready.connect
+def _start_metrics_exporter(**kwargs):
+    from django.conf import settings
+    from prometheus_client import start_http_server
+
+    from apps.core.metrics import worker_registry
+
+    port = int(getattr(settings, "WORKER_METRICS_PORT", 0) or 0)
+    if port:
+        start_http_server(port, registry=worker_registry())
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
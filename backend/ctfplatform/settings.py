@@ -115,6 +115,21 @@ else:
     }
     _redis_url = "redis://localhost:6379/1"
 
+# Cross-worker locks (tick runs, audit writer; apps/core/locks.py). Required with more than one worker
+# process: without it locks fall back to the per-process cache
+LOCK_REDIS_URL = os.getenv("LOCK_REDIS_URL", _redis_url_env or "")
+
+# Throttles count in Redis with an atomic GCRA Lua script (needs Redis >= 5); without it they fall
+# back to a per-process limiter on the default cache
+THROTTLE_REDIS_URL = os.getenv("THROTTLE_REDIS_URL", _redis_url_env or "")
+# Effective rates are cached per process; RateLimitConfig changes reach every worker within the
+# version check interval (the local TTL only bounds staleness if the cache is unreachable)
+RATE_CONFIG_VERSION_CHECK_SECONDS = float(os.getenv("RATE_CONFIG_VERSION_CHECK_SECONDS", "1"))
+RATE_CONFIG_LOCAL_TTL = int(os.getenv("RATE_CONFIG_LOCAL_TTL", "30"))
+# Throttled users/IPs are tallied per minute in a heavy-hitters table of this many entries, kept this long
+THROTTLE_HEAVY_HITTERS_CAPACITY = int(os.getenv("THROTTLE_HEAVY_HITTERS_CAPACITY", "200"))
+THROTTLE_HEAVY_HITTERS_RETENTION_MINUTES = int(os.getenv("THROTTLE_HEAVY_HITTERS_RETENTION_MINUTES", "60"))
+
 # Channels
 _channel_redis_url = os.getenv("CHANNEL_REDIS_URL")
 if _channel_redis_url:
@@ -138,13 +153,72 @@ CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", _redis_url)
 CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "0") == "1"
 # Use TZ env if provided; avoids referencing TIME_ZONE before it's defined below.
 CELERY_TIMEZONE = os.getenv("TZ", "UTC")
+# Celery workers serve their own Prometheus metrics on this port (0 = off); see ctfplatform/celery.py
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
 from datetime import timedelta as _celery_timedelta
+TICK_SCHEDULER_INTERVAL_SECONDS = int(os.getenv("TICK_SCHEDULER_INTERVAL_SECONDS", "30"))
+# Instance provisioning (Celery task provision_instance): "dev" marks instances ready with a dummy URL,
+# "k8s" creates a ChallengeInstance CR in INSTANCE_NAMESPACE and watches it until the operator reports Ready
+INSTANCE_PROVISIONER = os.getenv("INSTANCE_PROVISIONER", "dev")
+INSTANCE_NAMESPACE = os.getenv("INSTANCE_NAMESPACE", os.getenv("OPERATOR_NAMESPACE", "default"))
+INSTANCE_READY_TIMEOUT_SECONDS = int(os.getenv("INSTANCE_READY_TIMEOUT_SECONDS", "300"))
+# Spawn admission: concurrent pending/running instances per team (0 = unlimited); per-challenge caps come from
+# checker_config.max_instances. Counters live in the cache and are recounted after INSTANCE_QUOTA_COUNTER_TTL;
+# they are only shared between processes with REDIS_URL set (LocMem counts per process)
+INSTANCE_QUOTA_PER_TEAM = int(os.getenv("INSTANCE_QUOTA_PER_TEAM", "3"))
+INSTANCE_QUOTA_COUNTER_TTL = int(os.getenv("INSTANCE_QUOTA_COUNTER_TTL", "300"))
+# A spawn racing another one for the same (team, challenge) waits this long for its instance, then answers 202
+INSTANCE_SPAWN_WAIT_SECONDS = float(os.getenv("INSTANCE_SPAWN_WAIT_SECONDS", "2"))
+# Idle reaper: instances without activity (ingress hits, probes) for idle_timeout_minutes (checker_config,
+# else this default; 0 disables) are stopped and deprovisioned
+INSTANCE_IDLE_TIMEOUT_MINUTES = int(os.getenv("INSTANCE_IDLE_TIMEOUT_MINUTES", "60"))
+INSTANCE_REAPER_INTERVAL_SECONDS = int(os.getenv("INSTANCE_REAPER_INTERVAL_SECONDS", "60"))
+INSTANCE_REAPER_BATCH_SIZE = int(os.getenv("INSTANCE_REAPER_BATCH_SIZE", "500"))
+INSTANCE_REAPER_MAX_PER_PASS = int(os.getenv("INSTANCE_REAPER_MAX_PER_PASS", "5000"))
+# Safety-net refill period; spawns that claim a warm instance also trigger a refill right away
+WARM_POOL_REFILL_SECONDS = int(os.getenv("WARM_POOL_REFILL_SECONDS", "30"))
+# Audit entries are queued on this Redis list and appended to the hash chain by the flush_audit_queue
+# task in batches of AUDIT_BATCH_SIZE; without Redis they are appended inline
+AUDIT_QUEUE_REDIS_URL = os.getenv("AUDIT_QUEUE_REDIS_URL", _redis_url_env or "")
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
 CELERY_BEAT_SCHEDULE = {
     "schedule-multi-mode-ticks": {
         "task": "apps.challenges.tasks.schedule_ticks",
-        "schedule": _celery_timedelta(seconds=int(os.getenv("TICK_SCHEDULER_INTERVAL_SECONDS", "30"))),
+        "schedule": _celery_timedelta(seconds=TICK_SCHEDULER_INTERVAL_SECONDS),
+    },
+    "prune-defense-tokens": {
+        "task": "apps.challenges.tasks.prune_defense_tokens",
+        "schedule": _celery_timedelta(minutes=5),
+    },
+    "reap-idle-instances": {
+        "task": "apps.challenges.tasks.reap_idle_instances_task",
+        "schedule": _celery_timedelta(seconds=INSTANCE_REAPER_INTERVAL_SECONDS),
+    },
+    "refill-warm-pools": {
+        "task": "apps.challenges.tasks.refill_warm_pools",
+        "schedule": _celery_timedelta(seconds=WARM_POOL_REFILL_SECONDS),
+    },
+    "flush-audit-queue": {
+        "task": "apps.core.tasks.flush_audit_queue",
+        "schedule": _celery_timedelta(seconds=AUDIT_FLUSH_SECONDS),
+    },
+    # Hourly so a missed run is retried; sealing a day that already has a seal is a no-op
+    "seal-audit-day": {
+        "task": "apps.core.tasks.seal_audit_day",
+        "schedule": _celery_timedelta(hours=1),
     },
 }
+# Expired defense tokens are kept this long past expires_at ("Token expired" answers), then deleted
+DEFENSE_TOKEN_GRACE_SECONDS = int(os.getenv("DEFENSE_TOKEN_GRACE_SECONDS", "600"))
+# run_tick goes to dedicated queues sharded by challenge id (ticks.0 .. ticks.<N-1>);
+# run a tick worker with: celery -A ctfplatform worker -Q ticks.0,ticks.1,...
+TICK_QUEUE_PREFIX = os.getenv("TICK_QUEUE_PREFIX", "ticks")
+TICK_QUEUE_SHARDS = int(os.getenv("TICK_QUEUE_SHARDS", "4"))
+# provision_instance blocks on a readiness watch for up to INSTANCE_READY_TIMEOUT_SECONDS, so it has its
+# own queue: celery -A ctfplatform worker -Q provisioning
+PROVISIONING_QUEUE = os.getenv("PROVISIONING_QUEUE", "provisioning")
+CELERY_TASK_ROUTES = ("apps.challenges.routing.route_task",)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -238,6 +312,13 @@ if os.getenv("AWS_STORAGE_BUCKET_NAME"):
 
 # Game settings
 FLAG_HMAC_PEPPER = os.getenv("FLAG_HMAC_PEPPER", "dev-pepper-change-me")
+# Wrong-flag penalty box: after FREE_ATTEMPTS consecutive misses per team+challenge (IP_FREE_ATTEMPTS per
+# client IP) each further miss blocks for BASE_SECONDS * 2^n, capped at MAX_SECONDS. BASE_SECONDS=0 disables.
+FLAG_PENALTY_FREE_ATTEMPTS = int(os.getenv("FLAG_PENALTY_FREE_ATTEMPTS", "10"))
+FLAG_PENALTY_IP_FREE_ATTEMPTS = int(os.getenv("FLAG_PENALTY_IP_FREE_ATTEMPTS", "30"))
+FLAG_PENALTY_BASE_SECONDS = int(os.getenv("FLAG_PENALTY_BASE_SECONDS", "10"))
+FLAG_PENALTY_MAX_SECONDS = int(os.getenv("FLAG_PENALTY_MAX_SECONDS", "900"))
+FLAG_PENALTY_RESET_SECONDS = int(os.getenv("FLAG_PENALTY_RESET_SECONDS", "3600"))
 MIN_POINTS_FLOOR = int(os.getenv("MIN_POINTS_FLOOR", "50"))
 WRITEUP_BONUS_POINTS = int(os.getenv("WRITEUP_BONUS_POINTS", "25"))
 
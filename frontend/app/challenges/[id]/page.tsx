@@ -37,6 +37,7 @@ type WriteUp = {
   id: number;
   title: string;
   content_md: string;
+  content_html?: string;
   username: string;
   team?: number | null;
   published_at?: string | null;
@@ -49,6 +50,7 @@ export default function ChallengeDetailPage({ params }: { params: { id: string }
   const { notify, notifySuccess, notifyError } = useToast();
 
   const [writeups, setWriteups] = useState<WriteUp[]>([]);
+  const [writeupsCursor, setWriteupsCursor] = useState<string | null>(null);
   const [wuTitle, setWuTitle] = useState("");
   const [wuContent, setWuContent] = useState("");
 
@@ -64,11 +66,21 @@ export default function ChallengeDetailPage({ params }: { params: { id: string }
       .then(setChallenge)
       .catch((e) => notifyError(e?.message || "Failed to load challenge."));
 
-    fetch(`/api/content/challenges/${id}/writeups?status=approved`, { credentials: "include" })
+    loadWriteUps(null);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [id]);
+
+  const loadWriteUps = (cursor: string | null) => {
+    const qs = new URLSearchParams({ status: "approved" });
+    if (cursor) qs.set("cursor", cursor);
+    fetch(`/api/content/challenges/${id}/writeups?${qs.toString()}`, { credentials: "include" })
       .then((r) => r.json())
-      .then((d) => setWriteups(d.results || []))
+      .then((d) => {
+        setWriteups((prev) => (cursor ? [...prev, ...(d.results || [])] : d.results || []));
+        setWriteupsCursor(d.next_cursor || null);
+      })
       .catch(() => {});
-  }, [id]);
+  };
 
   const submitFlag = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -152,18 +164,28 @@ export default function ChallengeDetailPage({ params }: { params: { id: string }
                 <div className="text-xs text-gray-600">
                   by {w.username} {w.published_at ? `on ${w.published_at}` : ""}
                 </div>
-                <div className="prose max-w-none mt-2 whitespace-pre-wrap">
-                  <ReactMarkdown
-                    remarkPlugins={[remarkGfm]}
-                    rehypePlugins={[rehypeHighlight, [rehypeSanitize, sanitizeSchema]]}
-                  >
-                    {w.content_md || ""}
-                  </ReactMarkdown>
-                </div>
+                {w.content_html ? (
+                  // Rendered and bleach-sanitized once on the server
+                  <div className="prose max-w-none mt-2" dangerouslySetInnerHTML={{ __html: w.content_html }} />
+                ) : (
+                  <div className="prose max-w-none mt-2 whitespace-pre-wrap">
+                    <ReactMarkdown
+                      remarkPlugins={[remarkGfm]}
+                      rehypePlugins={[rehypeHighlight, [rehypeSanitize, sanitizeSchema]]}
+                    >
+                      {w.content_md || ""}
+                    </ReactMarkdown>
+                  </div>
+                )}
               </li>
             ))}
           </ul>
         )}
+        {writeupsCursor ? (
+          <button className="mt-2 px-3 py-2 border rounded" onClick={() => loadWriteUps(writeupsCursor)}>
+            Load more
+          </button>
+        ) : null}
       </section>
 
       <section>
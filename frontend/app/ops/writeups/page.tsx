@@ -30,6 +30,7 @@ type WriteUp = {
   team?: number | null;
   title: string;
   content_md: string;
+  content_html?: string;
   status: string;
   moderation_notes?: string;
   created_at: string;
@@ -57,13 +58,14 @@ export default function OpsWriteUpsPage() {
   const [page, setPage] = useState<number>(1);
   const [pageSize, setPageSize] = useState<number>(20);
   const [count, setCount] = useState<number>(0);
+  const [countExact, setCountExact] = useState<boolean>(true);
   const [hasNext, setHasNext] = useState<boolean>(false);
-  const [hasPrev, setHasPrev] = useState<boolean>(false);
+  // Keyset pagination: cursors[n] fetches page n + 1 (page 1 needs none)
+  const [cursors, setCursors] = useState<string[]>([""]);
 
   // Persist filters/pagination in localStorage
   const STATUS_KEY = "opsWriteUps:status";
   const CH_ID_KEY = "opsWriteUps:challengeId";
-  const PAGE_KEY = "opsWriteUps:page";
   const PAGE_SIZE_KEY = "opsWriteUps:pageSize";
 
   useEffect(() => {
@@ -78,11 +80,6 @@ export default function OpsWriteUpsPage() {
         const n = parseInt(ps, 10);
         if ([10, 20, 50].includes(n)) setPageSize(n);
       }
-      const pg = window.localStorage.getItem(PAGE_KEY);
-      if (pg) {
-        const n = parseInt(pg, 10);
-        if (!isNaN(n) && n >= 1) setPage(n);
-      }
     } catch {}
   }, []);
 
@@ -92,9 +89,8 @@ export default function OpsWriteUpsPage() {
       window.localStorage.setItem(STATUS_KEY, status);
       window.localStorage.setItem(CH_ID_KEY, challengeId);
       window.localStorage.setItem(PAGE_SIZE_KEY, String(pageSize));
-      window.localStorage.setItem(PAGE_KEY, String(page));
     } catch {}
-  }, [status, challengeId, pageSize, page]);
+  }, [status, challengeId, pageSize]);
 
   const [auditOpenFor, setAuditOpenFor] = useState<number | null>(null);
   const [auditRows, setAuditRows] = useState<AuditRow[]>([]);
@@ -111,17 +107,21 @@ export default function OpsWriteUpsPage() {
     notify("info", `Loading ${status} write-ups...`);
     const qs = new URLSearchParams({
       status,
-      page: String(page),
       page_size: String(pageSize),
     });
     if (challengeId.trim()) qs.set("challenge_id", challengeId.trim());
+    const cursor = cursors[page - 1];
+    if (cursor) qs.set("cursor", cursor);
     fetch(`/api/content/writeups?${qs.toString()}`, { credentials: "include" })
       .then((r) => r.json())
       .then((d) => {
         setRows(d.results || []);
         setCount(d.count || 0);
+        setCountExact(d.count_exact !== false);
         setHasNext(!!d.has_next);
-        setHasPrev(!!d.has_prev);
+        if (d.next_cursor) {
+          setCursors((prev) => [...prev.slice(0, page), d.next_cursor]);
+        }
       })
       .catch((e) => notifyError(e?.message || "Failed to load write-ups."))
       .finally(() => setLoading(false));
@@ -271,6 +271,7 @@ export default function OpsWriteUpsPage() {
             value={status}
             onChange={(e) => {
               setPage(1);
+              setCursors([""]);
               setStatus(e.target.value as any);
             }}
           >
@@ -287,6 +288,7 @@ export default function OpsWriteUpsPage() {
             value={challengeId}
             onChange={(e) => {
               setPage(1);
+              setCursors([""]);
               setChallengeId(e.target.value);
             }}
           />
@@ -298,6 +300,7 @@ export default function OpsWriteUpsPage() {
             value={pageSize}
             onChange={(e) => {
               setPage(1);
+              setCursors([""]);
               setPageSize(parseInt(e.target.value, 10));
             }}
           >
@@ -307,11 +310,11 @@ export default function OpsWriteUpsPage() {
           </select>
         </div>
         <div className="ml-auto flex items-center gap-2">
-          <span className="text-sm text-gray-600">Total: {count}</span>
+          <span className="text-sm text-gray-600">Total: {count}{countExact ? "" : "+"}</span>
           <button
             className="px-3 py-2 border rounded disabled:opacity-50"
             onClick={() => setPage((p) => Math.max(1, p - 1))}
-            disabled={!hasPrev}
+            disabled={page <= 1}
             title="Previous page"
           >
             Prev
@@ -373,14 +376,19 @@ export default function OpsWriteUpsPage() {
                   )}
                 </div>
               </div>
-              <div className="prose max-w-none mt-3 whitespace-pre-wrap">
-                <ReactMarkdown
-                  remarkPlugins={[remarkGfm]}
-                  rehypePlugins={[rehypeHighlight, [rehypeSanitize, sanitizeSchema]]}
-                >
-                  {w.content_md || ""}
-                </ReactMarkdown>
-              </div>
+              {w.content_html ? (
+                // Rendered and bleach-sanitized once on the server
+                <div className="prose max-w-none mt-3" dangerouslySetInnerHTML={{ __html: w.content_html }} />
+              ) : (
+                <div className="prose max-w-none mt-3 whitespace-pre-wrap">
+                  <ReactMarkdown
+                    remarkPlugins={[remarkGfm]}
+                    rehypePlugins={[rehypeHighlight, [rehypeSanitize, sanitizeSchema]]}
+                  >
+                    {w.content_md || ""}
+                  </ReactMarkdown>
+                </div>
+              )}
               {status !== "pending" && w.moderation_notes ? (
                 <div className="mt-3 text-sm">
                   <span className="font-medium">Moderation notes:</span> {w.moderation_notes}
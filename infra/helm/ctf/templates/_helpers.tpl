@@ -13,4 +13,16 @@
 {{- printf "%s-%s" .Release.Name $name | trunc 63 | trimSuffix "-" -}}
 {{- end -}}
 {{- end -}}
-{{- end -}}
\ No newline at end of file
+{{- end -}}
+{{/*
+Environment shared by the backend, beat and both workers. TICK_QUEUE_SHARDS must be identical
+everywhere: beat/web route run_tick by it, the tick worker consumes ticks.0..ticks.<shards-1>.
+*/}}
+{{- define "ctf.env" -}}
+{{- range $key, $value := .Values.env }}
+- name: {{ $key }}
+  value: "{{ $value }}"
+{{- end }}
+- name: TICK_QUEUE_SHARDS
+  value: "{{ .Values.tickWorker.shards }}"
+{{- end -}}
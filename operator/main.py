@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import kopf
 from kubernetes import config, client
@@ -9,6 +11,8 @@ GROUP = "infra.ctf.example.com"
 VERSION = "v1alpha1"
 TPL_PLURAL = "challengetemplates"
 INST_PLURAL = "challengeinstances"
+# Hash of the desired spec a Deployment/Service was created or patched from; a mismatch means drift
+SPEC_HASH_ANNOTATION = "infra.ctf.example.com/spec-hash"
 
 
 def _load_kube():
@@ -55,7 +59,7 @@ def _desired_deployment(name: str, namespace: str, image: str, cpu: str | None,
     return client.V1Deployment(
         api_version="apps/v1",
         kind="Deployment",
-        metadata=client.V1ObjectMeta(name=name, labels=labels),
+        metadata=client.V1ObjectMeta(name=name, labels=labels, annotations={SPEC_HASH_ANNOTATION: _spec_hash(spec)}),
         spec=spec,
     )
 
@@ -70,11 +74,71 @@ def _desired_service(name: str, namespace: str) -> client.V1Service:
     return client.V1Service(
         api_version="v1",
         kind="Service",
-        metadata=client.V1ObjectMeta(name=name, labels=labels),
+        metadata=client.V1ObjectMeta(name=name, labels=labels, annotations={SPEC_HASH_ANNOTATION: _spec_hash(spec)}),
         spec=spec,
     )
 
 
+def _spec_hash(spec) -> str:
+    data = json.dumps(client.ApiClient().sanitize_for_serialization(spec), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def _drift_patch(desired) -> dict:
+    """
+    Minimal strategic-merge patch: only the fields this operator owns plus the new spec hash.
+    """
+    data = client.ApiClient().sanitize_for_serialization(desired)
+    spec = data["spec"]
+    if data.get("kind") == "Deployment":
+        spec = {"template": {"spec": {"containers": spec["template"]["spec"]["containers"]}}}
+    else:
+        spec = {k: spec[k] for k in ("ports", "selector", "type") if k in spec}
+    return {"metadata": {"annotations": dict(data["metadata"]["annotations"])}, "spec": spec}
+
+
+def _ensure(kind: str, read, create, patch, desired, logger) -> None:
+    """
+    Create the object if missing; if its spec-hash annotation differs from the desired spec, patch it.
+    """
+    try:
+        current = read()
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        create(desired)
+        logger.info(f"Created {kind} {desired.metadata.name}")
+        return
+    have = ((current.metadata.annotations or {}) if current.metadata else {}).get(SPEC_HASH_ANNOTATION)
+    want = desired.metadata.annotations[SPEC_HASH_ANNOTATION]
+    if have != want:
+        patch(_drift_patch(desired))
+        logger.info(f"Patched drifted {kind} {desired.metadata.name} ({have} -> {want})")
+
+
+def _ensure_workload(name: str, namespace: str, tpl_spec: dict, spec: dict, logger) -> None:
+    apps = _apps()
+    core = _core()
+    resources = tpl_spec.get("resources", {}) or {}
+    env = _env_for_instance({"spec": spec})
+    _ensure(
+        "Deployment",
+        lambda: apps.read_namespaced_deployment(name, namespace),
+        lambda body: apps.create_namespaced_deployment(namespace, body),
+        lambda body: apps.patch_namespaced_deployment(name, namespace, body),
+        _desired_deployment(name, namespace, tpl_spec["image"], resources.get("cpu"), resources.get("memory"), env),
+        logger,
+    )
+    _ensure(
+        "Service",
+        lambda: core.read_namespaced_service(name, namespace),
+        lambda body: core.create_namespaced_service(namespace, body),
+        lambda body: core.patch_namespaced_service(name, namespace, body),
+        _desired_service(name, namespace),
+        logger,
+    )
+
+
 def _env_for_instance(body: dict) -> dict[str, str]:
     owner = body.get("spec", {}).get("owner", {})
     return {
@@ -98,39 +162,15 @@ def reconcile_instance(spec, name, namespace, status, logger, **kwargs):
     Reconcile ChallengeInstance -> Deployment + Service and update CR status.
     """
     coapi = _co()
-    apps = _apps()
-    core = _core()
 
     tpl_name = spec.get("templateRef")
     owner = spec.get("owner", {})
     if not tpl_name:
         raise kopf.TemporaryError("templateRef is required", delay=30)
 
-    # Read template to get image/resources
+    # Read template to get image/resources, then create or patch drifted Deployment/Service
     tpl = coapi.get_namespaced_custom_object(GROUP, VERSION, namespace, TPL_PLURAL, tpl_name)
-    image = tpl["spec"]["image"]
-    resources = tpl["spec"].get("resources", {}) or {}
-    cpu = resources.get("cpu")
-    mem = resources.get("memory")
-    env = _env_for_instance({"spec": spec})
-
-    # Ensure Deployment
-    try:
-        apps.read_namespaced_deployment(name, namespace)
-    except ApiException as e:
-        if e.status == 404:
-            dep = _desired_deployment(name, namespace, image, cpu, mem, env)
-            apps.create_namespaced_deployment(namespace, dep)
-            logger.info(f"Created Deployment {name}")
-
-    # Ensure Service
-    try:
-        core.read_namespaced_service(name, namespace)
-    except ApiException as e:
-        if e.status == 404:
-            svc = _desired_service(name, namespace)
-            core.create_namespaced_service(namespace, svc)
-            logger.info(f"Created Service {name}")
+    _ensure_workload(name, namespace, tpl["spec"], spec, logger)
 
     # Update status
     url = f"http://{name}.{namespace}.svc.cluster.local:8080"
@@ -149,6 +189,18 @@ def reconcile_instance(spec, name, namespace, status, logger, **kwargs):
     # For now, operator focuses on K8s resources & CR status.
 
 
+@kopf.on.update(GROUP, VERSION, TPL_PLURAL, field="spec")
+def rollout_template(spec, name, namespace, logger, **kwargs):
+    """
+    Roll a template change (image/resources) out to the instances that reference it.
+    """
+    instances = _co().list_namespaced_custom_object(GROUP, VERSION, namespace, INST_PLURAL).get("items", [])
+    for inst in instances:
+        inst_spec = inst.get("spec", {})
+        if inst_spec.get("templateRef") == name:
+            _ensure_workload(inst["metadata"]["name"], namespace, dict(spec), inst_spec, logger)
+
+
 @kopf.on.delete(GROUP, VERSION, INST_PLURAL)
 def delete_instance(spec, name, namespace, logger, **kwargs):
     """